@@ -31,6 +31,11 @@ The required import statements are made here, at the very beginning. Some standa
 
 
 # General imports
+import os
+import sys
+import copy
+import time
+import multiprocessing as mp
 import numpy as np
 import matplotlib.pyplot as plt
 from typing import List, Tuple
@@ -46,6 +51,21 @@ from tudatpy.astro.time_conversion import DateTime
 # Pygmo imports
 import pygmo as pg
 
+# Load the optimization utilities shared by the examples, located at the root of this repository
+current_dir = os.path.abspath('')
+sys.path.append(os.path.join(current_dir, '..'))
+from optimization_utilities import GenerationHistory, load_generation_history, get_champion_history, EvolutionDriver
+
+# Load the worker processes that evaluate transfer trajectories in parallel, located next to this file
+from mga_workers import (
+    initialize_transfer_trajectory_worker,
+    evaluate_delta_v_in_worker,
+    get_transfer_trajectory_object,
+)
+from mga_ephemeris import get_node_epoch_bounds, create_ephemeris_tables
+from mga_lambert import UnpoweredMgaDeltaV, DEFAULT_MINIMUM_PERICENTER_RADII, get_maximum_relative_difference
+from mga_tree_search import MgaTreeSearch
+
 
 """
 ## Helpers
@@ -109,6 +129,10 @@ There are four mandatory methods that must be implemented in the class:
 * `get_number_of_parameters(self)`: Returns the number of optimized parameters. In this case, that is the same as the number of flyby bodies (i.e. 6).
 * `get_bounds(self)`: Returns the bounds for each optimized parameter. These are provided as an input to `__init__()`. Their values are defined later in this example.
 * `fitness(self, x)`: Returns the cost associated with a vector of design parameters. Here, the fitness is the $\Delta V$ required to execute the transfer.
+
+The problem only stores plain data: the body order, central body, departure and arrival orbits, and bounds. Its transfer trajectory object is created on first use in each process, by the `get_transfer_trajectory_object()` function of the `mga_workers.py` module located next to this file, which caches it for the lifetime of the process. PyGMO copies and serializes its user defined problems, for instance to send them to the processes of a `pg.mp_island` or `pg.ipyparallel_island` archipelago; the `__getstate__()` and `__deepcopy__()` methods make sure that the worker pool (see below) is only used in the process that created it, while each other process evaluates its trajectories serially.
+
+Additionally, the optional `batch_fitness(self, x)` method returns the cost of a batch of design parameter vectors at once. A transfer trajectory object stores the results of its last evaluation, so it can not evaluate several trajectories at the same time. Instead, the batch is distributed over a pool of worker processes, each with its own transfer trajectory object, created by the `initialize_transfer_trajectory_worker()` function of the `mga_workers.py` module located next to this file. Alternatively, the whole batch is evaluated at once by a vectorized Lambert solver, if an `UnpoweredMgaDeltaV` object of the `mga_lambert.py` module is given to the problem.
 """
 
 
@@ -121,33 +145,73 @@ class TransferTrajectoryProblem:
 
     def __init__(
         self,
-        transfer_trajectory_object: tudatpy.trajectory_design.transfer_trajectory.TransferTrajectory,
+        transfer_body_order: List[str],  # Names of the bodies at the nodes
+        central_body: str,  # Name of the central body
+        departure_orbit: Tuple[float, float],  # Semi-major axis and eccentricity of the departure orbit
+        arrival_orbit: Tuple[float, float],  # Semi-major axis and eccentricity of the arrival orbit
         departure_date_lb: float,  # Lower bound on departure date
         departure_date_ub: float,  # Upper bound on departure date
         legs_tof_lb: np.ndarray,  # Lower bounds of each leg's time of flight
-        legs_tof_ub: np.ndarray,
-    ):  # Upper bounds of each leg's time of flight
+        legs_tof_ub: np.ndarray,  # Upper bounds of each leg's time of flight
+        worker_pool=None,  # Pool of worker processes created with initialize_transfer_trajectory_worker
+        number_of_workers: int = 1,
+        mga_delta_v=None,  # Vectorized Delta V evaluation of the mga_lambert module
+    ):
         """
         Class constructor.
         """
 
+        # Save the plain data from which the transfer trajectory object is created
+        self.transfer_body_order = tuple(transfer_body_order)
+        self.central_body = central_body
+        self.departure_orbit = tuple(departure_orbit)
+        self.arrival_orbit = tuple(arrival_orbit)
+
         self.departure_date_lb = departure_date_lb
         self.departure_date_ub = departure_date_ub
         self.legs_tof_lb = legs_tof_lb
         self.legs_tof_ub = legs_tof_ub
+        self.number_of_workers = number_of_workers
+        self.worker_pool = worker_pool
+        self.mga_delta_v = mga_delta_v
 
-        # Save the transfer trajectory object as a lambda function
-        # PyGMO internally pickles its user defined objects and some objects cannot be pickled properly without using lambda functions.
-        self.transfer_trajectory_function = lambda: transfer_trajectory_object
+    def __getstate__(self) -> dict:
+        """
+        Returns the state sent to other processes, without the worker pool, which only exists in this process.
+        """
+
+        state = self.__dict__.copy()
+        state["worker_pool"] = None
+        state["number_of_workers"] = 1
+        return state
+
+    def __deepcopy__(self, memo: dict):
+        """
+        Returns a copy of the problem, which shares the worker pool and vectorized Delta V evaluation of this process.
+        """
+
+        shared_attributes = ("worker_pool", "mga_delta_v")
+        problem_copy = self.__class__.__new__(self.__class__)
+        problem_copy.__dict__.update(
+            copy.deepcopy({name: value for name, value in self.__dict__.items() if name not in shared_attributes}, memo)
+        )
+        problem_copy.__dict__.update({name: self.__dict__[name] for name in shared_attributes})
+        return problem_copy
+
+    def get_transfer_trajectory_object(self) -> tudatpy.trajectory_design.transfer_trajectory.TransferTrajectory:
+        """
+        Returns the transfer trajectory object, created on first use in each process.
+        """
+
+        return get_transfer_trajectory_object(
+            self.transfer_body_order, self.central_body, self.departure_orbit, self.arrival_orbit
+        )
 
     def get_bounds(self) -> tuple:
         """
         Returns the boundaries of the decision variables.
         """
 
-        # Retrieve transfer trajectory object
-        transfer_trajectory_obj = self.transfer_trajectory_function()
-
         number_of_parameters = self.get_number_of_parameters()
 
         # Define lists to save lower and upper bounds of design parameters
@@ -159,7 +223,7 @@ class TransferTrajectoryProblem:
         upper_bound[0] = self.departure_date_ub
 
         # Define boundaries on time of flight between bodies ['Earth', 'Venus', 'Venus', 'Earth', 'Jupiter', 'Saturn']
-        for i in range(0, transfer_trajectory_obj.number_of_legs):
+        for i in range(0, len(self.transfer_body_order) - 1):
             lower_bound[i + 1] = self.legs_tof_lb[i]
             upper_bound[i + 1] = self.legs_tof_ub[i]
 
@@ -171,11 +235,8 @@ class TransferTrajectoryProblem:
         Returns number of parameters that will be optimized
         """
 
-        # Retrieve transfer trajectory object
-        transfer_trajectory_obj = self.transfer_trajectory_function()
-
         # Get number of parameters: it's the number of nodes (time at the first node, and time of flight to reach each subsequent node)
-        number_of_parameters = transfer_trajectory_obj.number_of_nodes
+        number_of_parameters = len(self.transfer_body_order)
 
         return number_of_parameters
 
@@ -185,7 +246,7 @@ class TransferTrajectoryProblem:
         """
 
         # Retrieve transfer trajectory object
-        transfer_trajectory = self.transfer_trajectory_function()
+        transfer_trajectory = self.get_transfer_trajectory_object()
 
         # Convert list of trajectory parameters to appropriate format
         node_times, leg_free_parameters, node_free_parameters = (
@@ -205,6 +266,42 @@ class TransferTrajectoryProblem:
 
         return [delta_v]
 
+    def batch_fitness(self, trajectory_parameters_batch: np.ndarray) -> np.ndarray:
+        """
+        Returns delta V of the transfer trajectories of a flattened batch of trajectory parameters
+        """
+
+        # Retrieve worker pool and vectorized Delta V evaluation
+        worker_pool = self.worker_pool
+        mga_delta_v = self.mga_delta_v
+
+        # Split the batch into one set of trajectory parameters per individual
+        trajectory_parameters_list = np.reshape(
+            trajectory_parameters_batch, (-1, self.get_number_of_parameters())
+        )
+
+        # Evaluate the complete batch at once if the vectorized Delta V evaluation is available, with the node times
+        # given by the departure time plus the accumulated times of flight
+        if mga_delta_v is not None:
+            return mga_delta_v.get_delta_v(np.cumsum(trajectory_parameters_list, axis=1))
+
+        # Evaluate the batch serially if no worker pool is available
+        if worker_pool is None:
+            return np.ravel(
+                [self.fitness(trajectory_parameters) for trajectory_parameters in trajectory_parameters_list]
+            )
+
+        # Otherwise, convert all trajectory parameters, and distribute a few chunks of them to each worker
+        transfer_trajectory = self.get_transfer_trajectory_object()
+        converted_parameters_list = [
+            convert_trajectory_parameters(transfer_trajectory, trajectory_parameters)
+            for trajectory_parameters in trajectory_parameters_list
+        ]
+        chunk_size = max(1, len(converted_parameters_list) // (4 * self.number_of_workers))
+        return np.array(
+            worker_pool.starmap(evaluate_delta_v_in_worker, converted_parameters_list, chunksize=chunk_size)
+        )
+
 
 """
 ## Simulation Setup 
@@ -292,25 +389,184 @@ legs_tof_lb[4] = 1000 * constants.JULIAN_DAY
 legs_tof_ub[4] = 6000 * constants.JULIAN_DAY
 
 
+"""
+### Ephemeris tables
+The transfer trajectory object retrieves the states of the bodies from their ephemerides at each node time, one trajectory at a time. To evaluate the states at many node times at once, they can also be retrieved from ephemeris tables, created by the `create_ephemeris_tables()` function of the `mga_ephemeris.py` module located next to this file.
+
+Each table approximates the state history of one body by Chebyshev polynomials of degree 12, over segments of 16 days, fitted to the ephemeris of the body. A table only covers the epochs at which the body can be visited: for each node, these range from the earliest departure plus the shortest times of flight of the preceding legs, to the latest departure plus their longest times of flight. Set `use_ephemeris_table_check` to `True` to check the accuracy of each table against the ephemeris of the body, at 1000 random epochs.
+"""
+
+
+###########################################################################
+# Create ephemeris tables
+###########################################################################
+
+# Tabulate the states of the transfer bodies over all epochs at which they can be visited
+node_epoch_bounds = get_node_epoch_bounds(departure_date_lb, departure_date_ub, legs_tof_lb, legs_tof_ub)
+ephemeris_tables = create_ephemeris_tables(bodies, transfer_body_order, node_epoch_bounds)
+
+# Whether to check the accuracy of the tables against the original ephemerides
+use_ephemeris_table_check = False
+
+if use_ephemeris_table_check:
+    for body_name, ephemeris_table in ephemeris_tables.items():
+        position_error, velocity_error = ephemeris_table.get_maximum_error(
+            bodies.get(body_name).ephemeris.cartesian_state
+        )
+        print(
+            "%s ephemeris table: maximum position error %.3g m, maximum velocity error %.3g m/s"
+            % (body_name, position_error, velocity_error)
+        )
+
+
+"""
+### Vectorized Delta V
+With the states of the bodies available for many node times at once, the $\Delta V$ of many trajectories can also be computed at once, by the `UnpoweredMgaDeltaV` class of the `mga_lambert.py` module located next to this file. It solves the Lambert problems of each leg for all trajectories with a vectorized version of the Lambert solver of Izzo (2015), and computes the $\Delta V$ at the departure, at each (powered) gravity assist, and at the arrival, in the same way as the transfer trajectory object.
+
+Set `use_delta_v_validation` to `True` to validate its results against the `evaluate()` method of the transfer trajectory object, for 1000 random trajectories within the bounds of the optimization. Trajectories for which the transfer trajectory object fails are excluded from the comparison.
+"""
+
+
+###########################################################################
+# Create and validate vectorized Delta V evaluation
+###########################################################################
+
+# Create the vectorized Delta V evaluation, using the gravitational parameters of the bodies and Tudat's default
+# minimum pericenter radii
+mga_delta_v = UnpoweredMgaDeltaV(
+    transfer_body_order,
+    ephemeris_tables,
+    bodies.get(central_body).gravitational_parameter,
+    {body_name: bodies.get(body_name).gravitational_parameter for body_name in set(transfer_body_order)},
+    DEFAULT_MINIMUM_PERICENTER_RADII,
+    (departure_semi_major_axis, departure_eccentricity),
+    (arrival_semi_major_axis, arrival_eccentricity),
+)
+
+# Whether to validate the vectorized Delta V evaluation against the transfer trajectory object
+use_delta_v_validation = False
+
+if use_delta_v_validation:
+    # Draw random trajectory parameters within the bounds
+    validation_parameters = np.random.default_rng(0).uniform(
+        np.concatenate(([departure_date_lb], legs_tof_lb)),
+        np.concatenate(([departure_date_ub], legs_tof_ub)),
+        (1000, len(transfer_body_order)),
+    )
+
+    # Evaluate the trajectories one at a time with the transfer trajectory object
+    start_time = time.perf_counter()
+    reference_delta_v = list()
+    for trajectory_parameters in validation_parameters:
+        node_times, leg_free_parameters, node_free_parameters = convert_trajectory_parameters(
+            transfer_trajectory_object, trajectory_parameters
+        )
+        try:
+            transfer_trajectory_object.evaluate(node_times, leg_free_parameters, node_free_parameters)
+            reference_delta_v.append(transfer_trajectory_object.delta_v)
+        except:
+            reference_delta_v.append(1e10)
+    reference_time = time.perf_counter() - start_time
+
+    # Evaluate all trajectories at once with the vectorized Delta V evaluation
+    start_time = time.perf_counter()
+    vectorized_delta_v = mga_delta_v.get_delta_v(np.cumsum(validation_parameters, axis=1))
+    vectorized_time = time.perf_counter() - start_time
+
+    print(
+        "Maximum relative Delta V difference: %.3g"
+        % get_maximum_relative_difference(reference_delta_v, vectorized_delta_v)
+    )
+    print(
+        "Evaluation time: %.3f s (transfer trajectory object), %.3f s (vectorized)"
+        % (reference_time, vectorized_time)
+    )
+
+
+"""
+### Tree search
+Most combinations of departure dates and times of flight already require a large $\Delta V$ in the first legs of the transfer. The `MgaTreeSearch` class of the `mga_tree_search.py` module located next to this file exploits this, by building the trajectories leg by leg, over a grid of 100 departure dates and 40 times of flight per leg. After each leg, the partial trajectories of which the accumulated $\Delta V$ exceeds that of the best complete trajectory found so far are discarded, and at most 1000 partial trajectories with the lowest $\Delta V$ are kept.
+
+Set `use_tree_search_seeding` to `True` to run the search, and replace the random initial population of the optimization by the best trajectories found. The number of seeded individuals is printed: if the search finds fewer complete trajectories than the population size (or none at all), the remaining individuals keep their random initial values.
+"""
+
+
+###########################################################################
+# Search for initial trajectories leg by leg
+###########################################################################
+
+# Whether to seed the initial population with the best trajectories of the tree search
+use_tree_search_seeding = False
+
+if use_tree_search_seeding:
+    # Search over a grid of departure dates and times of flight of each leg
+    tree_search = MgaTreeSearch(
+        mga_delta_v,
+        np.linspace(departure_date_lb, departure_date_ub, 100),
+        [np.linspace(tof_lb, tof_ub, 40) for tof_lb, tof_ub in zip(legs_tof_lb, legs_tof_ub)],
+        beam_width=1000,
+    )
+    start_time = time.perf_counter()
+    tree_search.search()
+    print(
+        "Tree search: best Delta V %.2f m/s, %.1f %% of %i partial trajectories discarded in %.2f s"
+        % (
+            tree_search.delta_v[0] if len(tree_search.delta_v) > 0 else np.nan,
+            100 * tree_search.get_pruned_fraction(),
+            tree_search.number_of_evaluated_legs,
+            time.perf_counter() - start_time,
+        )
+    )
+
+
 """
 To setup the optimization, it is first necessary to initialize the optimization problem. This problem, defined through the class `TransferTrajectoryProblem`, is given to PyGMO trough the `pg.problem()` method.
 
 The optimiser is selected to be the Differential Evolution (DE) algorithm (its documentation can be found [here](https://esa.github.io/pygmo2/algorithms.html#pygmo.de)). When selecting the algorithm, here the coefficient F is selected to have the value 0.5, instead of the default 0.8. Additionally, a fixed seed is selected; since PyGMO uses a random number generator, this ensures that PyGMO's results are reproducible.
 
-Finally, the initial population is created, with a size of 20 individuals.
+Before the problem is initialized, a pool of worker processes can be started, each creating its own transfer trajectory object. As the DE algorithm used here evaluates its offspring one at a time, the pool would only evaluate the initial population, which does not outweigh the time to start the workers: `number_of_workers` is therefore 1 by default, and all trajectories are evaluated serially. Set it to e.g. `os.cpu_count()` together with an algorithm that supports batch fitness evaluation (see below). When this example is run as a Python script on Windows or macOS, where each new process runs the script again, keep it at 1. Set `use_vectorized_delta_v` to `True` to evaluate batches with the vectorized $\Delta V$ evaluation described above instead.
+
+Finally, the initial population is created, with a size of 20 individuals. Its fitness is evaluated in a single batch by the worker pool. If the tree search was run, its best trajectories replace the random initial individuals. The DE algorithm itself evaluates its offspring one at a time, through the `fitness()` method. Algorithms that support batch fitness evaluation (such as `pg.pso_gen` or `pg.gaco`, through their `set_bfe()` method) use the worker pool in every generation, which pays off for large populations or campaigns with many initial populations.
 """
 
 
 ###########################################################################
 # Setup optimization
 ###########################################################################
+# Start the pool of workers, each creating its own transfer trajectory object once, if more than one worker is requested
+# (e.g., os.cpu_count(), with an algorithm that evaluates its offspring in batches, on an operating system that forks
+# new processes)
+number_of_workers = 1
+if number_of_workers > 1:
+    worker_pool = mp.Pool(
+        number_of_workers,
+        initializer=initialize_transfer_trajectory_worker,
+        initargs=(
+            transfer_body_order,
+            central_body,
+            (departure_semi_major_axis, departure_eccentricity),
+            (arrival_semi_major_axis, arrival_eccentricity),
+        ),
+    )
+else:
+    worker_pool = None
+
+# Whether to evaluate batches of trajectories with the vectorized Delta V evaluation, instead of the worker pool
+use_vectorized_delta_v = False
+
 # Initialize optimization class
 optimizer = TransferTrajectoryProblem(
-    transfer_trajectory_object,
+    transfer_body_order,
+    central_body,
+    (departure_semi_major_axis, departure_eccentricity),
+    (arrival_semi_major_axis, arrival_eccentricity),
     departure_date_lb,
     departure_date_ub,
     legs_tof_lb,
     legs_tof_ub,
+    worker_pool,
+    number_of_workers,
+    mga_delta_v if use_vectorized_delta_v else None,
 )
 
 # Creation of the pygmo problem object
@@ -334,8 +590,17 @@ algo = pg.algorithm(pg.de(gen=number_of_generations, seed=optimization_seed, F=0
 # Set population size
 population_size = 20
 
-# Create population
-pop = pg.population(prob, size=population_size, seed=optimization_seed)
+# Create population, evaluating its fitness in a single batch
+pop = pg.population(prob, size=population_size, seed=optimization_seed, b=pg.bfe(pg.member_bfe()))
+
+# Replace the initial individuals by the best trajectories of the tree search, if it was run. If it found fewer
+# trajectories than the population size (or none), the other individuals keep their random initial values
+if use_tree_search_seeding:
+    seed_decision_vectors = tree_search.get_decision_vectors(population_size)
+    for individual_index, trajectory_parameters in enumerate(seed_decision_vectors):
+        pop.set_x(individual_index, np.clip(trajectory_parameters, *prob.get_bounds()))
+    print("Initial population: %i of %i individuals seeded from the tree search"
+          % (len(seed_decision_vectors), population_size))
 
 
 """
@@ -345,7 +610,9 @@ pop = pg.population(prob, size=population_size, seed=optimization_seed)
 """
 Finally, the optimization can be executed by successively evolving the defined population.
 
-A total number of evolutions of 800 is selected. Thus, the method `algo.evolve()` is called 800 times inside a loop. After each evolution, the best fitness and the list with the best design variables are saved.
+A total number of evolutions of 800 is selected. Thus, the method `algo.evolve()` is called 800 times by the `EvolutionDriver` class of the `optimization_utilities` package, located at the root of this repository. After each evolution, the fitness and design variables of all individuals are saved by the `GenerationHistory` class of the same package. It writes them to disk in chunks, in the `cassini1_generation_history` directory, such that the memory used does not grow with the number of evolutions, and the history can be analysed while the optimization is still running.
+
+The driver can also stop the optimization before 800 evolutions: when the best $\Delta V$ improved by no more than `improvement_tolerance` over the last `number_of_stagnation_generations` evolutions, when the evolutions took longer than `wall_clock_budget` seconds, or when more than `evaluation_budget` trajectories were evaluated. All of these are disabled (`None`) by default. Every 10 evolutions, the population and the algorithm (including the state of its random number generator) are written to a checkpoint file. If the optimization is interrupted, setting `resume_optimization` to `True` continues it from the last checkpoint, with exactly the same results as an uninterrupted run.
 """
 
 
@@ -356,19 +623,44 @@ A total number of evolutions of 800 is selected. Thus, the method `algo.evolve()
 # Set number of evolutions
 number_of_evolutions = 800
 
-# Initialize empty containers
-individuals_list = []
-fitness_list = []
-
-for i in range(number_of_evolutions):
-
-    pop = algo.evolve(pop)
-
-    # individuals save
-    individuals_list.append(pop.champion_x)
-    fitness_list.append(pop.champion_f)
+# Select the rules to stop the optimization earlier (None to disable each rule)
+improvement_tolerance = 1e-3  # m/s
+number_of_stagnation_generations = None
+wall_clock_budget = None  # s
+evaluation_budget = None
+
+# Whether to resume an interrupted optimization from its last checkpoint
+resume_optimization = False
+
+# Record all individuals of the initial population and of each generation on disk, keeping the generations recorded
+# up to the checkpoint if the optimization is resumed
+generation_history = GenerationHistory(os.path.join(current_dir, 'cassini1_generation_history'),
+                                       len(pop.champion_x),
+                                       len(pop.champion_f),
+                                       keep_existing_chunks=resume_optimization)
+
+# Evolve the population until one of the stopping rules is met
+evolution_driver = EvolutionDriver(number_of_evolutions,
+                                   improvement_tolerance,
+                                   number_of_stagnation_generations,
+                                   wall_clock_budget,
+                                   evaluation_budget,
+                                   checkpoint_file=os.path.join(current_dir, 'cassini1_checkpoint.pkl'),
+                                   checkpoint_interval=10,
+                                   generation_history=generation_history)
+pop = evolution_driver.evolve(algo, pop, resume=resume_optimization)
+number_of_evolutions = evolution_driver.generation
+
+generation_history.close()
+print(
+    "The optimization has finished after %i evolutions (%s)"
+    % (number_of_evolutions, evolution_driver.stopping_reason)
+)
 
-print("The optimization has finished")
+# Stop the workers
+if worker_pool is not None:
+    worker_pool.close()
+    worker_pool.join()
 
 
 """
@@ -401,6 +693,11 @@ print("Venus-Earth time of flight [days]: ", best_decision_variables[3])
 print("Earth-Jupiter time of flight [days]: ", best_decision_variables[4])
 print("Jupiter-Saturn time of flight [days]: ", best_decision_variables[5])
 
+# Retrieve the best individual found up to each generation from the generation history
+_, individuals_list, fitness_list = get_champion_history(
+    load_generation_history(generation_history.history_directory))
+individuals_list, fitness_list = individuals_list[1:], fitness_list[1:]
+
 # Plot fitness over generations
 fig, ax = plt.subplots(figsize=(8, 4))
 ax.plot(
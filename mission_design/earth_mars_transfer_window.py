@@ -23,13 +23,12 @@ This opens the possibility to calculate the $\Delta V$ required for any transfer
 """
 ## Import statements
 
-The required import statements are made here, starting with standard imports (`os`, `pickle` from the Python Standard Library), followed by tudatpy imports.
+The required import statements are made here, starting with standard imports (`time` from the Python Standard Library), followed by tudatpy imports, the vectorized Lambert solver and ephemeris tables of the MGA examples, and the porkchop cache, located next to this file.
 """
 
 
 # General imports
-import os
-import pickle
+import time
 
 # Tudat imports
 from tudatpy import constants
@@ -38,6 +37,13 @@ from tudatpy.astro.time_conversion import DateTime
 from tudatpy.numerical_simulation import environment_setup
 from tudatpy.trajectory_design.porkchop import porkchop, plot_porkchop
 
+# Vectorized Lambert solver and ephemeris tables
+from mga_ephemeris import ChebyshevEphemerisTable
+from mga_lambert import get_porkchop_delta_v, get_maximum_relative_difference
+
+# Porkchop cache
+from porkchop_cache import PorkchopCache, get_porkchop_inputs
+
 
 """
 ## Environment setup
@@ -94,18 +100,29 @@ time_resolution = time_resolution = min(
 
 
 """
-Generating a high-resolution plot may be time-consuming: reusing saved data might be desirable; we proceed to ask the user whether to reuse saved data or generate the plot from scratch.
+Generating a high-resolution plot may be time-consuming: reusing saved data might be desirable. The $\Delta V$ map is therefore saved in a cache (see `porkchop_cache.py`), identified by all inputs of the plot: the bodies, the time windows and resolution, the settings of the environment, and the (default Lambert) $\Delta V$ function of the `porkchop` module, together with the version of tudatpy. It is reused only if all of these are unchanged, and calculated otherwise. Setting `RECALCULATE_delta_v` to `True` recalculates the $\Delta V$ map in any case.
 """
 
 
-# File
-data_file = 'porkchop.pkl'
+# Inputs of the porkchop plot, which identify its ΔV map in the cache
+porkchop_inputs = get_porkchop_inputs(
+    departure_body,
+    target_body,
+    earliest_departure_time,
+    latest_departure_time,
+    earliest_arrival_time,
+    latest_arrival_time,
+    time_resolution,
+    bodies_to_create=bodies_to_create,
+    global_frame_origin=global_frame_origin,
+    global_frame_orientation=global_frame_orientation
+)
 
-# Whether to recalculate the porkchop plot or use saved data
-RECALCULATE_delta_v = input(
-    '\n    Recalculate ΔV for porkchop plot? [y/N] '
-).strip().lower() == 'y'
-print()
+# Cache of ΔV maps, of which the least recently used are removed above 256 MB
+porkchop_cache = PorkchopCache('porkchop_cache')
+
+# Whether to recalculate the porkchop plot even if a ΔV map was saved for the same inputs
+RECALCULATE_delta_v = False
 
 
 """
@@ -117,7 +134,10 @@ Lastly, we call the `porkchop` function, which will calculate the $\Delta V$ req
 """
 
 
-if not os.path.isfile(data_file) or RECALCULATE_delta_v:
+# Read saved data, if it was saved for the same inputs
+saved_porkchop = None if RECALCULATE_delta_v else porkchop_cache.load(porkchop_inputs)
+
+if saved_porkchop is None:
     # Regenerate plot
     [departure_epochs, arrival_epochs, ΔV] = porkchop(
         bodies,
@@ -130,15 +150,9 @@ if not os.path.isfile(data_file) or RECALCULATE_delta_v:
         time_resolution
     )
     # Save data
-    pickle.dump(
-        [departure_epochs, arrival_epochs, ΔV],
-        open(data_file, 'wb')
-    )
+    porkchop_cache.save(porkchop_inputs, departure_epochs, arrival_epochs, ΔV)
 else:
-    # Read saved data
-    [departure_epochs, arrival_epochs, ΔV] = pickle.load(
-        open(data_file, 'rb')
-    )
+    [departure_epochs, arrival_epochs, ΔV] = saved_porkchop
     # Plot saved data
     plot_porkchop(
         departure_body   = departure_body,
@@ -150,6 +164,31 @@ else:
     )
 
 
+"""
+### Vectorized Lambert arcs
+The `porkchop` function solves the Lambert problem of each departure-arrival combination one at a time. The same $\Delta V$ map can be computed for all combinations at once by the `get_porkchop_delta_v()` function of the `mga_lambert.py` module, which retrieves the states of the departure and target bodies from Chebyshev ephemeris tables (see `mga_ephemeris.py`), and solves all Lambert problems with a vectorized solver. The result is validated against the $\Delta V$ map computed above.
+"""
+
+
+# Tabulate the states of the departure and target bodies over their time windows
+departure_ephemeris_table = ChebyshevEphemerisTable(
+    bodies.get(departure_body).ephemeris.cartesian_state, departure_epochs[0], departure_epochs[-1])
+target_ephemeris_table = ChebyshevEphemerisTable(
+    bodies.get(target_body).ephemeris.cartesian_state, arrival_epochs[0], arrival_epochs[-1])
+
+# Compute the departure and arrival ΔV of all combinations at once
+start_time = time.perf_counter()
+vectorized_ΔV = get_porkchop_delta_v(
+    departure_ephemeris_table,
+    target_ephemeris_table,
+    departure_epochs,
+    arrival_epochs,
+    bodies.get(global_frame_origin).gravitational_parameter
+)
+print('Vectorized ΔV map computed in %.3f s, maximum relative difference with the porkchop module: %.3g' % (
+    time.perf_counter() - start_time, get_maximum_relative_difference(ΔV, vectorized_ΔV)))
+
+
 """
 ### Variations
 The Tudat `porkchop` module allows us to
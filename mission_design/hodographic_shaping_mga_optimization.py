@@ -39,6 +39,10 @@ The required import statements are made here. Some standard modules are first lo
 
 
 # General imports
+import os
+import sys
+import functools
+import threading
 import numpy as np
 from typing import List, Tuple
 import pygmo as pg
@@ -52,6 +56,17 @@ from tudatpy import constants
 from tudatpy.numerical_simulation import environment_setup
 from tudatpy.trajectory_design import shape_based_thrust, transfer_trajectory
 
+# Load the optimization utilities shared by the examples, located at the root of this repository
+current_dir = os.path.abspath('')
+sys.path.append(os.path.join(current_dir, '..'))
+from optimization_utilities import GenerationHistory, load_generation_history, get_champion_history, EvolutionDriver
+
+# Load the decomposition of the problem by numbers of revolutions, located next to this file
+from mga_decomposition import IntegerDecomposition, get_integer_combinations
+
+# Load the island types and their benchmark, located next to this file
+from mga_islands import IslandBenchmark
+
 
 """
 ## Helpers
@@ -142,6 +157,42 @@ def create_low_thrust_transfer_object(transfer_body_order: list,
     return transfer_trajectory_object
 
 
+"""
+The system of bodies and the transfer trajectory objects can not be pickled, which PyGMO does to send the problem to other processes (e.g., the `pg.mp_island` used below, at every evolution). They are therefore created, and cached, by the following functions for the lifetime of each process, independently of the problem objects that use them. The transfer trajectory objects are identified by all settings of their shaping functions, and a limited number of them is kept. As a transfer trajectory object keeps the state of its last evaluation, each thread (e.g., of a `ThreadIsland`) uses its own objects.
+"""
+
+
+@functools.lru_cache(maxsize=None)
+def get_simplified_system_of_bodies() -> tudatpy.numerical_simulation.environment.SystemOfBodies:
+
+    # Create the system of bodies once per process
+    return environment_setup.create_simplified_system_of_bodies()
+
+
+@functools.lru_cache(maxsize=256)
+def get_shaped_transfer_trajectory_object(transfer_body_order: Tuple[str, ...],
+                                          shaping_times_of_flight: Tuple[float, ...],
+                                          departure_semi_major_axis: float,
+                                          departure_eccentricity: float,
+                                          arrival_semi_major_axis: float,
+                                          arrival_eccentricity: float,
+                                          central_body: str,
+                                          numbers_of_revolutions: Tuple[int, ...],
+                                          thread_identifier: int) -> \
+        tudatpy.trajectory_design.transfer_trajectory.TransferTrajectory:
+
+    # Create the transfer trajectory object only once per process and thread for the same (hashable) arguments
+    return create_low_thrust_transfer_object(list(transfer_body_order),
+                                             np.array(shaping_times_of_flight),
+                                             departure_semi_major_axis,
+                                             departure_eccentricity,
+                                             arrival_semi_major_axis,
+                                             arrival_eccentricity,
+                                             get_simplified_system_of_bodies(),
+                                             central_body,
+                                             list(numbers_of_revolutions))
+
+
 """
 ## Optimisation problem
 """
@@ -159,7 +210,10 @@ The following methods are implemented:
 * `get_nix()`: Returns the number of design variables which are to be optimized as integers. In this case, the only integer parameters are the number of revolutions per leg. 
 * `get_transfer_trajectory_object()`: For a given vector of design parameters, the function returns the evaluated transfer trajectory object. This is useful to further analyze the transfer after the optimization, allowing e.g. to retrieve the state history.
 * `get_node_times()`: For a given vector of design parameters, the function returns the transfer node times.
-* `fitness()`: Returns the cost associated with a vector of design parameters. Here, the fitness is the $\Delta V$ required to execute the transfer. Each time this function is called, a new transfer trajectory object is created and evaluated using the specified design parameters.
+* `get_cached_transfer_trajectory_object()`: Returns a transfer trajectory object for the given times of flight and numbers of revolutions. If reference times of flight are used for the shaping functions, it is only created if no object with the same numbers of revolutions was created before in this process (see `get_shaped_transfer_trajectory_object()`).
+* `fitness()`: Returns the cost associated with a vector of design parameters. Here, the fitness is the $\Delta V$ required to execute the transfer. Each time this function is called, a transfer trajectory object is retrieved and evaluated using the specified design parameters.
+
+The system of bodies and the transfer trajectory objects are not stored in the pickled problem (see `__getstate__()`), but retrieved from the caches of the process that evaluates the problem, which last as long as the process, and not only as long as the problem object that PyGMO sends to it. The shaping functions of each leg depend on its number of revolutions and its time of flight, such that a transfer trajectory object could only be reused for individuals with exactly the same numbers of revolutions and times of flight; by default, a new transfer trajectory object is therefore created for each evaluation. If reference times of flight are given by `shaping_times_of_flight`, the shaping functions are created with these instead, and only one transfer trajectory object per combination of numbers of revolutions is created, and cached, in each process. This makes each evaluation much cheaper, but changes the shaping functions, and thus the design space, with respect to the default.
 """
 
 
@@ -178,7 +232,8 @@ class MGAHodographicShapingTrajectoryOptimizationProblem:
                  departure_semi_major_axis: float = np.inf,
                  departure_eccentricity: float = 0.0,
                  arrival_semi_major_axis: float = np.inf,
-                 arrival_eccentricity: float = 0.0):
+                 arrival_eccentricity: float = 0.0,
+                 shaping_times_of_flight: List[float] = None):
         """
         Class constructor.
         """
@@ -209,6 +264,10 @@ class MGAHodographicShapingTrajectoryOptimizationProblem:
         self.current_node_times = None
         self.current_design_parameter_vector = None
 
+        # Reference times of flight of the shaping functions, with which the transfer trajectory objects are cached by
+        # each process (see get_shaped_transfer_trajectory_object)
+        self.shaping_times_of_flight = shaping_times_of_flight
+
         # Radius of solar system bodies, used to define the swingby periapsis radius.
         #
         # The values were retrieved from SPICE, using:
@@ -229,6 +288,18 @@ class MGAHodographicShapingTrajectoryOptimizationProblem:
             'Uranus': 25363666.666666668,
             'Neptune': 24623000.0 }
 
+    def __getstate__(self) -> dict:
+        """
+        Returns the state of the problem to be pickled, without the last evaluated transfer trajectory object, which is
+        created again by each process.
+        """
+
+        state = self.__dict__.copy()
+        state['current_transfer_trajectory_object'] = None
+        state['current_node_times'] = None
+        state['current_design_parameter_vector'] = None
+        return state
+
     def swingby_periapsis_to_optim_parameter(self, swingby_periapsis) -> float:
         """
         Converts the value of the swingby periapsis altitude to the parameter being optimized. The parameter being optimized
@@ -358,6 +429,45 @@ class MGAHodographicShapingTrajectoryOptimizationProblem:
             self.fitness(design_parameter_vector, post_processing=True)
         return self.current_node_times
 
+    def get_cached_transfer_trajectory_object(self,
+                                              times_of_flight: np.ndarray,
+                                              numbers_of_revolutions: List[int],
+                                              use_cache: bool = True) -> \
+            tudatpy.trajectory_design.transfer_trajectory.TransferTrajectory:
+        """
+        Function that returns a transfer trajectory object with the shaping functions of the given times of flight and
+        numbers of revolutions. With reference times of flight, it is only created if it is not in the cache of this
+        process yet. Otherwise (or in post-processing), a new object is created for each call.
+        """
+
+        # Without reference times of flight, the shaping functions depend on the (continuous) times of flight of each
+        # individual, such that transfer trajectory objects are (almost) never reused, and are not cached. In
+        # post-processing, a new object is created as well, such that it is not changed by later evaluations
+        if self.shaping_times_of_flight is None or not use_cache:
+            return create_low_thrust_transfer_object(
+                self.transfer_body_order,
+                self.shaping_times_of_flight if self.shaping_times_of_flight is not None else times_of_flight,
+                self.departure_semi_major_axis,
+                self.departure_eccentricity,
+                self.arrival_semi_major_axis,
+                self.arrival_eccentricity,
+                get_simplified_system_of_bodies(),
+                self.central_body,
+                numbers_of_revolutions)
+
+        # Otherwise, retrieve the transfer trajectory object with the same shaping functions from the cache of this
+        # process, which creates it if necessary
+        return get_shaped_transfer_trajectory_object(tuple(self.transfer_body_order),
+                                                     tuple(float(time_of_flight)
+                                                           for time_of_flight in self.shaping_times_of_flight),
+                                                     self.departure_semi_major_axis,
+                                                     self.departure_eccentricity,
+                                                     self.arrival_semi_major_axis,
+                                                     self.arrival_eccentricity,
+                                                     self.central_body,
+                                                     tuple(numbers_of_revolutions),
+                                                     threading.get_ident())
+
     def fitness(self,
                 design_parameter_vector: np.ndarray,
                 post_processing: bool = False) -> List[float]:
@@ -408,21 +518,10 @@ class MGAHodographicShapingTrajectoryOptimizationProblem:
         ################################################################################################################
         # Create and evaluate the transfer trajectory
 
-        # Create the system of bodies
-        # This is done in the fitness function instead of the constructor so that the class can be pickled
-        bodies = environment_setup.create_simplified_system_of_bodies()
-
-        # Create the transfer trajectory object
-        transfer_trajectory_object = create_low_thrust_transfer_object(
-            self.transfer_body_order,
-            times_of_flight,
-            self.departure_semi_major_axis,
-            self.departure_eccentricity,
-            self.arrival_semi_major_axis,
-            self.arrival_eccentricity,
-            bodies,
-            self.central_body,
-            numbers_of_revolutions)
+        # Retrieve the transfer trajectory object from the cache of this process
+        # In post-processing, a new object is created, such that it is not changed by later evaluations
+        transfer_trajectory_object = self.get_cached_transfer_trajectory_object(
+            times_of_flight, numbers_of_revolutions, use_cache=not post_processing)
 
         # Create the node times
         node_times = []
@@ -564,10 +663,18 @@ bounds = [
 seed = 42
 pop_size = 1000
 
+# Whether to create the shaping functions with fixed reference times of flight (the middle of the bounds), such that
+# each process creates only one transfer trajectory object per combination of numbers of revolutions
+use_reference_shaping_times_of_flight = False
+if use_reference_shaping_times_of_flight:
+    shaping_times_of_flight = [(leg_tof_lb + leg_tof_ub) / 2.0] * (len(transfer_body_order) - 1)
+else:
+    shaping_times_of_flight = None
+
 # Create Pygmo problem
 transfer_optimization_problem = MGAHodographicShapingTrajectoryOptimizationProblem(
     central_body, transfer_body_order, bounds, departure_semi_major_axis, departure_eccentricity,
-    arrival_semi_major_axis, arrival_eccentricity)
+    arrival_semi_major_axis, arrival_eccentricity, shaping_times_of_flight)
 problem = pg.problem(transfer_optimization_problem)
 
 # Create algorithm and define its seed
@@ -578,12 +685,45 @@ algorithm.set_seed(seed)
 island = pg.island(algo=algorithm, prob=problem, size=pop_size, seed=seed)
 
 
+"""
+### Island type
+The type of the island created above depends on the operating system: usually, the population is evolved in a separate process (`pg.mp_island`), to which the problem, the algorithm and the complete population are sent at every evolution. Whether this is faster than evolving the population in the main process depends on the cost of the fitness evaluations, the population size, and the number of CPUs.
+
+Setting `use_island_benchmark` to `True` measures the number of fitness evaluations per second of three types of islands, with the `IslandBenchmark` class of the `mga_islands.py` module located next to this file: a `ThreadIsland` evolving the population in a thread of the main process, a `pg.mp_island`, and a `ProcessPoolIsland` evolving the population in a pool of worker processes, which only receive the problem once. The process-pool island is benchmarked both with the complete population in one worker, and with the population split into one chunk per worker, evolved at the same time. The benchmark uses the first individuals of the initial population, for a quarter of the population and for the complete population, during two generations. The island is then recreated with the fastest configuration for the complete population, keeping its initial population and algorithm. Splitting the population into chunks changes the optimization itself, as the algorithm then evolves several smaller populations independently: these configurations are therefore only selected if `allow_chunked_island` is set to `True`.
+"""
+
+
+###########################################################################
+# Select island type
+###########################################################################
+
+# Whether to benchmark the island types, and evolve the population with the fastest one
+use_island_benchmark = False
+
+# Whether the population may be split into chunks that are evolved independently, which changes the algorithm
+allow_chunked_island = False
+
+if use_island_benchmark:
+    island_benchmark = IslandBenchmark(problem, algorithm, seed)
+    island_benchmark.run([pop_size // 4, pop_size],
+                         number_of_generations=2,
+                         initial_population=island.get_population())
+    island_benchmark.print_results()
+
+    # Recreate the island with the fastest configuration
+    island_type, number_of_chunks = island_benchmark.get_fastest_configuration(pop_size, allow_chunked_island)
+    island = island_benchmark.create_island(island_type, island.get_population(), number_of_chunks)
+    print('Selected island: %s' % island.get_name())
+
+
 """
 To setup the optimization, it is first necessary to initialize the optimization problem. This problem, defined through the class `MGAHodographicShapingTrajectoryOptimizationProblem`, is given to PyGMO trough the `pg.problem()` method.
 
 The optimiser is selected to be the Simple Genetic Algorithm (SGA) algorithm (its documentation can be found [here](https://esa.github.io/pygmo2/algorithms.html#pygmo.sga)), and is created by calling `pg.algorithm()`. A fixed seed is used to ensure that the results are reproducible.
 
 Since a large population is being optimized (1000 individuals), the `pg.island` class is used instead of `pg.population`. The island serves as a wrapper to the population, allowing the population to be evolved simultaneously in multiple threads, multiple processes, or even multiple machines. Here, as the type os island is not selected explicitly, usually the evolution will occur in multiple processes (though it depends on the operating systems), meaning that multiple CPUs will be used simultaneously. A seed is also specified when creating the island (this seed is used when creating the initial population).
+
+Setting `use_reference_shaping_times_of_flight` to `True` creates the shaping functions of all individuals with the same times of flight, such that the transfer trajectory objects of the problem are only created once per combination of numbers of revolutions, in each process. This reduces the cost of each evaluation by a large factor, at the expense of shaping functions that no longer scale with the time of flight of each individual.
 """
 
 """
@@ -591,7 +731,9 @@ Since a large population is being optimized (1000 individuals), the `pg.island`
 """
 
 """
-Finally, the optimization can be executed by successively evolving the island. To do so, the method `island.evolve()` is called the desired number of times inside a loop. After starting each evolution of the island, the method `island.wait_check()` is called, which makes the program wait for all the evolutions running in parallel to finish. After each evolution is finished, the best fitness and parameters vector are saved.
+Finally, the optimization can be executed by successively evolving the island. To do so, the `EvolutionDriver` class of the `optimization_utilities` package, located at the root of this repository, calls the method `island.evolve()` the desired number of times. After starting each evolution of the island, the method `island.wait_check()` is called, which makes the program wait for all the evolutions running in parallel to finish. After each evolution is finished, the fitness and parameters vectors of all 1000 individuals are saved by the `GenerationHistory` class of the same package. It writes them to disk in chunks, in the `hodographic_generation_history` directory, from which the best individual of each generation is retrieved afterwards.
+
+The driver can also stop the optimization earlier: when the best $\Delta V$ improved by no more than `improvement_tolerance` over the last `number_of_stagnation_generations` generations, when the evolutions took longer than `wall_clock_budget` seconds, or when more than `evaluation_budget` trajectories were evaluated. All of these are disabled (`None`) by default. After every generation, the population and the algorithm (including the state of its random number generator) are written to a checkpoint file. If the optimization is interrupted, setting `resume_optimization` to `True` continues it from the last checkpoint, with exactly the same results as an uninterrupted run.
 """
 
 
@@ -601,24 +743,81 @@ Finally, the optimization can be executed by successively evolving the island. T
 
 num_gen = 40
 
-# Initialize lists with the best individual per generation
-list_of_champion_f = [island.get_population().champion_f]
-list_of_champion_x = [island.get_population().champion_x]
+# Select the rules to stop the optimization earlier (None to disable each rule)
+improvement_tolerance = 1.0 # m/s
+number_of_stagnation_generations = None
+wall_clock_budget = None # s
+evaluation_budget = None
+
+# Whether to resume an interrupted optimization from its last checkpoint
+resume_optimization = False
+
+# Record all individuals of the initial population and of each generation on disk, keeping the generations recorded
+# up to the checkpoint if the optimization is resumed
+generation_history = GenerationHistory(os.path.join(current_dir, 'hodographic_generation_history'),
+                                       len(island.get_population().champion_x),
+                                       len(island.get_population().champion_f),
+                                       keep_existing_chunks=resume_optimization)
 
 # freeze_support needs to be called when using multiprocessing on windows
 # If called from other operating systems, freeze_support doesn't have any effect
 mp.freeze_support()
 
-for i in range(num_gen):
-    print('Evolution: %i / %i' % (i+1, num_gen))
+# Evolve the island until one of the stopping rules is met, writing a checkpoint after every (long) generation
+evolution_driver = EvolutionDriver(num_gen,
+                                   improvement_tolerance,
+                                   number_of_stagnation_generations,
+                                   wall_clock_budget,
+                                   evaluation_budget,
+                                   checkpoint_file=os.path.join(current_dir, 'hodographic_checkpoint.pkl'),
+                                   checkpoint_interval=1,
+                                   generation_history=generation_history)
+island = evolution_driver.evolve_island(island, resume=resume_optimization)
+num_gen = evolution_driver.generation
 
-    island.evolve() # Evolve island
-    island.wait_check() # Wait until all evolution tasks in the island finish
+generation_history.close()
+print('Evolution finished after %i generations (%s)' % (num_gen, evolution_driver.stopping_reason))
 
-    # Save current champion
-    list_of_champion_x.append(island.get_population().champion_x)
-    list_of_champion_f.append(island.get_population().champion_f)
-print('Evolution finished')
+# Stop the worker processes of the process-pool islands, if any
+if use_island_benchmark:
+    island_benchmark.close()
+
+
+"""
+### Decomposition by numbers of revolutions
+The numbers of revolutions of the legs are the only integer variables of the problem. Instead of optimizing them together with the continuous variables, the problem can be decomposed into one continuous sub-problem per combination of numbers of revolutions ($5^3 = 125$ combinations here), in which the numbers of revolutions are fixed. The `IntegerDecomposition` class of the `mga_decomposition.py` module, located next to this file, optimizes all sub-problems in parallel, each on its own island running in a separate process, with the self-adaptive differential evolution (SADE) algorithm.
+
+The islands are evolved in stages of `generations_per_stage` generations. After each stage, the lowest $\Delta V$ over all sub-problems (the incumbent) is updated, and the sub-problems of which the best $\Delta V$ exceeds the incumbent by more than the fraction `pruning_tolerance` are no longer evolved. This concentrates the fitness evaluations on the most promising combinations of numbers of revolutions. Combined with `use_reference_shaping_times_of_flight`, each process then only creates one transfer trajectory object per sub-problem.
+
+Set `use_revolution_decomposition` to `True` to run the decomposition after the optimization above, and compare its champion with that of the island.
+"""
+
+
+###########################################################################
+# Optimize the problem per combination of numbers of revolutions
+###########################################################################
+
+# Whether to run the decomposition by numbers of revolutions
+use_revolution_decomposition = False
+
+if use_revolution_decomposition:
+    revolution_decomposition = IntegerDecomposition(transfer_optimization_problem,
+                                                    pg.algorithm(pg.sade(gen=1)),
+                                                    population_size=50,
+                                                    seed=seed,
+                                                    generations_per_stage=5,
+                                                    number_of_stages=8,
+                                                    number_of_warm_up_stages=1,
+                                                    pruning_tolerance=0.5)
+    decomposition_champion_x, decomposition_champion_f = revolution_decomposition.run()
+
+    print('Sub-problems optimized: %i, of which pruned: %i' % (
+        len(get_integer_combinations(transfer_optimization_problem)), len(revolution_decomposition.pruning_stages)))
+    print('Fitness evaluations: %i (island: %i)' % (
+        revolution_decomposition.get_number_of_evaluations(), island.get_population().problem.get_fevals()))
+    print('Best numbers of revolutions: ', decomposition_champion_x[-transfer_optimization_problem.get_nix():])
+    print('Total Delta V [m/s]: %.1f (island: %.1f)' % (
+        decomposition_champion_f[0], island.get_population().champion_f[0]))
 
 
 """
@@ -638,6 +837,10 @@ print('\n########### CHAMPION INDIVIDUAL ###########\n')
 print('Total Delta V [m/s]: ', island.get_population().champion_f[0])
 print("Parameters vector [various]: ", island.get_population().champion_x)
 
+# Retrieve the best individual found up to each generation from the generation history
+_, list_of_champion_x, list_of_champion_f = get_champion_history(
+    load_generation_history(generation_history.history_directory))
+
 # Plot fitness over generations
 fig, ax = plt.subplots(figsize=(8, 4), constrained_layout=True)
 ax.plot(np.arange(0, num_gen+1), np.float_(list_of_champion_f) / 1000)
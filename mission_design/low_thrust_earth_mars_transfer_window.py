@@ -25,13 +25,11 @@ In this example, this option will be used to choose (make a preliminary choice,
 """
 ## Import statements
 
-The required import statements are made here, starting with standard imports (`os`, `pickle` from the Python Standard Library), followed by tudatpy imports.
+The required import statements are made here, starting with general imports (NumPy and Matplotlib), followed by tudatpy imports, and the porkchop cache, and parallel and adaptive porkchop evaluation, located next to this file.
 """
 
 
 # General imports
-import os
-import pickle
 import numpy as np
 import matplotlib.pyplot as plt
 
@@ -51,47 +49,64 @@ from tudatpy.trajectory_design.porkchop import porkchop, plot_porkchop
 from tudatpy.numerical_simulation.propagation import create_dependent_variable_dictionary
 from tudatpy.util import result2array
 
+# Porkchop cache, and parallel and adaptive porkchop evaluation, located next to this file
+from porkchop_cache import PorkchopCache, get_porkchop_inputs
+from porkchop_parallel import calculate_parallel_delta_v_time_map
+from porkchop_adaptive import calculate_adaptive_delta_v_time_map
+
 
 """
 ## Environment setup
 
-The simulation environment is set up here: the standard Spice kernels are loaded, the origin of the global frame is defined, and all necessary bodies are created. 
+The simulation environment is set up here: the standard Spice kernels are loaded, the origin of the global frame is defined, and all necessary bodies are created. The bodies are created by the `create_bodies()` function, such that the worker processes of the parallel porkchop evaluation (see below) can create their own system of bodies. 
 
 """
 
 
-# Load spice kernels
-spice.load_standard_kernels( )
-
 # Define global frame orientation
 global_frame_orientation = 'ECLIPJ2000'
 
-# Create bodies
+# Define bodies to create
 bodies_to_create = ['Sun', 'Venus', 'Earth', 'Moon', 'Mars', 'Jupiter', 'Saturn']
 global_frame_origin = 'Sun'
-body_settings = environment_setup.get_default_body_settings(
-    bodies_to_create, global_frame_origin, global_frame_orientation)
 
-# Create vehicle object and add it to the existing system of bodies
+# Define vehicle properties
 vehicle_mass = 4.0E3
 specific_impulse = 3000.0
-body_settings.add_empty_settings("Vehicle")
 
-body_settings.get("Vehicle").constant_mass = vehicle_mass
 
-# Create rotation model settings
-rotation_model_settings = environment_setup.rotation_model.custom_inertial_direction_based(
-        lambda time : np.array([1,0,0] ), global_frame_orientation, 'VehicleFixed' )
-body_settings.get("Vehicle").rotation_model_settings = rotation_model_settings
+def create_bodies():
+    # Load spice kernels
+    spice.load_standard_kernels( )
+
+    # Create bodies
+    body_settings = environment_setup.get_default_body_settings(
+        bodies_to_create, global_frame_origin, global_frame_orientation)
+
+    # Create vehicle object and add it to the existing system of bodies
+    body_settings.add_empty_settings("Vehicle")
+
+    body_settings.get("Vehicle").constant_mass = vehicle_mass
+
+    # Create rotation model settings
+    rotation_model_settings = environment_setup.rotation_model.custom_inertial_direction_based(
+            lambda time : np.array([1,0,0] ), global_frame_orientation, 'VehicleFixed' )
+    body_settings.get("Vehicle").rotation_model_settings = rotation_model_settings
+
+    # Create bodies
+    bodies = environment_setup.create_system_of_bodies(body_settings)
+
+    # Create vehicle thrust settings
+    thrust_magnitude_settings = (
+    propagation_setup.thrust.custom_thrust_magnitude_fixed_isp( lambda time : 0.0, specific_impulse ) )
+    environment_setup.add_engine_model(
+        'Vehicle', 'LowThrustEngine', thrust_magnitude_settings, bodies )
 
-# Create bodies
-bodies = environment_setup.create_system_of_bodies(body_settings)
+    return bodies
 
-# Create vehicle thrust settings        
-thrust_magnitude_settings = (
-propagation_setup.thrust.custom_thrust_magnitude_fixed_isp( lambda time : 0.0, specific_impulse ) )
-environment_setup.add_engine_model(
-    'Vehicle', 'LowThrustEngine', thrust_magnitude_settings, bodies )
+
+# Create the system of bodies of this process
+bodies = create_bodies()
 
 
 """
@@ -467,18 +482,39 @@ time_resolution = time_resolution = min(
 
 
 """
-Generating a high-resolution plot may be time-consuming: reusing saved data might be desirable; we proceed to ask the user whether to reuse saved data or generate the plot from scratch.
+Generating a high-resolution plot may be time-consuming: reusing saved data might be desirable. The $\Delta V$ map is therefore saved in a cache (see `porkchop_cache.py`), identified by all inputs of the plot: the bodies, the time windows and resolution, the settings of the environment, and the function that calculates the $\Delta V$ of a transfer. It is reused only if all of these are unchanged, and calculated otherwise. A version of the function is derived from its code, and the values of the global variables that it reads (such as `number_of_revolutions` and the free coefficients of the shaping functions) are included as well; if one of the functions that it calls is changed, a new version should be given through the `function_version` argument of `get_porkchop_inputs()`. Setting `RECALCULATE_delta_v` to `True` recalculates the $\Delta V$ map in any case.
+
+Each cell of the porkchop plot creates and evaluates a complete hodographic-shaping transfer trajectory, which the `porkchop` function does one cell at a time. Setting `use_parallel_porkchop` to `True` computes the $\Delta V$ map with the `calculate_parallel_delta_v_time_map()` function of the `porkchop_parallel.py` module located next to this file instead. It splits the grid of departure and arrival epochs into tiles, which are evaluated by a pool of worker processes, each with its own system of bodies created by `create_bodies()`, and reports its progress every 10 seconds. By default, all CPUs are only used if new processes are forked (as on Linux): a Python script would otherwise be run again by each worker process. On Windows or macOS, set `number_of_porkchop_workers` explicitly when running this example in a notebook.
 """
 
 
-# File
-data_file = 'porkchop.pkl'
+# Inputs of the porkchop plot, which identify its ΔV map in the cache
+porkchop_inputs = get_porkchop_inputs(
+    departure_body,
+    target_body,
+    earliest_departure_time,
+    latest_departure_time,
+    earliest_arrival_time,
+    latest_arrival_time,
+    time_resolution,
+    function_to_calculate_delta_v=hodographic_low_thrust_trajectory_delta_v,
+    bodies_to_create=bodies_to_create,
+    global_frame_origin=global_frame_origin,
+    global_frame_orientation=global_frame_orientation,
+    vehicle_mass=vehicle_mass,
+    specific_impulse=specific_impulse
+)
+
+# Cache of ΔV maps, of which the least recently used are removed above 256 MB
+porkchop_cache = PorkchopCache('porkchop_cache')
 
-# Whether to recalculate the porkchop plot or use saved data
-RECALCULATE_delta_v = input(
-    '\n    Recalculate ΔV for porkchop plot? [y/N] '
-).strip().lower() == 'y'
-print()
+# Whether to recalculate the porkchop plot even if a ΔV map was saved for the same inputs
+RECALCULATE_delta_v = False
+
+# Whether to compute the ΔV map in parallel, and with how many worker processes (None to use all CPUs if processes
+# are forked, and a single process otherwise)
+use_parallel_porkchop = False
+number_of_porkchop_workers = None
 
 
 """
@@ -490,7 +526,34 @@ Lastly, we call the `porkchop` function, which will calculate the $\Delta V$ req
 """
 
 
-if not os.path.isfile(data_file) or RECALCULATE_delta_v:
+# Read saved data, if it was saved for the same inputs
+saved_porkchop = None if RECALCULATE_delta_v else porkchop_cache.load(porkchop_inputs)
+
+if saved_porkchop is None and use_parallel_porkchop:
+    # Compute the ΔV map in parallel, and plot it
+    [departure_epochs, arrival_epochs, ΔV] = calculate_parallel_delta_v_time_map(
+        create_bodies,
+        departure_body,
+        target_body,
+        earliest_departure_time,
+        latest_departure_time,
+        earliest_arrival_time,
+        latest_arrival_time,
+        time_resolution,
+        function_to_calculate_delta_v=hodographic_low_thrust_trajectory_delta_v,
+        number_of_workers=number_of_porkchop_workers
+    )
+    plot_porkchop(
+        departure_body   = departure_body,
+        target_body      = target_body,
+        departure_epochs = departure_epochs, 
+        arrival_epochs   = arrival_epochs, 
+        delta_v          = ΔV,
+        threshold        = 60
+    )
+    # Save data
+    porkchop_cache.save(porkchop_inputs, departure_epochs, arrival_epochs, ΔV)
+elif saved_porkchop is None:
     # Regenerate plot
     [departure_epochs, arrival_epochs, ΔV] = porkchop(
         bodies,
@@ -504,15 +567,9 @@ if not os.path.isfile(data_file) or RECALCULATE_delta_v:
         function_to_calculate_delta_v=hodographic_low_thrust_trajectory_delta_v
     )
     # Save data
-    pickle.dump(
-        [departure_epochs, arrival_epochs, ΔV],
-        open(data_file, 'wb')
-    )
+    porkchop_cache.save(porkchop_inputs, departure_epochs, arrival_epochs, ΔV)
 else:
-    # Read saved data
-    [departure_epochs, arrival_epochs, ΔV] = pickle.load(
-        open(data_file, 'rb')
-    )
+    [departure_epochs, arrival_epochs, ΔV] = saved_porkchop
     # Plot saved data
     plot_porkchop(
         departure_body   = departure_body,
@@ -524,6 +581,51 @@ else:
     )
 
 
+"""
+### Adaptive refinement
+
+Most of the cells of the uniform grid above are spent on transfers with a $\Delta V$ far above the threshold of the plot. The `calculate_adaptive_delta_v_time_map()` function of the `porkchop_adaptive.py` module, located next to this file, first only evaluates the $\Delta V$ on a coarse grid, of which each cell spans 16 steps of the time resolution. It then recursively splits only the cells that are crossed by the contour of the threshold, that contain a local minimum below the threshold, or across which the $\Delta V$ jumps (such as the discontinuities in the plot above). The result is a quadtree, of which the $\Delta V$ map is interpolated between the evaluated epochs and plotted with `plot_porkchop`. The minimum $\Delta V$ and the number of evaluations are compared with those of the uniform grid.
+"""
+
+
+# Whether to compute the porkchop plot by adaptive refinement
+use_adaptive_porkchop = False
+
+if use_adaptive_porkchop:
+    # Refine the ΔV map around the threshold, the local minima and the discontinuities
+    porkchop_quadtree = calculate_adaptive_delta_v_time_map(
+        bodies,
+        departure_body,
+        target_body,
+        earliest_departure_time,
+        latest_departure_time,
+        earliest_arrival_time,
+        latest_arrival_time,
+        time_resolution,
+        function_to_calculate_delta_v=hodographic_low_thrust_trajectory_delta_v,
+        threshold=60
+    )
+
+    # Compare the minimum ΔV and the number of evaluations with the uniform grid
+    adaptive_departure_epoch, adaptive_arrival_epoch, adaptive_ΔV = porkchop_quadtree.get_minimum()
+    print('Adaptive refinement: %i of %i ΔV evaluations, minimum ΔV of %.3f km/s (uniform grid: %.3f km/s)' % (
+        porkchop_quadtree.number_of_evaluations, ΔV.shape[0] * ΔV.shape[1], adaptive_ΔV[0] / 1e3,
+        np.nanmin(ΔV[:, :, 0]) / 1e3))
+    print('Departure: %s, arrival: %s' % (
+        DateTime.from_epoch(adaptive_departure_epoch).iso_string(),
+        DateTime.from_epoch(adaptive_arrival_epoch).iso_string()))
+
+    # Plot the interpolated ΔV map of the quadtree
+    plot_porkchop(
+        departure_body   = departure_body,
+        target_body      = target_body,
+        departure_epochs = porkchop_quadtree.departure_epochs, 
+        arrival_epochs   = porkchop_quadtree.arrival_epochs, 
+        delta_v          = porkchop_quadtree.get_delta_v_map(),
+        threshold        = 60
+    )
+
+
 """
 ### Variations
 
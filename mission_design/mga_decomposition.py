@@ -0,0 +1,141 @@
+"""
+# MGA trajectory optimization - Decomposition by integer variables
+Copyright (c) 2010-2022, Delft University of Technology. All rights reserved. This file is part of the Tudat. Redistribution  and use in source and binary forms, with or without modification, are permitted exclusively under the terms of the Modified BSD license. You should have received a copy of the license with this file. If not, please or visit: http://tudat.tudelft.nl/LICENSE.
+
+This module is used by the hodographic-shaping MGA optimization example, to optimize a mixed-integer problem (of which the integer variables are the last entries of the decision vector, see `get_nix()`) as a set of continuous problems. `get_integer_combinations()` lists all combinations of values of the integer variables within their bounds, and the `FixedIntegerProblem` class is the continuous sub-problem in which the integer variables take one of these combinations.
+
+The `IntegerDecomposition` class optimizes all sub-problems in parallel, each on its own PyGMO island running in a separate process. The islands are evolved in stages of a few generations. After each stage, the best fitness over all sub-problems (the incumbent) is updated, and the sub-problems of which the champion is worse than the incumbent by more than a tolerance are pruned: they are not evolved any further, such that the evaluations are spent on the most promising combinations of integer variables.
+"""
+
+
+# Load standard modules
+import copy
+import itertools
+import numpy as np
+
+# Load pygmo library
+import pygmo as pg
+
+
+def get_integer_combinations(problem):
+    # All combinations of values of the integer variables, which are the last variables of the decision vector
+    lower_bounds, upper_bounds = problem.get_bounds()
+    number_of_integer_variables = problem.get_nix()
+    return list(itertools.product(*[range(int(lower_bound), int(upper_bound) + 1)
+                                    for lower_bound, upper_bound
+                                    in zip(lower_bounds[-number_of_integer_variables:],
+                                           upper_bounds[-number_of_integer_variables:])]))
+
+
+class FixedIntegerProblem:
+
+    def __init__(self,
+                 problem,
+                 integer_values):
+        self.problem = problem
+        self.integer_values = list(integer_values)
+
+    def get_bounds(self):
+        # Bounds of the continuous variables only
+        lower_bounds, upper_bounds = self.problem.get_bounds()
+        number_of_continuous_variables = len(lower_bounds) - len(self.integer_values)
+        return lower_bounds[:number_of_continuous_variables], upper_bounds[:number_of_continuous_variables]
+
+    def get_decision_vector(self,
+                            continuous_variables):
+        # Complete decision vector of the mixed-integer problem
+        return np.concatenate((continuous_variables, self.integer_values))
+
+    def fitness(self,
+                continuous_variables):
+        return self.problem.fitness(self.get_decision_vector(continuous_variables))
+
+    def get_name(self):
+        return "Sub-problem with integer variables %s" % str(tuple(self.integer_values))
+
+
+class IntegerDecomposition:
+
+    def __init__(self,
+                 problem,
+                 algorithm,
+                 population_size,
+                 seed,
+                 generations_per_stage=5,
+                 number_of_stages=8,
+                 number_of_warm_up_stages=1,
+                 pruning_tolerance=0.5,
+                 integer_combinations=None):
+        self.problem = problem
+        self.algorithm = algorithm
+        self.population_size = population_size
+        self.seed = seed
+        self.generations_per_stage = generations_per_stage
+        self.number_of_stages = number_of_stages
+        self.number_of_warm_up_stages = number_of_warm_up_stages
+        self.pruning_tolerance = pruning_tolerance
+        self.integer_combinations = get_integer_combinations(problem) if integer_combinations is None \
+            else integer_combinations
+
+        # Results of the decomposition, per combination of integer variables
+        self.islands = dict()
+        self.pruning_stages = dict()
+        self.incumbent_history = []
+
+    def create_islands(self):
+        # Evaluate the initial populations of all sub-problems in parallel processes
+        batch_fitness_evaluator = pg.bfe(pg.mp_bfe())
+        for combination_index, integer_values in enumerate(self.integer_combinations):
+            sub_problem = pg.problem(FixedIntegerProblem(self.problem, integer_values))
+            population = pg.population(sub_problem,
+                                       size=self.population_size,
+                                       seed=self.seed + combination_index,
+                                       b=batch_fitness_evaluator)
+
+            # Give the algorithm of each island its own seed, if the algorithm supports it
+            island_algorithm = copy.deepcopy(self.algorithm)
+            if island_algorithm.has_set_seed():
+                island_algorithm.set_seed(self.seed + combination_index)
+            self.islands[integer_values] = pg.island(algo=island_algorithm, pop=population, udi=pg.mp_island())
+
+    def get_incumbent(self):
+        # Best fitness found over all sub-problems
+        return min(island.get_population().champion_f[0] for island in self.islands.values())
+
+    def run(self):
+        self.create_islands()
+        self.pruning_stages = dict()
+        self.incumbent_history = [self.get_incumbent()]
+
+        for stage in range(self.number_of_stages):
+
+            # Evolve the islands of all remaining sub-problems at the same time, and wait for all of them to finish
+            active_integer_combinations = [integer_values for integer_values in self.integer_combinations
+                                           if integer_values not in self.pruning_stages]
+            for integer_values in active_integer_combinations:
+                self.islands[integer_values].evolve(self.generations_per_stage)
+            for integer_values in active_integer_combinations:
+                self.islands[integer_values].wait_check()
+
+            # Update the incumbent, shared by all sub-problems
+            incumbent = self.get_incumbent()
+            self.incumbent_history.append(incumbent)
+
+            # After the warm-up, prune the sub-problems that are worse than the incumbent by more than the tolerance
+            if stage + 1 >= self.number_of_warm_up_stages:
+                for integer_values in active_integer_combinations:
+                    champion_fitness = self.islands[integer_values].get_population().champion_f[0]
+                    if champion_fitness > incumbent * (1.0 + self.pruning_tolerance):
+                        self.pruning_stages[integer_values] = stage + 1
+        return self.get_champion()
+
+    def get_champion(self):
+        # Complete decision vector and fitness of the best individual over all sub-problems
+        best_integer_values = min(
+            self.islands, key=lambda integer_values: self.islands[integer_values].get_population().champion_f[0])
+        best_population = self.islands[best_integer_values].get_population()
+        champion_x = np.concatenate((best_population.champion_x, best_integer_values))
+        return champion_x, best_population.champion_f
+
+    def get_number_of_evaluations(self):
+        return sum(island.get_population().problem.get_fevals() for island in self.islands.values())
@@ -0,0 +1,102 @@
+"""
+# MGA trajectory optimization - Ephemeris tables
+Copyright (c) 2010-2022, Delft University of Technology. All rights reserved. This file is part of the Tudat. Redistribution  and use in source and binary forms, with or without modification, are permitted exclusively under the terms of the Modified BSD license. You should have received a copy of the license with this file. If not, please or visit: http://tudat.tudelft.nl/LICENSE.
+
+This module is used by the MGA optimization examples, to retrieve the states of the transfer bodies at many node times at once. The `ChebyshevEphemerisTable` class approximates the state history of a body by piecewise Chebyshev polynomials, which are fitted once to the ephemeris of the body, and then evaluated for arrays of epochs with NumPy.
+
+The tables only have to cover the epochs at which each body can be visited, which follow from the bounds of the optimization by `get_node_epoch_bounds()`. The accuracy of a table is checked against the original ephemeris by `ChebyshevEphemerisTable.get_maximum_error()`, at epochs between the sample epochs used for the fit.
+"""
+
+
+# Load standard modules
+import numpy as np
+
+# Load tudatpy modules
+from tudatpy import constants
+
+
+def get_node_epoch_bounds(departure_date_lb,
+                          departure_date_ub,
+                          legs_tof_lb,
+                          legs_tof_ub):
+    # The earliest (latest) epoch of each node follows from the earliest (latest) departure, and the shortest (longest)
+    # times of flight of all legs before it
+    earliest_node_epochs = departure_date_lb + np.concatenate(([0.0], np.cumsum(legs_tof_lb)))
+    latest_node_epochs = departure_date_ub + np.concatenate(([0.0], np.cumsum(legs_tof_ub)))
+    return np.column_stack((earliest_node_epochs, latest_node_epochs))
+
+
+class ChebyshevEphemerisTable:
+
+    def __init__(self,
+                 state_function,
+                 start_epoch,
+                 end_epoch,
+                 segment_duration=16.0 * constants.JULIAN_DAY,
+                 degree=12):
+        self.start_epoch = start_epoch
+        self.segment_duration = segment_duration
+        self.number_of_segments = max(1, int(np.ceil((end_epoch - start_epoch) / segment_duration)))
+        self.end_epoch = start_epoch + self.number_of_segments * segment_duration
+
+        # Sample the state function at the Chebyshev nodes of each segment
+        chebyshev_nodes = np.cos(np.pi * (np.arange(degree + 1) + 0.5) / (degree + 1))
+        sample_epochs = self.start_epoch + self.segment_duration \
+                        * (np.arange(self.number_of_segments)[:, np.newaxis] + 0.5 * (chebyshev_nodes + 1.0))
+        sample_states = np.array([state_function(epoch) for epoch in sample_epochs.ravel()]).reshape(
+            self.number_of_segments, degree + 1, 6)
+
+        # Interpolate the samples of all segments and state components at once, with one coefficient array per segment
+        coefficients = np.polynomial.chebyshev.chebfit(
+            chebyshev_nodes, np.moveaxis(sample_states, 1, 0).reshape(degree + 1, -1), degree)
+        self.coefficients = np.moveaxis(coefficients.reshape(degree + 1, self.number_of_segments, 6), 0, 1)
+
+    def get_states(self,
+                   epochs):
+        epochs = np.asarray(epochs, dtype=float)
+        if np.any(epochs < self.start_epoch) or np.any(epochs > self.end_epoch):
+            raise ValueError("Epochs outside of the ephemeris table")
+
+        # Find the segment of each epoch, and the position of the epoch within the segment, scaled to [-1, 1]
+        segment_position = (epochs.ravel() - self.start_epoch) / self.segment_duration
+        segment_indices = np.minimum(segment_position.astype(int), self.number_of_segments - 1)
+        scaled_epochs = 2.0 * (segment_position - segment_indices) - 1.0
+
+        # Evaluate the Chebyshev series of each epoch with the Clenshaw recurrence
+        coefficients = self.coefficients[segment_indices]
+        previous_term = np.zeros((len(scaled_epochs), 6))
+        current_term = np.zeros((len(scaled_epochs), 6))
+        for order in range(coefficients.shape[1] - 1, 0, -1):
+            previous_term, current_term = current_term, \
+                coefficients[:, order] + 2.0 * scaled_epochs[:, np.newaxis] * current_term - previous_term
+        states = coefficients[:, 0] + scaled_epochs[:, np.newaxis] * current_term - previous_term
+        return states.reshape(epochs.shape + (6,))
+
+    def get_maximum_error(self,
+                          state_function,
+                          number_of_test_epochs=1000,
+                          seed=0):
+        # Compare the table to the state function at random epochs, which do not coincide with the sample epochs
+        test_epochs = np.random.default_rng(seed).uniform(self.start_epoch, self.end_epoch, number_of_test_epochs)
+        state_errors = self.get_states(test_epochs) - np.array([state_function(epoch) for epoch in test_epochs])
+
+        # Return the maximum position error [m] and velocity error [m/s]
+        return np.max(np.linalg.norm(state_errors[:, :3], axis=1)), np.max(np.linalg.norm(state_errors[:, 3:], axis=1))
+
+
+def create_ephemeris_tables(bodies,
+                            transfer_body_order,
+                            node_epoch_bounds,
+                            segment_duration=16.0 * constants.JULIAN_DAY,
+                            degree=12):
+    # Create one table per body, covering the epochs of all nodes at which the body can be visited
+    ephemeris_tables = dict()
+    for body_name in set(transfer_body_order):
+        body_epoch_bounds = node_epoch_bounds[[node_body == body_name for node_body in transfer_body_order]]
+        ephemeris = bodies.get(body_name).ephemeris
+        ephemeris_tables[body_name] = ChebyshevEphemerisTable(ephemeris.cartesian_state,
+                                                              np.min(body_epoch_bounds[:, 0]),
+                                                              np.max(body_epoch_bounds[:, 1]),
+                                                              segment_duration,
+                                                              degree)
+    return ephemeris_tables
@@ -0,0 +1,229 @@
+"""
+# MGA trajectory optimization - Island types
+Copyright (c) 2010-2022, Delft University of Technology. All rights reserved. This file is part of the Tudat. Redistribution  and use in source and binary forms, with or without modification, are permitted exclusively under the terms of the Modified BSD license. You should have received a copy of the license with this file. If not, please or visit: http://tudat.tudelft.nl/LICENSE.
+
+This module is used by the hodographic-shaping MGA optimization example, to select the type of PyGMO island that evolves its (large) population the fastest. Three types of islands are compared:
+
+* The `ThreadIsland` class of the `optimization_utilities` package evolves the population in a thread of the main process. PyGMO's own `pg.thread_island` can not be used for this, as it refuses problems defined in Python. There is no start-up or serialization cost, but the fitness is evaluated serially.
+* The `pg.mp_island` evolves the population in a separate process. The problem, the algorithm and the population are serialized and sent to that process at every evolution.
+* The `ProcessPoolIsland` class evolves the population in a pool of worker processes, created with `create_island_worker_pool()`, which receive the problem only once, when they are started. At every evolution, only the algorithm and the decision vectors and fitness of the individuals are sent to the workers. The population can also be split into a number of chunks, which are evolved at the same time by different workers. The individuals are shuffled before they are split, such that they are mixed between the chunks at every evolution. Note that this changes the optimization itself: the algorithm evolves several smaller populations independently (with their own seeds), instead of the complete population, so its results differ from those of the other islands.
+
+The `IslandBenchmark` class measures the start-up time and the number of fitness evaluations per second of each type of island, for several population sizes, and selects the fastest configuration. Configurations that split the population into chunks are only selected if this is explicitly allowed, as they change the behaviour of the algorithm.
+"""
+
+
+# Load standard modules
+import copy
+import time
+import hashlib
+import numpy as np
+import multiprocessing as mp
+
+# Load pygmo library
+import pygmo as pg
+
+# Load the island type shared by the examples, located at the root of this repository
+from optimization_utilities import ThreadIsland
+
+
+# Problem of the current worker process of a ProcessPoolIsland, received once by initialize_island_worker()
+worker_problem = None
+
+
+def initialize_island_worker(problem):
+    global worker_problem
+    worker_problem = problem
+
+
+def create_island_worker_pool(problem,
+                              number_of_workers=None):
+    # Start the worker processes, which all receive the (serialized) problem once
+    if not isinstance(problem, pg.problem):
+        problem = pg.problem(problem)
+    return mp.Pool(number_of_workers, initializer=initialize_island_worker, initargs=(problem,))
+
+
+def evolve_in_worker(algorithm,
+                     decision_vectors,
+                     fitness_vectors):
+    # Recreate the population from the individuals, without evaluating their fitness again
+    population = pg.population(worker_problem)
+    for design_variables, fitness in zip(decision_vectors, fitness_vectors):
+        population.push_back(design_variables, fitness)
+
+    # Evolve the population, and return the evolved individuals with the number of fitness evaluations
+    number_of_evaluations = population.problem.get_fevals()
+    population = algorithm.evolve(population)
+    return algorithm, population.get_x(), population.get_f(), population.problem.get_fevals() - number_of_evaluations
+
+
+class ProcessPoolIsland:
+
+    def __init__(self,
+                 worker_pool,
+                 number_of_chunks=1):
+        self.worker_pool = worker_pool
+        self.number_of_chunks = number_of_chunks
+
+    def __getstate__(self):
+        # The worker pool can only be used by the process that created it
+        raise TypeError("A ProcessPoolIsland can not be serialized")
+
+    def __deepcopy__(self,
+                     memo):
+        # Copies made by PyGMO share the worker pool
+        return self.__class__(self.worker_pool, self.number_of_chunks)
+
+    def run_evolve(self,
+                   algorithm,
+                   population):
+        decision_vectors = population.get_x()
+        fitness_vectors = population.get_f()
+
+        # Evolve the complete population in one worker
+        if self.number_of_chunks == 1:
+            algorithm, evolved_decision_vectors, evolved_fitness_vectors, number_of_evaluations = \
+                self.worker_pool.apply(evolve_in_worker, (algorithm, decision_vectors, fitness_vectors))
+
+        # Otherwise, shuffle the individuals, and evolve each chunk in a separate worker with its own seed. The random
+        # numbers are derived from the individuals, such that the evolution can be reproduced (also when it is resumed
+        # from a checkpoint), while the algorithm itself is returned unchanged
+        else:
+            random_number_generator = np.random.default_rng(
+                int.from_bytes(hashlib.sha1(decision_vectors.tobytes()).digest()[:8], 'little'))
+            chunks = np.array_split(random_number_generator.permutation(len(decision_vectors)), self.number_of_chunks)
+            results = []
+            for chunk in chunks:
+                chunk_algorithm = copy.deepcopy(algorithm)
+                if chunk_algorithm.has_set_seed():
+                    chunk_algorithm.set_seed(int(random_number_generator.integers(2 ** 31)))
+                results.append(self.worker_pool.apply_async(
+                    evolve_in_worker, (chunk_algorithm, decision_vectors[chunk], fitness_vectors[chunk])))
+            results = [result.get() for result in results]
+            evolved_decision_vectors = np.vstack([result[1] for result in results])
+            evolved_fitness_vectors = np.vstack([result[2] for result in results])
+            number_of_evaluations = sum(result[3] for result in results)
+
+        # Recreate the evolved population in this process, counting the fitness evaluations done by the workers
+        evolved_population = pg.population(population.problem)
+        for design_variables, fitness in zip(evolved_decision_vectors, evolved_fitness_vectors):
+            evolved_population.push_back(design_variables, fitness)
+        evolved_population.problem.increment_fevals(number_of_evaluations)
+        return algorithm, evolved_population
+
+    def get_name(self):
+        return "Process-pool island (Python, %i chunks)" % self.number_of_chunks
+
+
+class IslandBenchmark:
+
+    def __init__(self,
+                 problem,
+                 algorithm,
+                 seed,
+                 number_of_workers=None):
+        self.problem = problem if isinstance(problem, pg.problem) else pg.problem(problem)
+        self.algorithm = algorithm if isinstance(algorithm, pg.algorithm) else pg.algorithm(algorithm)
+        self.seed = seed
+        self.number_of_workers = mp.cpu_count() if number_of_workers is None else number_of_workers
+        self.worker_pool = None
+
+        # Results of the benchmark: island type, number of chunks, population size, start-up time, and number of
+        # fitness evaluations per second
+        self.results = []
+
+    def get_worker_pool(self):
+        # Start the worker pool of the process-pool islands on first use
+        if self.worker_pool is None:
+            self.worker_pool = create_island_worker_pool(self.problem, self.number_of_workers)
+        return self.worker_pool
+
+    def create_island(self,
+                      island_type,
+                      population,
+                      number_of_chunks=1):
+        if island_type == 'thread':
+            user_defined_island = ThreadIsland()
+        elif island_type == 'mp':
+            user_defined_island = pg.mp_island()
+        elif island_type == 'pool':
+            user_defined_island = ProcessPoolIsland(self.get_worker_pool(), number_of_chunks)
+        else:
+            raise ValueError("Unknown island type '%s', use 'thread', 'mp' or 'pool'" % island_type)
+        return pg.island(udi=user_defined_island, algo=self.algorithm, pop=population)
+
+    def get_configurations(self):
+        # Island types and numbers of chunks to compare, splitting the population over all workers with the
+        # process-pool island
+        configurations = [('thread', 1), ('mp', 1), ('pool', 1)]
+        if self.number_of_workers > 1:
+            configurations.append(('pool', self.number_of_workers))
+        return configurations
+
+    def run(self,
+            population_sizes,
+            number_of_generations=2,
+            configurations=None,
+            initial_population=None):
+        self.results = []
+        for population_size in population_sizes:
+
+            # Give all islands the same initial individuals, taken from the initial population if it is given, or
+            # evaluated once otherwise
+            if initial_population is None:
+                population = pg.population(self.problem, size=population_size, seed=self.seed)
+            else:
+                population = pg.population(self.problem)
+                for design_variables, fitness in zip(initial_population.get_x()[:population_size],
+                                                     initial_population.get_f()[:population_size]):
+                    population.push_back(design_variables, fitness)
+            for island_type, number_of_chunks in (self.get_configurations() if configurations is None
+                                                  else configurations):
+                island = self.create_island(island_type, population, number_of_chunks)
+
+                # The first evolution includes the start-up of the processes
+                start_time = time.perf_counter()
+                island.evolve()
+                island.wait_check()
+                start_up_time = time.perf_counter() - start_time
+
+                # Measure the number of fitness evaluations per second of the next evolutions
+                number_of_evaluations = island.get_population().problem.get_fevals()
+                start_time = time.perf_counter()
+                island.evolve(number_of_generations)
+                island.wait_check()
+                evaluations_per_second = (island.get_population().problem.get_fevals() - number_of_evaluations) \
+                    / (time.perf_counter() - start_time)
+                self.results.append((island_type, number_of_chunks, population_size, start_up_time,
+                                     evaluations_per_second))
+        return self.results
+
+    def print_results(self):
+        print('Island type | Chunks | Population size | Start-up time [s] | Evaluations per second')
+        for island_type, number_of_chunks, population_size, start_up_time, evaluations_per_second in self.results:
+            print('%11s | %6i | %15i | %17.2f | %22.1f' % (
+                island_type, number_of_chunks, population_size, start_up_time, evaluations_per_second))
+
+    def get_fastest_configuration(self,
+                                  population_size,
+                                  allow_chunking=False):
+        # Only compare the configurations that evolve the complete population, unless chunking is allowed
+        results = [result for result in self.results if allow_chunking or result[1] == 1]
+
+        # Island type and number of chunks with the most fitness evaluations per second at the given population size,
+        # or at the largest benchmarked population size below it
+        benchmarked_sizes = [result[2] for result in results if result[2] <= population_size]
+        if len(benchmarked_sizes) == 0:
+            benchmarked_sizes = [min(result[2] for result in results)]
+        fastest_result = max([result for result in results if result[2] == max(benchmarked_sizes)],
+                             key=lambda result: result[4])
+        if fastest_result[1] > 1:
+            print('Warning: the selected island evolves %i chunks of the population independently, which changes the '
+                  'behaviour (and the results) of the algorithm' % fastest_result[1])
+        return fastest_result[0], fastest_result[1]
+
+    def close(self):
+        if self.worker_pool is not None:
+            self.worker_pool.close()
+            self.worker_pool.join()
+            self.worker_pool = None
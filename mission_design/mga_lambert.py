@@ -0,0 +1,404 @@
+"""
+# MGA trajectory optimization - Vectorized Lambert solver and flyby Delta V
+Copyright (c) 2010-2022, Delft University of Technology. All rights reserved. This file is part of the Tudat. Redistribution  and use in source and binary forms, with or without modification, are permitted exclusively under the terms of the Modified BSD license. You should have received a copy of the license with this file. If not, please or visit: http://tudat.tudelft.nl/LICENSE.
+
+This module is used by the MGA optimization and porkchop examples, to evaluate many independent transfers at once with NumPy, instead of one at a time through a transfer trajectory object.
+
+`solve_lambert()` implements the Lambert solver of Izzo (2015), "Revisiting Lambert's problem", for arrays of departure and arrival positions and times of flight, including multi-revolution transfers. The Delta V at the nodes of a transfer follows from `get_escape_or_capture_delta_v()` for the departure and arrival, and from `get_powered_flyby_delta_v()` (the Delta V applied at the pericenter of a swingby, as used by the swingby nodes of Tudat) or `get_unpowered_flyby_delta_v()` (the velocity mismatch left by a swingby without Delta V) for the flybys.
+
+The `UnpoweredMgaDeltaV` class combines these into the total Delta V of an MGA transfer with unpowered, unperturbed legs, taking the states of the bodies from ephemeris tables (see `mga_ephemeris.py`). Likewise, `get_porkchop_delta_v()` computes the Lambert arc Delta V of a complete grid of departure and arrival epochs at once. The results of both should be validated against `TransferTrajectory.evaluate()` (or the `porkchop` module) with `get_maximum_relative_difference()`.
+"""
+
+
+# Load standard modules
+import numpy as np
+
+
+# Minimum pericenter radii [m] of the swingbys, equal to the defaults used by the MGA settings of Tudat
+DEFAULT_MINIMUM_PERICENTER_RADII = {'Mercury': 2639.7E3,
+                                    'Venus': 6251.8E3,
+                                    'Earth': 6578.1E3,
+                                    'Mars': 3596.2E3,
+                                    'Jupiter': 72.0E6,
+                                    'Saturn': 61.0E6,
+                                    'Uranus': 26.0E6,
+                                    'Neptune': 25.0E6}
+
+
+def get_hypergeometric_function(z,
+                                tolerance=1.0E-11):
+    # Hypergeometric function 2F1(3, 1, 5/2, z), used by Battin's series close to the parabola
+    term = np.ones_like(z)
+    series_sum = np.ones_like(z)
+    j = 0
+    while np.any(np.abs(term) > tolerance) and j < 100:
+        term = term * (3.0 + j) * (1.0 + j) / (2.5 + j) * z / (j + 1.0)
+        series_sum = series_sum + term
+        j += 1
+    return series_sum
+
+
+def get_time_of_flight(x,
+                       number_of_revolutions,
+                       lambda_parameter):
+    # Non-dimensional time of flight as function of the Izzo variable x, using Battin's series close to the parabola,
+    # Lagrange's expression close to it, and Lancaster's expression elsewhere
+    with np.errstate(invalid='ignore', divide='ignore'):
+        distance_to_parabola = np.abs(x - 1.0)
+        lambda_squared = lambda_parameter ** 2
+        energy = x ** 2 - 1.0
+        rho = np.abs(energy)
+        z = np.sqrt(1.0 + lambda_squared * energy)
+
+        # Battin's series
+        eta = z - lambda_parameter * x
+        s1 = 0.5 * (1.0 - lambda_parameter - x * eta)
+        q = 4.0 / 3.0 * get_hypergeometric_function(np.where(distance_to_parabola < 0.01, s1, 0.0))
+        battin_time = (eta ** 3 * q + 4.0 * lambda_parameter * eta) / 2.0 \
+                      + number_of_revolutions * np.pi / rho ** 1.5
+
+        # Lagrange's expression
+        a = 1.0 / (1.0 - x ** 2)
+        alpha_ellipse = 2.0 * np.arccos(np.clip(x, -1.0, 1.0))
+        beta_ellipse = np.sign(lambda_parameter) * 2.0 * np.arcsin(np.sqrt(np.clip(lambda_squared / a, 0.0, 1.0)))
+        alpha_hyperbola = 2.0 * np.arccosh(np.maximum(x, 1.0))
+        beta_hyperbola = np.sign(lambda_parameter) * 2.0 * np.arcsinh(np.sqrt(np.maximum(-lambda_squared / a, 0.0)))
+        lagrange_time = np.where(
+            a > 0.0,
+            a * np.sqrt(np.abs(a)) * ((alpha_ellipse - np.sin(alpha_ellipse)) - (beta_ellipse - np.sin(beta_ellipse))
+                                      + 2.0 * np.pi * number_of_revolutions) / 2.0,
+            -a * np.sqrt(np.abs(a)) * ((beta_hyperbola - np.sinh(beta_hyperbola))
+                                       - (alpha_hyperbola - np.sinh(alpha_hyperbola))) / 2.0)
+
+        # Lancaster's expression
+        y = np.sqrt(rho)
+        g = x * z - lambda_parameter * energy
+        d = np.where(energy < 0.0,
+                     number_of_revolutions * np.pi + np.arccos(np.clip(g, -1.0, 1.0)),
+                     np.log(np.abs(y * (z - lambda_parameter * x) + g)))
+        lancaster_time = (x - lambda_parameter * z - d / y) / energy
+
+    return np.where(distance_to_parabola < 0.01, battin_time,
+                    np.where(distance_to_parabola < 0.2, lagrange_time, lancaster_time))
+
+
+def get_time_of_flight_derivatives(x,
+                                   time_of_flight,
+                                   lambda_parameter):
+    # First three derivatives of the non-dimensional time of flight with respect to x
+    with np.errstate(invalid='ignore', divide='ignore'):
+        one_minus_x_squared = 1.0 - x ** 2
+        lambda_squared = lambda_parameter ** 2
+        y = np.sqrt(1.0 - lambda_squared * one_minus_x_squared)
+        first_derivative = (3.0 * time_of_flight * x - 2.0 + 2.0 * lambda_parameter ** 3 * x / y) / one_minus_x_squared
+        second_derivative = (3.0 * time_of_flight + 5.0 * x * first_derivative
+                             + 2.0 * (1.0 - lambda_squared) * lambda_parameter ** 3 / y ** 3) / one_minus_x_squared
+        third_derivative = (7.0 * x * second_derivative + 8.0 * first_derivative
+                            - 6.0 * (1.0 - lambda_squared) * lambda_parameter ** 5 * x / y ** 5) / one_minus_x_squared
+    return first_derivative, second_derivative, third_derivative
+
+
+def solve_time_of_flight_equation(time_of_flight,
+                                  initial_x,
+                                  number_of_revolutions,
+                                  lambda_parameter,
+                                  tolerance=1.0E-11,
+                                  maximum_iterations=20):
+    # Householder iterations on the time of flight equation, for all transfers at once
+    x = initial_x
+    for _ in range(maximum_iterations):
+        current_time_of_flight = get_time_of_flight(x, number_of_revolutions, lambda_parameter)
+        time_of_flight_error = current_time_of_flight - time_of_flight
+        first_derivative, second_derivative, third_derivative = get_time_of_flight_derivatives(
+            x, current_time_of_flight, lambda_parameter)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            step = time_of_flight_error * (first_derivative ** 2 - time_of_flight_error * second_derivative / 2.0) \
+                   / (first_derivative * (first_derivative ** 2 - time_of_flight_error * second_derivative)
+                      + third_derivative * time_of_flight_error ** 2 / 6.0)
+        x = x - step
+        if not np.any(np.abs(step) > tolerance):
+            break
+    return x
+
+
+def get_minimum_time_of_flight(number_of_revolutions,
+                               lambda_parameter,
+                               maximum_iterations=12):
+    # Halley iterations on the first derivative of the time of flight, which is zero at the minimum time of flight
+    x = np.zeros_like(lambda_parameter)
+    minimum_time_of_flight = get_time_of_flight(x, number_of_revolutions, lambda_parameter)
+    for _ in range(maximum_iterations):
+        first_derivative, second_derivative, third_derivative = get_time_of_flight_derivatives(
+            x, minimum_time_of_flight, lambda_parameter)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            x = np.where(first_derivative != 0.0,
+                         x - first_derivative * second_derivative
+                         / (second_derivative ** 2 - first_derivative * third_derivative / 2.0),
+                         x)
+        minimum_time_of_flight = get_time_of_flight(x, number_of_revolutions, lambda_parameter)
+    return minimum_time_of_flight
+
+
+def solve_lambert(departure_positions,
+                  arrival_positions,
+                  times_of_flight,
+                  gravitational_parameter,
+                  number_of_revolutions=0,
+                  is_prograde=True,
+                  is_right_branch=False):
+    departure_positions = np.atleast_2d(np.asarray(departure_positions, dtype=float))
+    arrival_positions = np.atleast_2d(np.asarray(arrival_positions, dtype=float))
+    times_of_flight = np.broadcast_to(np.asarray(times_of_flight, dtype=float), len(departure_positions))
+
+    # Geometry of the transfers
+    chord = np.linalg.norm(arrival_positions - departure_positions, axis=1)
+    departure_radius = np.linalg.norm(departure_positions, axis=1)
+    arrival_radius = np.linalg.norm(arrival_positions, axis=1)
+    semi_perimeter = (departure_radius + arrival_radius + chord) / 2.0
+    departure_direction = departure_positions / departure_radius[:, np.newaxis]
+    arrival_direction = arrival_positions / arrival_radius[:, np.newaxis]
+    angular_momentum_direction = np.cross(departure_direction, arrival_direction)
+    angular_momentum_direction /= np.linalg.norm(angular_momentum_direction, axis=1)[:, np.newaxis]
+
+    # Transfer angles above 180 degrees (for prograde transfers, with respect to the z-axis) have a negative lambda
+    lambda_parameter = np.sqrt(np.maximum(1.0 - chord / semi_perimeter, 0.0))
+    transfer_direction = np.where(angular_momentum_direction[:, 2] < 0.0, -1.0, 1.0)
+    if not is_prograde:
+        transfer_direction = -transfer_direction
+    lambda_parameter = transfer_direction * lambda_parameter
+    departure_tangential_direction = transfer_direction[:, np.newaxis] \
+                                     * np.cross(angular_momentum_direction, departure_direction)
+    arrival_tangential_direction = transfer_direction[:, np.newaxis] \
+                                   * np.cross(angular_momentum_direction, arrival_direction)
+
+    # Non-dimensional time of flight
+    time_of_flight = np.sqrt(2.0 * gravitational_parameter / semi_perimeter ** 3) * times_of_flight
+
+    # Initial guess of the Izzo variable x, and solution of the time of flight equation
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if number_of_revolutions == 0:
+            time_of_flight_00 = np.arccos(lambda_parameter) + lambda_parameter * np.sqrt(1.0 - lambda_parameter ** 2)
+            time_of_flight_1 = 2.0 / 3.0 * (1.0 - lambda_parameter ** 3)
+            initial_x = np.where(
+                time_of_flight >= time_of_flight_00,
+                (time_of_flight_00 / time_of_flight) ** (2.0 / 3.0) - 1.0,
+                np.where(time_of_flight <= time_of_flight_1,
+                         2.5 * time_of_flight_1 / time_of_flight * (time_of_flight_1 - time_of_flight)
+                         / (1.0 - lambda_parameter ** 5) + 1.0,
+                         (time_of_flight / time_of_flight_00) ** (np.log(2.0) / np.log(time_of_flight_1
+                                                                                      / time_of_flight_00)) - 1.0))
+            is_feasible = np.ones(len(time_of_flight), dtype=bool)
+        else:
+            # Multi-revolution transfers only exist above the minimum time of flight, and have a left and right branch
+            is_feasible = time_of_flight >= get_minimum_time_of_flight(number_of_revolutions, lambda_parameter)
+            if is_right_branch:
+                guess_term = (8.0 * time_of_flight / (number_of_revolutions * np.pi)) ** (2.0 / 3.0)
+            else:
+                guess_term = ((number_of_revolutions * np.pi + np.pi) / (8.0 * time_of_flight)) ** (2.0 / 3.0)
+            initial_x = (guess_term - 1.0) / (guess_term + 1.0)
+    x = solve_time_of_flight_equation(time_of_flight, initial_x, number_of_revolutions, lambda_parameter)
+
+    # Reconstruct the terminal velocities from the solution
+    with np.errstate(invalid='ignore', divide='ignore'):
+        gamma = np.sqrt(gravitational_parameter * semi_perimeter / 2.0)
+        rho = (departure_radius - arrival_radius) / chord
+        sigma = np.sqrt(1.0 - rho ** 2)
+        y = np.sqrt(1.0 - lambda_parameter ** 2 + lambda_parameter ** 2 * x ** 2)
+        departure_radial_velocity = gamma * ((lambda_parameter * y - x)
+                                             - rho * (lambda_parameter * y + x)) / departure_radius
+        arrival_radial_velocity = -gamma * ((lambda_parameter * y - x)
+                                            + rho * (lambda_parameter * y + x)) / arrival_radius
+        tangential_velocity = gamma * sigma * (y + lambda_parameter * x)
+    departure_velocities = departure_radial_velocity[:, np.newaxis] * departure_direction \
+                           + (tangential_velocity / departure_radius)[:, np.newaxis] * departure_tangential_direction
+    arrival_velocities = arrival_radial_velocity[:, np.newaxis] * arrival_direction \
+                         + (tangential_velocity / arrival_radius)[:, np.newaxis] * arrival_tangential_direction
+
+    # Transfers without solution get NaN velocities
+    departure_velocities[~is_feasible] = np.nan
+    arrival_velocities[~is_feasible] = np.nan
+    return departure_velocities, arrival_velocities
+
+
+def get_escape_or_capture_delta_v(gravitational_parameter,
+                                  semi_major_axis,
+                                  eccentricity,
+                                  excess_velocity):
+    # Delta V at the pericenter of the departure (arrival) orbit, to reach (leave) the hyperbolic excess velocity.
+    # For an infinite semi-major axis, the Delta V is the excess velocity itself
+    pericenter_radius = semi_major_axis * (1.0 - eccentricity)
+    return np.abs(np.sqrt(excess_velocity ** 2 + 2.0 * gravitational_parameter / pericenter_radius)
+                  - np.sqrt(gravitational_parameter / pericenter_radius * (1.0 + eccentricity)))
+
+
+def get_bending_angles(incoming_excess_velocities,
+                       outgoing_excess_velocities,
+                       gravitational_parameter,
+                       minimum_pericenter_radius):
+    incoming_speed = np.linalg.norm(incoming_excess_velocities, axis=-1)
+    outgoing_speed = np.linalg.norm(outgoing_excess_velocities, axis=-1)
+
+    # Angle between the incoming and outgoing excess velocities
+    with np.errstate(invalid='ignore', divide='ignore'):
+        bending_angle = np.arccos(np.clip(np.sum(incoming_excess_velocities * outgoing_excess_velocities, axis=-1)
+                                          / (incoming_speed * outgoing_speed), -1.0, 1.0))
+
+    # Largest angle over which a hyperbola with the minimum pericenter can bend the velocity
+    maximum_bending_angle = np.arcsin(1.0 / (1.0 + minimum_pericenter_radius * incoming_speed ** 2
+                                             / gravitational_parameter)) \
+                            + np.arcsin(1.0 / (1.0 + minimum_pericenter_radius * outgoing_speed ** 2
+                                               / gravitational_parameter))
+    return incoming_speed, outgoing_speed, bending_angle, maximum_bending_angle
+
+
+def get_powered_flyby_delta_v(incoming_excess_velocities,
+                              outgoing_excess_velocities,
+                              gravitational_parameter,
+                              minimum_pericenter_radius,
+                              number_of_bisections=60):
+    incoming_speed, outgoing_speed, bending_angle, maximum_bending_angle = get_bending_angles(
+        incoming_excess_velocities, outgoing_excess_velocities, gravitational_parameter, minimum_pericenter_radius)
+
+    # If the required bending exceeds the maximum, the pericenter is the minimum one, and the remaining bending is
+    # provided by the Delta V
+    bending_effect_delta_v = np.where(bending_angle > maximum_bending_angle,
+                                      2.0 * np.minimum(incoming_speed, outgoing_speed)
+                                      * np.sin((bending_angle - maximum_bending_angle) / 2.0),
+                                      0.0)
+
+    # Otherwise, find the pericenter for which the incoming and outgoing hyperbolas provide the required bending, by
+    # bisection on the logarithm of the pericenter radius
+    def get_bending_residual(pericenter_radius):
+        return np.arcsin(1.0 / (1.0 + pericenter_radius * incoming_speed ** 2 / gravitational_parameter)) \
+            + np.arcsin(1.0 / (1.0 + pericenter_radius * outgoing_speed ** 2 / gravitational_parameter)) \
+            - bending_angle
+
+    lower_log_radius = np.log(np.broadcast_to(minimum_pericenter_radius, bending_angle.shape)).astype(float)
+    upper_log_radius = np.log(np.maximum(np.pi * gravitational_parameter
+                                         / (np.minimum(incoming_speed, outgoing_speed) ** 2
+                                            * np.maximum(bending_angle, 1.0E-12)),
+                                         minimum_pericenter_radius) * 2.0)
+    for _ in range(number_of_bisections):
+        middle_log_radius = (lower_log_radius + upper_log_radius) / 2.0
+        is_residual_positive = get_bending_residual(np.exp(middle_log_radius)) > 0.0
+        lower_log_radius = np.where(is_residual_positive, middle_log_radius, lower_log_radius)
+        upper_log_radius = np.where(is_residual_positive, upper_log_radius, middle_log_radius)
+    pericenter_radius = np.where(bending_angle > maximum_bending_angle,
+                                 minimum_pericenter_radius,
+                                 np.exp((lower_log_radius + upper_log_radius) / 2.0))
+
+    # Delta V at the pericenter to change the magnitude of the excess velocity
+    velocity_effect_delta_v = np.abs(np.sqrt(incoming_speed ** 2 + 2.0 * gravitational_parameter / pericenter_radius)
+                                     - np.sqrt(outgoing_speed ** 2 + 2.0 * gravitational_parameter / pericenter_radius))
+    return velocity_effect_delta_v + bending_effect_delta_v
+
+
+def get_unpowered_flyby_delta_v(incoming_excess_velocities,
+                                outgoing_excess_velocities,
+                                gravitational_parameter,
+                                minimum_pericenter_radius):
+    incoming_speed, outgoing_speed, bending_angle, _ = get_bending_angles(
+        incoming_excess_velocities, outgoing_excess_velocities, gravitational_parameter, minimum_pericenter_radius)
+
+    # Without Delta V, the magnitude of the excess velocity is conserved. The maximum bending angle then follows from
+    # the incoming excess velocity for both hyperbolas
+    maximum_bending_angle = 2.0 * np.arcsin(1.0 / (1.0 + minimum_pericenter_radius * incoming_speed ** 2
+                                                   / gravitational_parameter))
+
+    # Difference between the required outgoing excess velocity, and the closest one that can be reached
+    remaining_angle = np.maximum(bending_angle - maximum_bending_angle, 0.0)
+    return np.sqrt(np.maximum(incoming_speed ** 2 + outgoing_speed ** 2
+                              - 2.0 * incoming_speed * outgoing_speed * np.cos(remaining_angle), 0.0))
+
+
+class UnpoweredMgaDeltaV:
+
+    def __init__(self,
+                 transfer_body_order,
+                 ephemeris_tables,
+                 central_body_gravitational_parameter,
+                 body_gravitational_parameters,
+                 minimum_pericenter_radii,
+                 departure_orbit=(np.inf, 0.0),
+                 arrival_orbit=(np.inf, 0.0),
+                 penalty_delta_v=1.0E10):
+        self.transfer_body_order = transfer_body_order
+        self.ephemeris_tables = ephemeris_tables
+        self.central_body_gravitational_parameter = central_body_gravitational_parameter
+        self.body_gravitational_parameters = body_gravitational_parameters
+        self.minimum_pericenter_radii = minimum_pericenter_radii
+        self.departure_orbit = departure_orbit
+        self.arrival_orbit = arrival_orbit
+        self.penalty_delta_v = penalty_delta_v
+
+    def get_node_delta_v(self,
+                         node_times):
+        node_times = np.atleast_2d(node_times)
+        number_of_nodes = len(self.transfer_body_order)
+
+        # Retrieve the states of the bodies at all node times from the ephemeris tables
+        body_states = [self.ephemeris_tables[body_name].get_states(node_times[:, node])
+                       for node, body_name in enumerate(self.transfer_body_order)]
+
+        # Solve the Lambert problems of each leg for all transfers at once
+        leg_velocities = [solve_lambert(body_states[node][:, :3],
+                                        body_states[node + 1][:, :3],
+                                        node_times[:, node + 1] - node_times[:, node],
+                                        self.central_body_gravitational_parameter)
+                          for node in range(number_of_nodes - 1)]
+
+        # Delta V at the departure, at each swingby, and at the arrival
+        node_delta_v = np.zeros((len(node_times), number_of_nodes))
+        first_body, last_body = self.transfer_body_order[0], self.transfer_body_order[-1]
+        node_delta_v[:, 0] = get_escape_or_capture_delta_v(
+            self.body_gravitational_parameters[first_body],
+            *self.departure_orbit,
+            np.linalg.norm(leg_velocities[0][0] - body_states[0][:, 3:], axis=1))
+        for node in range(1, number_of_nodes - 1):
+            body_name = self.transfer_body_order[node]
+            node_delta_v[:, node] = get_powered_flyby_delta_v(leg_velocities[node - 1][1] - body_states[node][:, 3:],
+                                                              leg_velocities[node][0] - body_states[node][:, 3:],
+                                                              self.body_gravitational_parameters[body_name],
+                                                              self.minimum_pericenter_radii[body_name])
+        node_delta_v[:, -1] = get_escape_or_capture_delta_v(
+            self.body_gravitational_parameters[last_body],
+            *self.arrival_orbit,
+            np.linalg.norm(leg_velocities[-1][1] - body_states[-1][:, 3:], axis=1))
+        return node_delta_v
+
+    def get_delta_v(self,
+                    node_times):
+        # Total Delta V of each transfer, with a penalty for transfers without a solution
+        total_delta_v = np.sum(self.get_node_delta_v(node_times), axis=1)
+        return np.where(np.isfinite(total_delta_v), total_delta_v, self.penalty_delta_v)
+
+
+def get_porkchop_delta_v(departure_ephemeris_table,
+                         arrival_ephemeris_table,
+                         departure_epochs,
+                         arrival_epochs,
+                         central_body_gravitational_parameter):
+    # Combine all departure and arrival epochs, of which only the transfers arriving after their departure are solved
+    departure_grid, arrival_grid = np.meshgrid(departure_epochs, arrival_epochs, indexing='ij')
+    is_valid = arrival_grid > departure_grid
+    departure_states = departure_ephemeris_table.get_states(departure_grid[is_valid])
+    arrival_states = arrival_ephemeris_table.get_states(arrival_grid[is_valid])
+    departure_velocities, arrival_velocities = solve_lambert(departure_states[:, :3],
+                                                             arrival_states[:, :3],
+                                                             arrival_grid[is_valid] - departure_grid[is_valid],
+                                                             central_body_gravitational_parameter)
+
+    # Departure and arrival Delta V of each transfer, equal to the excess velocities, in the same layout as the grid
+    # returned by the porkchop module
+    delta_v = np.full(departure_grid.shape + (2,), np.nan)
+    delta_v[is_valid, 0] = np.linalg.norm(departure_velocities - departure_states[:, 3:], axis=1)
+    delta_v[is_valid, 1] = np.linalg.norm(arrival_velocities - arrival_states[:, 3:], axis=1)
+    return delta_v
+
+
+def get_maximum_relative_difference(reference_delta_v,
+                                    delta_v):
+    # Largest relative difference between two sets of Delta V values, ignoring penalized transfers in the reference
+    reference_delta_v = np.asarray(reference_delta_v, dtype=float)
+    is_valid = reference_delta_v < 1.0E9
+    return np.max(np.abs(np.asarray(delta_v)[is_valid] - reference_delta_v[is_valid]) / reference_delta_v[is_valid])
@@ -0,0 +1,147 @@
+"""
+# MGA trajectory optimization - Leg-by-leg tree search
+Copyright (c) 2010-2022, Delft University of Technology. All rights reserved. This file is part of the Tudat. Redistribution  and use in source and binary forms, with or without modification, are permitted exclusively under the terms of the Modified BSD license. You should have received a copy of the license with this file. If not, please or visit: http://tudat.tudelft.nl/LICENSE.
+
+This module is used by the Cassini 1 MGA optimization example, to find good initial trajectories before the optimization. The `MgaTreeSearch` class builds MGA transfers with unpowered legs one leg at a time, over a grid of departure epochs and a grid of times of flight for each leg, using the vectorized Lambert solver and flyby Delta V of `mga_lambert.py`.
+
+The Delta V of a partial trajectory (the departure, and the swingbys of which both legs are known) can only increase when legs are added. Partial trajectories of which the accumulated Delta V already exceeds that of the best complete trajectory found so far (the incumbent) are therefore pruned, without evaluating the remaining legs. The incumbent is found by a first search with a narrow beam. Afterwards, a search with a wide beam keeps the partial trajectories with the lowest Delta V at each leg, up to the beam width, of which those above the incumbent are discarded.
+
+The best complete trajectories, converted to decision vectors by `MgaTreeSearch.get_decision_vectors()`, can be used as initial individuals of the optimization.
+"""
+
+
+# Load standard modules
+import numpy as np
+
+# Load the vectorized Lambert solver and flyby Delta V, located next to this file
+from mga_lambert import solve_lambert, get_escape_or_capture_delta_v, get_powered_flyby_delta_v
+
+
+class MgaTreeSearch:
+
+    def __init__(self,
+                 mga_delta_v,
+                 departure_epochs,
+                 legs_times_of_flight,
+                 beam_width=1000,
+                 incumbent_beam_width=10,
+                 maximum_delta_v=np.inf):
+        self.mga_delta_v = mga_delta_v
+        self.departure_epochs = np.asarray(departure_epochs, dtype=float)
+        self.legs_times_of_flight = [np.asarray(times_of_flight, dtype=float)
+                                     for times_of_flight in legs_times_of_flight]
+        self.beam_width = beam_width
+        self.incumbent_beam_width = incumbent_beam_width
+        self.maximum_delta_v = maximum_delta_v
+
+        # Results of the search: the complete trajectories in the final beam, sorted by Delta V
+        self.node_times = None
+        self.delta_v = None
+        self.number_of_evaluated_legs = 0
+        self.number_of_pruned_legs = 0
+
+    def get_leg_delta_v(self,
+                        node_times,
+                        incoming_velocities,
+                        leg_index):
+        mga_delta_v = self.mga_delta_v
+        body_order = mga_delta_v.transfer_body_order
+
+        # Solve the Lambert problem of the new leg of all partial trajectories at once
+        departure_states = mga_delta_v.ephemeris_tables[body_order[leg_index]].get_states(node_times[:, leg_index])
+        arrival_states = mga_delta_v.ephemeris_tables[body_order[leg_index + 1]].get_states(
+            node_times[:, leg_index + 1])
+        departure_velocities, arrival_velocities = solve_lambert(departure_states[:, :3],
+                                                                 arrival_states[:, :3],
+                                                                 node_times[:, leg_index + 1]
+                                                                 - node_times[:, leg_index],
+                                                                 mga_delta_v.central_body_gravitational_parameter)
+
+        # The new leg completes the departure, or the swingby at its first node
+        body_name = body_order[leg_index]
+        if leg_index == 0:
+            leg_delta_v = get_escape_or_capture_delta_v(
+                mga_delta_v.body_gravitational_parameters[body_name],
+                *mga_delta_v.departure_orbit,
+                np.linalg.norm(departure_velocities - departure_states[:, 3:], axis=1))
+        else:
+            leg_delta_v = get_powered_flyby_delta_v(incoming_velocities - departure_states[:, 3:],
+                                                    departure_velocities - departure_states[:, 3:],
+                                                    mga_delta_v.body_gravitational_parameters[body_name],
+                                                    mga_delta_v.minimum_pericenter_radii[body_name])
+
+        # The last leg also completes the arrival
+        if leg_index == len(body_order) - 2:
+            leg_delta_v = leg_delta_v + get_escape_or_capture_delta_v(
+                mga_delta_v.body_gravitational_parameters[body_order[-1]],
+                *mga_delta_v.arrival_orbit,
+                np.linalg.norm(arrival_velocities - arrival_states[:, 3:], axis=1))
+        return leg_delta_v, arrival_velocities
+
+    def run_beam_search(self,
+                        beam_width,
+                        incumbent_delta_v):
+        # Start with one partial trajectory per departure epoch, without legs
+        node_times = self.departure_epochs[:, np.newaxis]
+        delta_v = np.zeros(len(node_times))
+        incoming_velocities = np.zeros((len(node_times), 3))
+
+        for leg_index, times_of_flight in enumerate(self.legs_times_of_flight):
+
+            # Extend each partial trajectory with each time of flight of the new leg
+            number_of_partial_trajectories = len(node_times)
+            node_times = np.column_stack((np.repeat(node_times, len(times_of_flight), axis=0),
+                                          np.repeat(node_times[:, -1], len(times_of_flight))
+                                          + np.tile(times_of_flight, number_of_partial_trajectories)))
+            delta_v = np.repeat(delta_v, len(times_of_flight))
+            incoming_velocities = np.repeat(incoming_velocities, len(times_of_flight), axis=0)
+
+            # Add the Delta V completed by the new leg
+            leg_delta_v, incoming_velocities = self.get_leg_delta_v(node_times, incoming_velocities, leg_index)
+            delta_v = delta_v + leg_delta_v
+            self.number_of_evaluated_legs += len(delta_v)
+
+            # Prune the partial trajectories without solution, or with more Delta V than the incumbent
+            is_kept = np.isfinite(delta_v) & (delta_v <= incumbent_delta_v)
+            self.number_of_pruned_legs += np.count_nonzero(~is_kept)
+            node_times, delta_v, incoming_velocities = \
+                node_times[is_kept], delta_v[is_kept], incoming_velocities[is_kept]
+
+            # Keep the partial trajectories with the lowest Delta V, up to the beam width
+            if len(delta_v) > beam_width:
+                kept_indices = np.argpartition(delta_v, beam_width)[:beam_width]
+                self.number_of_pruned_legs += len(delta_v) - beam_width
+                node_times, delta_v, incoming_velocities = \
+                    node_times[kept_indices], delta_v[kept_indices], incoming_velocities[kept_indices]
+
+        # Sort the complete trajectories by Delta V
+        sorted_indices = np.argsort(delta_v)
+        return node_times[sorted_indices], delta_v[sorted_indices]
+
+    def search(self):
+        self.number_of_evaluated_legs = 0
+        self.number_of_pruned_legs = 0
+
+        # Find an incumbent with a narrow beam, which is then used to prune the search with the wide beam
+        incumbent_delta_v = self.maximum_delta_v
+        for beam_width in (self.incumbent_beam_width, self.beam_width):
+            self.node_times, self.delta_v = self.run_beam_search(beam_width, incumbent_delta_v)
+            if len(self.delta_v) > 0:
+                incumbent_delta_v = min(incumbent_delta_v, self.delta_v[0])
+        return self.node_times, self.delta_v
+
+    def get_pruned_fraction(self):
+        # Fraction of all partial trajectories evaluated during the search that was discarded
+        return self.number_of_pruned_legs / max(self.number_of_evaluated_legs, 1)
+
+    def get_decision_vectors(self,
+                             number_of_trajectories):
+        # Without any complete trajectory (e.g., if all were pruned by the maximum Delta V), no decision vectors can be
+        # returned, and the individuals are not replaced
+        if self.node_times is None or len(self.node_times) == 0:
+            print('Warning: the tree search found no complete trajectory, so no decision vectors are returned')
+            return np.zeros((0, len(self.legs_times_of_flight) + 1))
+
+        # Convert the node times of the best complete trajectories to a departure epoch and times of flight
+        node_times = self.node_times[:number_of_trajectories]
+        return np.column_stack((node_times[:, 0], np.diff(node_times, axis=1)))
@@ -0,0 +1,68 @@
+"""
+# MGA trajectory optimization - Worker processes
+Copyright (c) 2010-2022, Delft University of Technology. All rights reserved. This file is part of the Tudat. Redistribution  and use in source and binary forms, with or without modification, are permitted exclusively under the terms of the Modified BSD license. You should have received a copy of the license with this file. If not, please or visit: http://tudat.tudelft.nl/LICENSE.
+
+This module is used by the Cassini 1 MGA optimization example, to evaluate transfer trajectories in parallel. A `TransferTrajectory` object keeps the state of its last evaluation, so it can not be shared by several evaluations running at the same time.
+
+Each worker process of the pool therefore creates its own system of bodies, transfer leg and node settings, and `TransferTrajectory` object once, through `initialize_transfer_trajectory_worker()`. The settings are created inside the worker from plain data (the body names and orbits), because the tudatpy settings objects can not be sent to another process. Afterwards, only the node times and free parameters of each trajectory, and the resulting Delta V, are sent between the processes.
+
+The `TransferTrajectory` objects are created by `get_transfer_trajectory_object()`, and cached for the lifetime of the process. The `TransferTrajectoryProblem` of the example uses the same function to recreate its transfer trajectory object from plain data in each process to which PyGMO sends it (e.g., the islands of a `pg.mp_island` archipelago).
+"""
+
+
+# Load standard modules
+import functools
+
+# Load tudatpy modules
+from tudatpy.numerical_simulation import environment_setup
+from tudatpy.trajectory_design import transfer_trajectory
+
+
+# Transfer trajectory object of the current worker process, created once by initialize_transfer_trajectory_worker()
+worker_transfer_trajectory_object = None
+
+
+@functools.lru_cache(maxsize=None)
+def get_transfer_trajectory_object(transfer_body_order,
+                                   central_body,
+                                   departure_orbit,
+                                   arrival_orbit):
+    # Create the simplified system of bodies of this process
+    bodies = environment_setup.create_simplified_system_of_bodies()
+
+    # Define the trajectory settings for both the legs and at the nodes
+    transfer_leg_settings, transfer_node_settings = transfer_trajectory.mga_settings_unpowered_unperturbed_legs(
+        list(transfer_body_order),
+        departure_orbit=departure_orbit,
+        arrival_orbit=arrival_orbit)
+
+    # Create the transfer calculation object, only once per process for the same (hashable) arguments
+    return transfer_trajectory.create_transfer_trajectory(bodies,
+                                                          transfer_leg_settings,
+                                                          transfer_node_settings,
+                                                          list(transfer_body_order),
+                                                          central_body)
+
+
+def initialize_transfer_trajectory_worker(transfer_body_order,
+                                          central_body,
+                                          departure_orbit,
+                                          arrival_orbit):
+    global worker_transfer_trajectory_object
+
+    # Create (or retrieve) the transfer calculation object of this worker
+    worker_transfer_trajectory_object = get_transfer_trajectory_object(tuple(transfer_body_order),
+                                                                       central_body,
+                                                                       tuple(departure_orbit),
+                                                                       tuple(arrival_orbit))
+
+
+def evaluate_delta_v_in_worker(node_times,
+                               leg_free_parameters,
+                               node_free_parameters):
+    # Evaluate the trajectory, using a very large Delta V as penalty if the evaluation failed
+    try:
+        worker_transfer_trajectory_object.evaluate(node_times, leg_free_parameters, node_free_parameters)
+        return worker_transfer_trajectory_object.delta_v
+    except:
+        return 1e10
@@ -0,0 +1,240 @@
+"""
+# Porkchop plots - Adaptive refinement
+Copyright (c) 2010-2024, Delft University of Technology. All rights reserved. This file is part of the Tudat. Redistribution  and use in source and binary forms, with or without modification, are permitted exclusively under the terms of the Modified BSD license. You should have received a copy of the license with this file. If not, please or visit: http://tudat.tudelft.nl/LICENSE.
+
+This module is used by the low-thrust porkchop example, to compute a porkchop plot with far fewer evaluations of the Delta V function than the uniform grid of the `porkchop` function. The departure and arrival epochs are discretized in the same way (see `porkchop_parallel.py`), but the Delta V is first only evaluated on a coarse grid, of which each cell spans a number of steps of the time resolution.
+
+The `PorkchopQuadtree` class then splits each cell into four (or two, at the time resolution in one of the directions), level by level, but only if the cell is of interest for the plot:
+
+* The cell is crossed by the contour of the Delta V threshold of the plot (in km/s, as for `plot_porkchop`), or borders the region in which the arrival precedes the departure while a corner is below the threshold.
+* A corner of the cell is a local minimum below the threshold (lower than all other corners of the cells that contain it), or the best epoch combination found so far.
+* The Delta V changes along an edge of the cell, below the threshold, by more than a tolerance relative to the lowest value, which marks a discontinuity (e.g., a change in the number of revolutions) or a steep gradient.
+
+The cells that are not split are the leaves of the quadtree. `PorkchopQuadtree.get_delta_v_map()` fills the complete grid, interpolating bilinearly between the corners of each leaf, such that the result can be plotted with `plot_porkchop`.
+"""
+
+
+# Load standard modules
+import numpy as np
+
+# Epochs of the porkchop plot
+from porkchop_parallel import get_porkchop_epochs
+
+
+class PorkchopQuadtree:
+
+    def __init__(self,
+                 bodies,
+                 departure_body,
+                 target_body,
+                 departure_epochs,
+                 arrival_epochs,
+                 function_to_calculate_delta_v,
+                 threshold,
+                 total=False,
+                 coarse_cell_size=16,
+                 discontinuity_tolerance=0.5):
+        self.bodies = bodies
+        self.departure_body = departure_body
+        self.target_body = target_body
+        self.departure_epochs = departure_epochs
+        self.arrival_epochs = arrival_epochs
+        self.function_to_calculate_delta_v = function_to_calculate_delta_v
+        self.threshold = threshold
+        self.total = total
+        self.coarse_cell_size = coarse_cell_size
+        self.discontinuity_tolerance = discontinuity_tolerance
+
+        # Delta V at the evaluated epoch combinations (undefined if the arrival does not follow the departure), and the
+        # leaves of the quadtree, as the first and last indices of their departure and arrival epochs
+        self.delta_v = np.full((len(departure_epochs), len(arrival_epochs), 2), np.nan)
+        self.is_evaluated = np.zeros((len(departure_epochs), len(arrival_epochs)), dtype=bool)
+        self.leaf_cells = []
+        self.number_of_evaluations = 0
+
+    def evaluate_node(self,
+                      node):
+        if not self.is_evaluated[node]:
+            departure_epoch = self.departure_epochs[node[0]]
+            arrival_epoch = self.arrival_epochs[node[1]]
+            if arrival_epoch > departure_epoch:
+                self.delta_v[node] = self.function_to_calculate_delta_v(
+                    self.bodies, self.departure_body, self.target_body, departure_epoch, arrival_epoch)
+                self.number_of_evaluations += 1
+            self.is_evaluated[node] = True
+
+    def get_node_value(self,
+                       node):
+        # Delta V compared with the threshold, in km/s, as plotted by plot_porkchop
+        return (np.sum(self.delta_v[node]) if self.total else np.max(self.delta_v[node])) / 1e3
+
+    def get_coarse_cells(self):
+        # Split the grid into cells of the coarse cell size, the last cells being smaller if necessary
+        departure_boundaries = list(range(0, len(self.departure_epochs) - 1, self.coarse_cell_size)) \
+            + [len(self.departure_epochs) - 1]
+        arrival_boundaries = list(range(0, len(self.arrival_epochs) - 1, self.coarse_cell_size)) \
+            + [len(self.arrival_epochs) - 1]
+        return [(departure_start, departure_end, arrival_start, arrival_end)
+                for departure_start, departure_end in zip(departure_boundaries[:-1], departure_boundaries[1:])
+                for arrival_start, arrival_end in zip(arrival_boundaries[:-1], arrival_boundaries[1:])]
+
+    def get_corners(self,
+                    cell):
+        departure_start, departure_end, arrival_start, arrival_end = cell
+        return [(departure_start, arrival_start), (departure_start, arrival_end),
+                (departure_end, arrival_start), (departure_end, arrival_end)]
+
+    def get_children(self,
+                     cell):
+        # Split the cell in the middle, in each direction in which it spans more than one step
+        departure_start, departure_end, arrival_start, arrival_end = cell
+        departure_middle = (departure_start + departure_end) // 2
+        arrival_middle = (arrival_start + arrival_end) // 2
+        departure_ranges = [(departure_start, departure_end)] if departure_end - departure_start < 2 \
+            else [(departure_start, departure_middle), (departure_middle, departure_end)]
+        arrival_ranges = [(arrival_start, arrival_end)] if arrival_end - arrival_start < 2 \
+            else [(arrival_start, arrival_middle), (arrival_middle, arrival_end)]
+        return [departure_range + arrival_range
+                for departure_range in departure_ranges for arrival_range in arrival_ranges]
+
+    def get_best_node(self):
+        # Evaluated epoch combination with the lowest Delta V so far
+        values = np.sum(self.delta_v, axis=2) if self.total else np.max(self.delta_v, axis=2)
+        if np.all(np.isnan(values)):
+            return None
+        return np.unravel_index(np.nanargmin(values), values.shape)
+
+    def get_local_minima(self,
+                         cells):
+        # Corners that are not higher than any other corner of the cells that contain them
+        neighbour_minima = dict()
+        for cell in cells:
+            corners = self.get_corners(cell)
+            values = [self.get_node_value(corner) for corner in corners]
+            for corner, value in zip(corners, values):
+                other_values = [other_value for other_corner, other_value in zip(corners, values)
+                                if other_corner != corner and np.isfinite(other_value)]
+                neighbour_minima[corner] = min([neighbour_minima.get(corner, np.inf)] + other_values)
+        return {corner for corner, neighbour_minimum in neighbour_minima.items()
+                if np.isfinite(self.get_node_value(corner)) and self.get_node_value(corner) <= neighbour_minimum}
+
+    def is_refined(self,
+                   cell,
+                   local_minima,
+                   best_node):
+        departure_start, departure_end, arrival_start, arrival_end = cell
+        if departure_end - departure_start < 2 and arrival_end - arrival_start < 2:
+            return False
+        corners = self.get_corners(cell)
+        values = np.array([self.get_node_value(corner) for corner in corners])
+        finite_values = values[np.isfinite(values)]
+        if len(finite_values) == 0:
+            return False
+
+        # Near the threshold: the contour of the threshold, or the undefined region, crosses the cell
+        if np.min(finite_values) <= self.threshold and \
+                (len(finite_values) < len(values) or np.max(finite_values) > self.threshold):
+            return True
+
+        # Near a local minimum below the threshold, or the best epoch combination so far
+        for corner, value in zip(corners, values):
+            if (corner in local_minima and value <= self.threshold) or corner == best_node:
+                return True
+
+        # Across a discontinuity below the threshold, along one of the edges of the cell
+        for first_index, second_index in [(0, 1), (0, 2), (1, 3), (2, 3)]:
+            lowest_value = min(values[first_index], values[second_index])
+            if lowest_value <= self.threshold and \
+                    abs(values[first_index] - values[second_index]) > self.discontinuity_tolerance * lowest_value:
+                return True
+        return False
+
+    def run(self):
+        self.leaf_cells = []
+        cells = self.get_coarse_cells()
+        while len(cells) > 0:
+
+            # Evaluate the corners of all cells of this level
+            for cell in cells:
+                for corner in self.get_corners(cell):
+                    self.evaluate_node(corner)
+
+            # Split the cells of interest, the other cells being leaves of the quadtree
+            local_minima = self.get_local_minima(cells)
+            best_node = self.get_best_node()
+            refined_cells = []
+            for cell in cells:
+                if self.is_refined(cell, local_minima, best_node):
+                    refined_cells.extend(self.get_children(cell))
+                else:
+                    self.leaf_cells.append(cell)
+            cells = refined_cells
+        return self
+
+    def get_delta_v_map(self):
+        delta_v_map = self.delta_v.copy()
+        for departure_start, departure_end, arrival_start, arrival_end in self.leaf_cells:
+
+            # Bilinear interpolation weights of the corners, at all epoch combinations of the leaf
+            departure_fraction = np.linspace(0.0, 1.0, departure_end - departure_start + 1)[:, np.newaxis]
+            arrival_fraction = np.linspace(0.0, 1.0, arrival_end - arrival_start + 1)[np.newaxis, :]
+            weights = [(1.0 - departure_fraction) * (1.0 - arrival_fraction),
+                       (1.0 - departure_fraction) * arrival_fraction,
+                       departure_fraction * (1.0 - arrival_fraction),
+                       departure_fraction * arrival_fraction]
+
+            # Interpolate between the defined corners only, leaving the evaluated epoch combinations unchanged
+            weighted_sum = 0.0
+            sum_of_weights = 0.0
+            for corner, weight in zip(self.get_corners((departure_start, departure_end, arrival_start, arrival_end)),
+                                      weights):
+                if np.all(np.isfinite(self.delta_v[corner])):
+                    weighted_sum = weighted_sum + weight[:, :, np.newaxis] * self.delta_v[corner]
+                    sum_of_weights = sum_of_weights + weight[:, :, np.newaxis]
+            if np.isscalar(sum_of_weights):
+                continue
+            with np.errstate(invalid='ignore', divide='ignore'):
+                interpolated_delta_v = np.where(sum_of_weights > 0.0, weighted_sum / sum_of_weights, np.nan)
+            leaf_slice = (slice(departure_start, departure_end + 1), slice(arrival_start, arrival_end + 1))
+            delta_v_map[leaf_slice] = np.where(self.is_evaluated[leaf_slice][:, :, np.newaxis],
+                                               delta_v_map[leaf_slice], interpolated_delta_v)
+
+        # Leave the Delta V undefined wherever the arrival does not follow the departure
+        delta_v_map[self.arrival_epochs[np.newaxis, :] <= self.departure_epochs[:, np.newaxis]] = np.nan
+        return delta_v_map
+
+    def get_minimum(self):
+        # Departure and arrival epochs and Delta V of the best evaluated epoch combination
+        best_node = self.get_best_node()
+        if best_node is None:
+            raise ValueError("No finite Delta V was found in the porkchop windows (they may be empty, the arrival may "
+                             "never follow the departure, or no transfer may be feasible)")
+        return self.departure_epochs[best_node[0]], self.arrival_epochs[best_node[1]], self.delta_v[best_node]
+
+
+def calculate_adaptive_delta_v_time_map(bodies,
+                                        departure_body,
+                                        target_body,
+                                        earliest_departure_time,
+                                        latest_departure_time,
+                                        earliest_arrival_time,
+                                        latest_arrival_time,
+                                        time_resolution,
+                                        function_to_calculate_delta_v,
+                                        threshold,
+                                        total=False,
+                                        coarse_cell_size=16,
+                                        discontinuity_tolerance=0.5):
+    # Discretize the departure and arrival windows in the same way as the porkchop function, and refine the quadtree
+    departure_epochs = get_porkchop_epochs(earliest_departure_time, latest_departure_time, time_resolution)
+    arrival_epochs = get_porkchop_epochs(earliest_arrival_time, latest_arrival_time, time_resolution)
+    return PorkchopQuadtree(bodies,
+                            departure_body,
+                            target_body,
+                            departure_epochs,
+                            arrival_epochs,
+                            function_to_calculate_delta_v,
+                            threshold,
+                            total,
+                            coarse_cell_size,
+                            discontinuity_tolerance).run()
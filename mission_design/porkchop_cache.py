@@ -0,0 +1,210 @@
+"""
+# Porkchop plots - Result cache
+Copyright (c) 2010-2024, Delft University of Technology. All rights reserved. This file is part of the Tudat. Redistribution  and use in source and binary forms, with or without modification, are permitted exclusively under the terms of the Modified BSD license. You should have received a copy of the license with this file. If not, please or visit: http://tudat.tudelft.nl/LICENSE.
+
+This module is used by the porkchop examples, to save the departure and arrival epochs and the Delta V map of a porkchop plot, and reuse them only when the plot would be computed from exactly the same inputs.
+
+The inputs of a porkchop plot are collected as plain data by `get_porkchop_inputs()`: the departure and target bodies, the time windows and resolution, the function that calculates the Delta V of a single transfer, and any settings of the environment that affect the result (e.g., the bodies that are created, or the properties of the vehicle). The function is identified by its module and name, and by a version. Unless a version is given, it is derived from the compiled code of the function, such that editing the function invalidates its cached results. The values of the global variables that the function reads are included as well, if they are plain data (numbers, strings, or lists and arrays of numbers), such that changing e.g. a fixed parameter of the trajectory also invalidates them. Changes to other functions that it calls are not detected; the version should be given (and changed) explicitly in that case.
+
+The `PorkchopCache` class stores each result in a directory, in an uncompressed `.npz` file named after the SHA-256 hash of its inputs. The inputs are stored in the same file, and compared when the file is loaded, so a file is never used for other inputs. The arrays are loaded as memory maps, so only the parts of a large Delta V map that are used are read from disk, and no data is ever unpickled. When the files in the directory exceed a maximum size, the least recently used files are removed.
+"""
+
+
+# Load standard modules
+import os
+import json
+import types
+import hashlib
+import zipfile
+import numpy as np
+
+
+# Version of the format of the cached files, included in the hash of the inputs
+cache_format_version = 2
+
+
+def get_code_hash(code):
+    # Hash of the instructions, names and constants of compiled code, including the code of nested functions
+    code_hash = hashlib.sha256()
+    code_hash.update(code.co_code)
+    code_hash.update(repr((code.co_names, code.co_varnames)).encode())
+    for constant in code.co_consts:
+        if isinstance(constant, types.CodeType):
+            code_hash.update(get_code_hash(constant).encode())
+        else:
+            code_hash.update(repr(constant).encode())
+    return code_hash.hexdigest()
+
+
+def get_global_names(code):
+    # Names of the global variables (and functions) read by compiled code, including the code of nested functions
+    global_names = set(code.co_names)
+    for constant in code.co_consts:
+        if isinstance(constant, types.CodeType):
+            global_names |= get_global_names(constant)
+    return global_names
+
+
+def get_plain_data(value):
+    # Value as plain data, or None if the value is not plain data (e.g., a function or a module)
+    if isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, np.ndarray) and value.dtype.kind in 'biuf':
+        return value.tolist()
+    if isinstance(value, (np.integer, np.floating)):
+        return value.item()
+    if isinstance(value, (list, tuple)):
+        items = [get_plain_data(item) for item in value]
+        return None if any(item is None for item in items) else items
+    return None
+
+
+def get_function_identity(function,
+                          function_version=None):
+    # The default Lambert arcs of the porkchop function are identified by the version of tudatpy
+    if function is None:
+        import tudatpy
+        return {'module': 'tudatpy.trajectory_design.porkchop',
+                'name': 'lambert',
+                'version': function_version if function_version is not None
+                else getattr(tudatpy, '__version__', 'unknown')}
+
+    # Other functions are identified by their module and name, and by the hash of their code unless a version is given
+    if function_version is None:
+        function_version = get_code_hash(function.__code__) if hasattr(function, '__code__') else 'unknown'
+
+    # The values of the global variables read by the function (e.g., fixed parameters of the trajectory) are part of
+    # its identity as well, if they are plain data
+    global_values = dict()
+    if hasattr(function, '__code__') and hasattr(function, '__globals__'):
+        for global_name in sorted(get_global_names(function.__code__)):
+            if global_name in function.__globals__:
+                global_value = get_plain_data(function.__globals__[global_name])
+                if global_value is not None:
+                    global_values[global_name] = global_value
+    return {'module': getattr(function, '__module__', None),
+            'name': getattr(function, '__qualname__', repr(function)),
+            'version': function_version,
+            'global_values': global_values}
+
+
+def get_porkchop_inputs(departure_body,
+                        target_body,
+                        earliest_departure_time,
+                        latest_departure_time,
+                        earliest_arrival_time,
+                        latest_arrival_time,
+                        time_resolution,
+                        function_to_calculate_delta_v=None,
+                        function_version=None,
+                        **environment_settings):
+    # All inputs as plain data, with the epochs of the time windows in seconds since J2000
+    return {'cache_format_version': cache_format_version,
+            'departure_body': departure_body,
+            'target_body': target_body,
+            'departure_window': [float(earliest_departure_time.epoch()), float(latest_departure_time.epoch())],
+            'arrival_window': [float(earliest_arrival_time.epoch()), float(latest_arrival_time.epoch())],
+            'time_resolution': float(time_resolution),
+            'delta_v_function': get_function_identity(function_to_calculate_delta_v, function_version),
+            'environment': environment_settings}
+
+
+def get_inputs_text(inputs):
+    # Canonical text of the inputs, which does not depend on the order in which they were given
+    return json.dumps(inputs, sort_keys=True, separators=(',', ':'), default=str)
+
+
+def load_npz_memory_map(file_name,
+                        mmap_mode='c'):
+    # Memory map each array of an uncompressed .npz file at its position in the file, np.load() reading .npz files
+    # completely into memory
+    arrays = dict()
+    with zipfile.ZipFile(file_name) as npz_file, open(file_name, 'rb') as file:
+        for member in npz_file.infolist():
+            if member.compress_type != zipfile.ZIP_STORED:
+                raise ValueError("Can not memory map the compressed array '%s' of %s" % (member.filename, file_name))
+
+            # Skip the local header of the member (of which the length of the extra field can differ from the one in
+            # the central directory), and read the header of the .npy file
+            file.seek(member.header_offset + 26)
+            file_name_length, extra_field_length = np.frombuffer(file.read(4), dtype='<u2')
+            file.seek(member.header_offset + 30 + int(file_name_length) + int(extra_field_length))
+            format_version = np.lib.format.read_magic(file)
+            if format_version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+            arrays[member.filename[:-len('.npy')]] = np.memmap(file_name,
+                                                              dtype=dtype,
+                                                              mode=mmap_mode,
+                                                              offset=file.tell(),
+                                                              shape=shape,
+                                                              order='F' if fortran_order else 'C')
+    return arrays
+
+
+class PorkchopCache:
+
+    def __init__(self,
+                 cache_directory,
+                 maximum_size=256 * 1024 ** 2):
+        self.cache_directory = cache_directory
+        self.maximum_size = maximum_size
+
+        # Create the cache directory if it does not exist yet
+        os.makedirs(cache_directory, exist_ok=True)
+
+    def get_key(self,
+                inputs):
+        return hashlib.sha256(get_inputs_text(inputs).encode()).hexdigest()
+
+    def get_file_name(self,
+                      inputs):
+        return os.path.join(self.cache_directory, 'porkchop_' + self.get_key(inputs) + '.npz')
+
+    def load(self,
+             inputs):
+        # Return None if no valid result was saved for these inputs
+        file_name = self.get_file_name(inputs)
+        if not os.path.isfile(file_name):
+            return None
+        try:
+            arrays = load_npz_memory_map(file_name)
+            if str(arrays['inputs'][()]) != get_inputs_text(inputs):
+                return None
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            return None
+
+        # Mark the file as recently used, such that it is removed last
+        os.utime(file_name)
+        return arrays['departure_epochs'], arrays['arrival_epochs'], arrays['delta_v']
+
+    def save(self,
+             inputs,
+             departure_epochs,
+             arrival_epochs,
+             delta_v):
+        # Write the file under a temporary name first, such that an interruption never leaves a corrupted file
+        file_name = self.get_file_name(inputs)
+        temporary_file_name = file_name[:-len('.npz')] + '.tmp.npz'
+        np.savez(temporary_file_name,
+                 inputs=np.array(get_inputs_text(inputs)),
+                 departure_epochs=np.asarray(departure_epochs, dtype=float),
+                 arrival_epochs=np.asarray(arrival_epochs, dtype=float),
+                 delta_v=np.asarray(delta_v, dtype=float))
+        os.replace(temporary_file_name, file_name)
+        self.evict(file_name)
+
+    def evict(self,
+              file_name_to_keep=None):
+        # Remove the least recently used files until the cache fits within its maximum size, keeping the given file
+        file_names = [os.path.join(self.cache_directory, file_name) for file_name in os.listdir(self.cache_directory)
+                      if file_name.startswith('porkchop_') and file_name.endswith('.npz')]
+        file_names.sort(key=os.path.getmtime)
+        cache_size = sum(os.path.getsize(file_name) for file_name in file_names)
+        for file_name in file_names:
+            if cache_size <= self.maximum_size:
+                break
+            if file_name != file_name_to_keep:
+                cache_size -= os.path.getsize(file_name)
+                os.remove(file_name)
@@ -0,0 +1,124 @@
+"""
+# Porkchop plots - Parallel evaluation
+Copyright (c) 2010-2024, Delft University of Technology. All rights reserved. This file is part of the Tudat. Redistribution  and use in source and binary forms, with or without modification, are permitted exclusively under the terms of the Modified BSD license. You should have received a copy of the license with this file. If not, please or visit: http://tudat.tudelft.nl/LICENSE.
+
+This module is used by the porkchop examples, to compute the Delta V map of a porkchop plot in parallel, for any function that calculates the Delta V of a single transfer (the `function_to_calculate_delta_v` argument of the `porkchop` function of tudatpy). The departure and arrival epochs are discretized in the same way as by the `porkchop` function, and the Delta V map has the same layout, such that it can be plotted with `plot_porkchop`.
+
+The grid of departure and arrival epochs is split into square tiles, which are evaluated by a pool of worker processes. Each worker creates its own system of bodies once, through `initialize_porkchop_worker()`, as a system of bodies can not be sent to another process. Only the epochs of each tile, and the resulting Delta V values, are sent between the processes. The Delta V of each tile is written into the Delta V map as soon as it is completed, and the progress is reported at a fixed interval.
+"""
+
+
+# Load standard modules
+import time
+import numpy as np
+import multiprocessing as mp
+
+# Load tudatpy modules
+from tudatpy import constants
+
+
+# System of bodies and Delta V function of the current worker process, set once by initialize_porkchop_worker()
+worker_bodies = None
+worker_delta_v_function = None
+
+
+def initialize_porkchop_worker(create_bodies,
+                               function_to_calculate_delta_v):
+    global worker_bodies, worker_delta_v_function
+
+    # Create the system of bodies of this worker
+    worker_bodies = create_bodies()
+    worker_delta_v_function = function_to_calculate_delta_v
+
+
+def get_porkchop_epochs(earliest_time,
+                        latest_time,
+                        time_resolution):
+    # Discretize the time window with the time resolution, in days
+    return np.arange(earliest_time.epoch(), latest_time.epoch(), time_resolution * constants.JULIAN_DAY)
+
+
+def get_porkchop_tiles(departure_epochs,
+                       arrival_epochs,
+                       tile_size):
+    # Slices of the departure and arrival epochs of each tile, skipping the tiles in which all arrival epochs precede
+    # all departure epochs
+    tiles = []
+    for departure_start in range(0, len(departure_epochs), tile_size):
+        departure_slice = slice(departure_start, min(departure_start + tile_size, len(departure_epochs)))
+        for arrival_start in range(0, len(arrival_epochs), tile_size):
+            arrival_slice = slice(arrival_start, min(arrival_start + tile_size, len(arrival_epochs)))
+            if arrival_epochs[arrival_slice][-1] > departure_epochs[departure_slice][0]:
+                tiles.append((departure_slice, arrival_slice))
+    return tiles
+
+
+def evaluate_tile_in_worker(tile):
+    tile_index, departure_body, target_body, departure_epochs, arrival_epochs = tile
+
+    # Compute the Delta V of each combination of departure and arrival epochs, leaving it undefined if the arrival
+    # does not follow the departure
+    tile_delta_v = np.full((len(departure_epochs), len(arrival_epochs), 2), np.nan)
+    for departure_index, departure_epoch in enumerate(departure_epochs):
+        for arrival_index, arrival_epoch in enumerate(arrival_epochs):
+            if arrival_epoch > departure_epoch:
+                tile_delta_v[departure_index, arrival_index] = worker_delta_v_function(
+                    worker_bodies, departure_body, target_body, departure_epoch, arrival_epoch)
+    return tile_index, tile_delta_v
+
+
+def calculate_parallel_delta_v_time_map(create_bodies,
+                                        departure_body,
+                                        target_body,
+                                        earliest_departure_time,
+                                        latest_departure_time,
+                                        earliest_arrival_time,
+                                        latest_arrival_time,
+                                        time_resolution,
+                                        function_to_calculate_delta_v,
+                                        number_of_workers=None,
+                                        tile_size=16,
+                                        progress_interval=10.0):
+    # Discretize the departure and arrival windows, and split the grid into tiles
+    departure_epochs = get_porkchop_epochs(earliest_departure_time, latest_departure_time, time_resolution)
+    arrival_epochs = get_porkchop_epochs(earliest_arrival_time, latest_arrival_time, time_resolution)
+    tiles = get_porkchop_tiles(departure_epochs, arrival_epochs, tile_size)
+    tile_arguments = [(tile_index, departure_body, target_body, departure_epochs[departure_slice],
+                       arrival_epochs[arrival_slice])
+                      for tile_index, (departure_slice, arrival_slice) in enumerate(tiles)]
+    ΔV = np.full((len(departure_epochs), len(arrival_epochs), 2), np.nan)
+
+    # Evaluate the tiles in the worker processes, or in this process if only one worker is requested. By default, only
+    # use all CPUs if new processes are forked, because a Python script would otherwise be run again by each worker (and
+    # start its own pool)
+    if number_of_workers is None:
+        number_of_workers = mp.cpu_count() if mp.get_start_method() == 'fork' else 1
+    if number_of_workers > 1:
+        worker_pool = mp.Pool(number_of_workers,
+                              initializer=initialize_porkchop_worker,
+                              initargs=(create_bodies, function_to_calculate_delta_v))
+        completed_tiles = worker_pool.imap_unordered(evaluate_tile_in_worker, tile_arguments)
+    else:
+        worker_pool = None
+        initialize_porkchop_worker(create_bodies, function_to_calculate_delta_v)
+        completed_tiles = map(evaluate_tile_in_worker, tile_arguments)
+
+    try:
+        # Write the Delta V of each tile into the map as soon as it is completed, and report the progress
+        start_time = time.perf_counter()
+        last_report_time = start_time
+        for number_of_completed_tiles, (tile_index, tile_delta_v) in enumerate(completed_tiles, start=1):
+            ΔV[tiles[tile_index]] = tile_delta_v
+            current_time = time.perf_counter()
+            if current_time - last_report_time >= progress_interval or number_of_completed_tiles == len(tiles):
+                elapsed_time = current_time - start_time
+                print('Porkchop: %i of %i tiles (%.1f%%), %.0f s elapsed, %.0f s remaining' % (
+                    number_of_completed_tiles, len(tiles), 100.0 * number_of_completed_tiles / len(tiles),
+                    elapsed_time, elapsed_time * (len(tiles) - number_of_completed_tiles) / number_of_completed_tiles))
+                last_report_time = current_time
+    finally:
+        # Stop the worker processes, also if the evaluation fails or is interrupted
+        if worker_pool is not None:
+            worker_pool.terminate()
+            worker_pool.join()
+    return departure_epochs, arrival_epochs, ΔV
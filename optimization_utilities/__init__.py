@@ -0,0 +1,12 @@
+"""
+# Optimization utilities
+Copyright (c) 2010-2022, Delft University of Technology. All rights reserved. This file is part of the Tudat. Redistribution  and use in source and binary forms, with or without modification, are permitted exclusively under the terms of the Modified BSD license. You should have received a copy of the license with this file. If not, please or visit: http://tudat.tudelft.nl/LICENSE.
+
+This package is NOT a tudatpy example. It contains helpers shared by the PyGMO optimization examples in the `pygmo` and `mission_design` folders, which add the root of this repository to their module search path to import it.
+"""
+
+
+from .generation_history import GenerationHistory, load_generation_history, get_generation, get_champion_history
+from .pareto import non_dominated_sorting, get_non_dominated_mask, get_hypervolume, ParetoArchive
+from .evolution_driver import EvolutionDriver
+from .thread_island import ThreadIsland
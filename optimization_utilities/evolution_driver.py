@@ -0,0 +1,197 @@
+"""
+# Optimization utilities - Evolution driver
+Copyright (c) 2010-2022, Delft University of Technology. All rights reserved. This file is part of the Tudat. Redistribution  and use in source and binary forms, with or without modification, are permitted exclusively under the terms of the Modified BSD license. You should have received a copy of the license with this file. If not, please or visit: http://tudat.tudelft.nl/LICENSE.
+
+This module contains the `EvolutionDriver` class, which evolves a PyGMO population (or the population of an island) one generation at a time, until one of its stopping rules is met:
+
+* the maximum number of generations is reached;
+* the champion improved by no more than a tolerance over a number of generations (stagnation);
+* the wall-clock time spent on the evolution exceeds a budget;
+* the number of fitness evaluations exceeds a budget.
+
+Every few generations, the driver writes a checkpoint with the decision vectors and fitness of the population, and the algorithm, which contains the state of its random number generator. A run that was interrupted can then be resumed from the last checkpoint, continuing exactly as the original run would have. Only the IDs of the individuals differ, as they are assigned again when the population is restored. If a `GenerationHistory` is given, the driver records each generation in it, and removes the generations recorded after the checkpoint when resuming.
+"""
+
+
+# Load standard modules
+import os
+import time
+import pickle
+import numpy as np
+
+# Load pygmo library
+import pygmo as pg
+
+
+class EvolutionDriver:
+
+    def __init__(self,
+                 maximum_generations,
+                 improvement_tolerance=0.0,
+                 number_of_stagnation_generations=None,
+                 wall_clock_budget=None,
+                 evaluation_budget=None,
+                 checkpoint_file=None,
+                 checkpoint_interval=10,
+                 generation_history=None):
+        self.maximum_generations = maximum_generations
+        self.improvement_tolerance = improvement_tolerance
+        self.number_of_stagnation_generations = number_of_stagnation_generations
+        self.wall_clock_budget = wall_clock_budget
+        self.evaluation_budget = evaluation_budget
+        self.checkpoint_file = checkpoint_file
+        self.checkpoint_interval = checkpoint_interval
+        self.generation_history = generation_history
+
+        # State of the evolution, which is stored in the checkpoints
+        self.generation = 0
+        self.number_of_evaluations = 0
+        self.elapsed_time = 0.0
+        self.champion_design_variables = []
+        self.champion_fitness = []
+        self.stopping_reason = None
+
+    def get_stopping_reason(self):
+        if self.generation >= self.maximum_generations:
+            return 'maximum generations'
+        if self.wall_clock_budget is not None and self.elapsed_time >= self.wall_clock_budget:
+            return 'wall-clock budget'
+        if self.evaluation_budget is not None and self.number_of_evaluations >= self.evaluation_budget:
+            return 'evaluation budget'
+
+        # The evolution stagnated if the (first objective of the) champion improved by no more than the tolerance over
+        # the last generations
+        if self.number_of_stagnation_generations is not None \
+                and len(self.champion_fitness) > self.number_of_stagnation_generations:
+            improvement = self.champion_fitness[-1 - self.number_of_stagnation_generations][0] \
+                          - self.champion_fitness[-1][0]
+            if improvement <= self.improvement_tolerance:
+                return 'stagnation'
+        return None
+
+    def update_champion(self,
+                        population):
+        # The champion is the best individual found up to and including the current generation
+        fitness = population.get_f()
+        best_index = np.argmin(fitness[:, 0])
+        if len(self.champion_fitness) == 0 or fitness[best_index, 0] < self.champion_fitness[-1][0]:
+            self.champion_design_variables.append(population.get_x()[best_index].copy())
+            self.champion_fitness.append(fitness[best_index].copy())
+        else:
+            self.champion_design_variables.append(self.champion_design_variables[-1])
+            self.champion_fitness.append(self.champion_fitness[-1])
+
+    def save_checkpoint(self,
+                        algorithm,
+                        population):
+        if self.checkpoint_file is None:
+            return
+
+        # Write all recorded generations to disk first, such that the history is complete up to the checkpoint
+        if self.generation_history is not None:
+            self.generation_history.flush()
+
+        checkpoint = {'generation': self.generation,
+                      'number_of_evaluations': self.number_of_evaluations,
+                      'elapsed_time': self.elapsed_time,
+                      'champion_design_variables': self.champion_design_variables,
+                      'champion_fitness': self.champion_fitness,
+                      'algorithm': algorithm,
+                      'design_variables': population.get_x(),
+                      'fitness': population.get_f()}
+
+        # Write the checkpoint through a temporary file, such that an interruption never leaves a partial checkpoint
+        temporary_file_name = self.checkpoint_file + '.tmp'
+        with open(temporary_file_name, 'wb') as checkpoint_file:
+            pickle.dump(checkpoint, checkpoint_file)
+        os.replace(temporary_file_name, self.checkpoint_file)
+
+    def load_checkpoint(self,
+                        population):
+        with open(self.checkpoint_file, 'rb') as checkpoint_file:
+            checkpoint = pickle.load(checkpoint_file)
+        self.generation = checkpoint['generation']
+        self.number_of_evaluations = checkpoint['number_of_evaluations']
+        self.elapsed_time = checkpoint['elapsed_time']
+        self.champion_design_variables = checkpoint['champion_design_variables']
+        self.champion_fitness = checkpoint['champion_fitness']
+
+        # Recreate the population from the stored individuals, without evaluating their fitness again
+        restored_population = pg.population(population.problem)
+        for design_variables, fitness in zip(checkpoint['design_variables'], checkpoint['fitness']):
+            restored_population.push_back(design_variables, fitness)
+        return checkpoint['algorithm'], restored_population
+
+    def run(self,
+            algorithm,
+            population,
+            evolve_function,
+            resume=False):
+        # Resume from the checkpoint if requested and available, or start with the initial population otherwise
+        if resume and self.checkpoint_file is not None and os.path.isfile(self.checkpoint_file):
+            algorithm, population = self.load_checkpoint(population)
+            if self.generation_history is not None:
+                self.generation_history.truncate(self.generation)
+        else:
+            self.generation = 0
+            self.number_of_evaluations = population.problem.get_fevals()
+            self.elapsed_time = 0.0
+            self.champion_design_variables = []
+            self.champion_fitness = []
+            self.update_champion(population)
+            if self.generation_history is not None:
+                self.generation_history.truncate(-1)
+                self.generation_history.record_population(0, population)
+
+        while True:
+            self.stopping_reason = self.get_stopping_reason()
+            if self.stopping_reason is not None:
+                break
+
+            # Evolve the population by one call to the algorithm
+            evolution_start_time = time.perf_counter()
+            previous_number_of_evaluations = population.problem.get_fevals()
+            algorithm, population = evolve_function(algorithm, population)
+            evolution_time = time.perf_counter() - evolution_start_time
+            self.generation += 1
+            self.number_of_evaluations += population.problem.get_fevals() - previous_number_of_evaluations
+            self.elapsed_time += evolution_time
+            self.update_champion(population)
+
+            # Record the generation, with the average wall-clock time per individual
+            if self.generation_history is not None:
+                self.generation_history.record_population(self.generation, population, evolution_time / len(population))
+
+            if self.generation % self.checkpoint_interval == 0:
+                self.save_checkpoint(algorithm, population)
+
+        # Always store the final state, such that a finished run is not repeated when resumed
+        self.save_checkpoint(algorithm, population)
+        return algorithm, population
+
+    def evolve(self,
+               algorithm,
+               population,
+               resume=False):
+        def evolve_population(current_algorithm, current_population):
+            return current_algorithm, current_algorithm.evolve(current_population)
+
+        # The algorithm keeps the state of its random number generator between generations
+        return self.run(algorithm, population, evolve_population, resume)[1]
+
+    def evolve_island(self,
+                      island,
+                      resume=False):
+        def evolve_island_population(current_algorithm, current_population):
+            island.set_algorithm(current_algorithm)
+            island.set_population(current_population)
+            island.evolve()
+            island.wait_check()
+            return island.get_algorithm(), island.get_population()
+
+        # The island returns the evolved algorithm, including the state of its random number generator
+        algorithm, population = self.run(island.get_algorithm(), island.get_population(), evolve_island_population,
+                                         resume)
+        island.set_algorithm(algorithm)
+        island.set_population(population)
+        return island
@@ -0,0 +1,150 @@
+"""
+# Optimization utilities - Generation history
+Copyright (c) 2010-2022, Delft University of Technology. All rights reserved. This file is part of the Tudat. Redistribution  and use in source and binary forms, with or without modification, are permitted exclusively under the terms of the Modified BSD license. You should have received a copy of the license with this file. If not, please or visit: http://tudat.tudelft.nl/LICENSE.
+
+This module contains the `GenerationHistory` class, which records all individuals of each generation of a PyGMO optimization in columns: generation, individual ID, decision vector, fitness, and evaluation time.
+
+The rows are collected in preallocated arrays, which are written to a new compressed `.npz` chunk in the history directory every time they are full. The memory used by the history thus does not grow with the number of generations. Each chunk is written to a temporary file first and then renamed, so `load_generation_history()` can read all completed chunks while the optimization is still running.
+
+When an optimization is resumed from a checkpoint, the chunks of the interrupted run are kept, and `GenerationHistory.truncate()` removes the generations recorded after the checkpoint.
+"""
+
+
+# Load standard modules
+import os
+import glob
+import numpy as np
+
+
+class GenerationHistory:
+
+    def __init__(self,
+                 history_directory,
+                 number_of_design_variables,
+                 number_of_objectives,
+                 chunk_size=10000,
+                 keep_existing_chunks=False):
+        self.history_directory = history_directory
+        self.chunk_size = chunk_size
+
+        # Create the history directory, and remove the chunks recorded by a previous optimization, unless it is resumed
+        os.makedirs(history_directory, exist_ok=True)
+        if not keep_existing_chunks:
+            for chunk_file_name in get_chunk_file_names(history_directory):
+                os.remove(chunk_file_name)
+        self.number_of_chunks = len(get_chunk_file_names(history_directory))
+
+        # Preallocate one chunk of each column
+        self.columns = {'generation': np.zeros(chunk_size, dtype=np.int64),
+                        'individual_id': np.zeros(chunk_size, dtype=np.uint64),
+                        'design_variables': np.zeros((chunk_size, number_of_design_variables)),
+                        'fitness': np.zeros((chunk_size, number_of_objectives)),
+                        'evaluation_time': np.zeros(chunk_size)}
+        self.number_of_rows = 0
+
+    def record(self,
+               generation,
+               individual_ids,
+               design_variables,
+               fitness,
+               evaluation_time=np.nan):
+        new_columns = {'individual_id': np.asarray(individual_ids),
+                       'design_variables': np.asarray(design_variables),
+                       'fitness': np.asarray(fitness)}
+        number_of_new_rows = len(new_columns['individual_id'])
+        new_columns['generation'] = np.full(number_of_new_rows, generation)
+        new_columns['evaluation_time'] = np.broadcast_to(evaluation_time, number_of_new_rows)
+
+        # Copy the new rows into the preallocated columns, writing a chunk every time the columns are full
+        row = 0
+        while row < number_of_new_rows:
+            number_of_copied_rows = min(number_of_new_rows - row, self.chunk_size - self.number_of_rows)
+            for column_name, column in self.columns.items():
+                column[self.number_of_rows:self.number_of_rows + number_of_copied_rows] = \
+                    new_columns[column_name][row:row + number_of_copied_rows]
+            self.number_of_rows += number_of_copied_rows
+            row += number_of_copied_rows
+            if self.number_of_rows == self.chunk_size:
+                self.flush()
+
+    def record_population(self,
+                          generation,
+                          population,
+                          evaluation_time=np.nan):
+        self.record(generation, population.get_ID(), population.get_x(), population.get_f(), evaluation_time)
+
+    def flush(self):
+        if self.number_of_rows == 0:
+            return
+
+        # Write the recorded rows to a new chunk, through a temporary file such that readers never see a partial chunk
+        chunk_file_name = os.path.join(self.history_directory, 'chunk_%06i.npz' % self.number_of_chunks)
+        temporary_file_name = chunk_file_name[:-len('.npz')] + '.tmp.npz'
+        np.savez_compressed(temporary_file_name,
+                            **{column_name: column[:self.number_of_rows]
+                               for column_name, column in self.columns.items()})
+        os.replace(temporary_file_name, chunk_file_name)
+        self.number_of_chunks += 1
+        self.number_of_rows = 0
+
+    def truncate(self,
+                 last_generation):
+        # Remove the recorded rows after the last generation, from the preallocated columns and from the chunks
+        self.number_of_rows = np.count_nonzero(self.columns['generation'][:self.number_of_rows] <= last_generation)
+        for chunk_file_name in get_chunk_file_names(self.history_directory):
+            with np.load(chunk_file_name) as chunk:
+                chunk_columns = {column_name: chunk[column_name] for column_name in chunk.files}
+            is_kept = chunk_columns['generation'] <= last_generation
+            if np.all(is_kept):
+                continue
+
+            # Generations are recorded in order, so only the last chunks are shortened or removed
+            if np.any(is_kept):
+                temporary_file_name = chunk_file_name[:-len('.npz')] + '.tmp.npz'
+                np.savez_compressed(temporary_file_name,
+                                    **{column_name: column[is_kept] for column_name, column in chunk_columns.items()})
+                os.replace(temporary_file_name, chunk_file_name)
+            else:
+                os.remove(chunk_file_name)
+        self.number_of_chunks = len(get_chunk_file_names(self.history_directory))
+
+    def close(self):
+        self.flush()
+
+
+def get_chunk_file_names(history_directory):
+    return sorted(glob.glob(os.path.join(history_directory, 'chunk_[0-9][0-9][0-9][0-9][0-9][0-9].npz')))
+
+
+def load_generation_history(history_directory):
+    # Concatenate the columns of all chunks written so far
+    chunks = []
+    for chunk_file_name in get_chunk_file_names(history_directory):
+        with np.load(chunk_file_name) as chunk:
+            chunks.append({column_name: chunk[column_name] for column_name in chunk.files})
+    if len(chunks) == 0:
+        raise FileNotFoundError("No generation history found in %s" % history_directory)
+    return {column_name: np.concatenate([chunk[column_name] for chunk in chunks]) for column_name in chunks[0]}
+
+
+def get_generation(generation_history,
+                   generation):
+    # Decision vectors and fitness of all individuals of the given generation
+    in_generation = generation_history['generation'] == generation
+    return generation_history['design_variables'][in_generation], generation_history['fitness'][in_generation]
+
+
+def get_champion_history(generation_history):
+    # Sort the individuals by generation, and by their (first) objective within each generation
+    generations = generation_history['generation']
+    fitness = generation_history['fitness']
+    sorted_indices = np.lexsort((fitness[:, 0], generations))
+    recorded_generations, first_indices = np.unique(generations[sorted_indices], return_index=True)
+    best_indices = sorted_indices[first_indices]
+
+    # The champion of a generation is the best individual found up to and including that generation, so it only
+    # changes in the generations whose best individual is strictly better than those of all previous generations
+    best_fitness = fitness[best_indices, 0]
+    is_improved = best_fitness < np.minimum.accumulate(np.concatenate(([np.inf], best_fitness[:-1])))
+    champion_indices = best_indices[np.maximum.accumulate(np.where(is_improved, np.arange(len(best_indices)), 0))]
+    return recorded_generations, generation_history['design_variables'][champion_indices], fitness[champion_indices]
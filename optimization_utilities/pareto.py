@@ -0,0 +1,148 @@
+"""
+# Optimization utilities - Pareto fronts
+Copyright (c) 2010-2022, Delft University of Technology. All rights reserved. This file is part of the Tudat. Redistribution  and use in source and binary forms, with or without modification, are permitted exclusively under the terms of the Modified BSD license. You should have received a copy of the license with this file. If not, please or visit: http://tudat.tudelft.nl/LICENSE.
+
+This module contains vectorized helpers for multi-objective optimizations, in which all objectives are minimized. `non_dominated_sorting()` assigns the rank of the non-dominated front to each individual, and `get_non_dominated_mask()` selects the individuals of the first front. For two objectives, a front is found by sorting the individuals once; otherwise, all pairs of individuals are compared at once. `get_hypervolume()` computes the hypervolume dominated by a set of individuals, with respect to a reference point.
+
+The `ParetoArchive` class keeps the non-dominated individuals found during an optimization. It is updated with the population after every generation, and records the hypervolume of the archive, such that the optimization can be stopped once the hypervolume no longer increases.
+"""
+
+
+# Load standard modules
+import numpy as np
+
+# Load pygmo library
+import pygmo as pg
+
+
+def get_domination_matrix(fitness,
+                          dominating_fitness=None):
+    # Element [i, j] is True if individual i of the dominating fitness dominates individual j of the fitness
+    fitness = np.asarray(fitness, dtype=float)
+    dominating_fitness = fitness if dominating_fitness is None else np.asarray(dominating_fitness, dtype=float)
+    return np.all(dominating_fitness[:, np.newaxis, :] <= fitness[np.newaxis, :, :], axis=2) \
+        & np.any(dominating_fitness[:, np.newaxis, :] < fitness[np.newaxis, :, :], axis=2)
+
+
+def non_dominated_sorting(fitness,
+                          block_size=1000):
+    fitness = np.asarray(fitness, dtype=float)
+    number_of_individuals = len(fitness)
+
+    # With two objectives, peel off the fronts one at a time, each front requiring a sort of the remaining individuals
+    if fitness.shape[1] == 2:
+        front_ranks = np.full(number_of_individuals, -1)
+        remaining_indices = np.arange(number_of_individuals)
+        front_rank = 0
+        while len(remaining_indices) > 0:
+            current_front_mask = get_non_dominated_mask(fitness[remaining_indices])
+            front_ranks[remaining_indices[current_front_mask]] = front_rank
+            remaining_indices = remaining_indices[~current_front_mask]
+            front_rank += 1
+        return front_ranks
+
+    # Otherwise, count by how many individuals each individual is dominated, comparing blocks of individuals to limit
+    # the memory
+    domination_matrix = np.zeros((number_of_individuals, number_of_individuals), dtype=bool)
+    for block_start in range(0, number_of_individuals, block_size):
+        domination_matrix[block_start:block_start + block_size] = get_domination_matrix(
+            fitness, fitness[block_start:block_start + block_size])
+    domination_count = np.sum(domination_matrix, axis=0)
+
+    # Peel off the fronts: the individuals that are no longer dominated by any remaining individual form the next front
+    front_ranks = np.full(number_of_individuals, -1)
+    current_front = np.flatnonzero(domination_count == 0)
+    front_rank = 0
+    while len(current_front) > 0:
+        front_ranks[current_front] = front_rank
+        domination_count = domination_count - np.sum(domination_matrix[current_front], axis=0)
+        domination_count[current_front] = -1
+        current_front = np.flatnonzero(domination_count == 0)
+        front_rank += 1
+    return front_ranks
+
+
+def get_non_dominated_mask(fitness):
+    fitness = np.asarray(fitness, dtype=float)
+    if fitness.shape[1] != 2:
+        return non_dominated_sorting(fitness) == 0
+
+    # With two objectives, sort by the first objective, and then by the second objective
+    sorted_indices = np.lexsort((fitness[:, 1], fitness[:, 0]))
+    sorted_fitness = fitness[sorted_indices]
+
+    # An individual is dominated if an individual sorted before it, and not identical to it, has a second objective that
+    # is not larger
+    is_first_identical = np.concatenate(([True], np.any(np.diff(sorted_fitness, axis=0) != 0, axis=1)))
+    first_identical_indices = np.maximum.accumulate(np.where(is_first_identical, np.arange(len(fitness)), 0))
+    previous_minimum = np.concatenate(([np.inf], np.minimum.accumulate(sorted_fitness[:-1, 1])))
+    non_dominated_mask = np.zeros(len(fitness), dtype=bool)
+    non_dominated_mask[sorted_indices] = previous_minimum[first_identical_indices] > sorted_fitness[:, 1]
+    return non_dominated_mask
+
+
+def get_hypervolume(fitness,
+                    reference_point):
+    # Only individuals that are better than the reference point in all objectives contribute to the hypervolume
+    fitness = np.asarray(fitness, dtype=float)
+    reference_point = np.asarray(reference_point, dtype=float)
+    fitness = fitness[np.all(fitness < reference_point, axis=1)]
+    if len(fitness) == 0:
+        return 0.0
+    fitness = fitness[get_non_dominated_mask(fitness)]
+    if fitness.shape[1] != 2:
+        return pg.hypervolume(fitness).compute(reference_point)
+
+    # With two objectives, the non-dominated individuals sorted by the first objective form a staircase
+    fitness = fitness[np.argsort(fitness[:, 0])]
+    step_widths = np.diff(np.append(fitness[:, 0], reference_point[0]))
+    return float(np.sum(step_widths * (reference_point[1] - fitness[:, 1])))
+
+
+class ParetoArchive:
+
+    def __init__(self,
+                 reference_point=None):
+        self.reference_point = reference_point
+        self.design_variables = None
+        self.fitness = None
+        self.hypervolume_history = []
+
+    def update(self,
+               design_variables_list,
+               fitness_list):
+        design_variables_list = np.asarray(design_variables_list, dtype=float)
+        fitness_list = np.asarray(fitness_list, dtype=float)
+
+        # Only the new individuals that are not dominated among themselves can enter the archive
+        new_non_dominated_mask = get_non_dominated_mask(fitness_list)
+        design_variables_list = design_variables_list[new_non_dominated_mask]
+        fitness_list = fitness_list[new_non_dominated_mask]
+
+        # Merge them with the current archive, removing individuals that are present more than once
+        if self.design_variables is not None:
+            design_variables_list = np.vstack((self.design_variables, design_variables_list))
+            fitness_list = np.vstack((self.fitness, fitness_list))
+        design_variables_list, unique_indices = np.unique(design_variables_list, axis=0, return_index=True)
+        fitness_list = fitness_list[unique_indices]
+
+        # Keep only the non-dominated individuals
+        non_dominated_mask = get_non_dominated_mask(fitness_list)
+        self.design_variables = design_variables_list[non_dominated_mask]
+        self.fitness = fitness_list[non_dominated_mask]
+
+        # Record the hypervolume of the updated archive, if a reference point is given
+        if self.reference_point is not None:
+            self.hypervolume_history.append(get_hypervolume(self.fitness, self.reference_point))
+
+    def has_converged(self,
+                      relative_tolerance,
+                      number_of_generations):
+        # The hypervolume has converged if it increased by less than the tolerance over the last generations
+        if len(self.hypervolume_history) <= number_of_generations or self.hypervolume_history[-1] <= 0.0:
+            return False
+        hypervolume_increase = self.hypervolume_history[-1] - self.hypervolume_history[-1 - number_of_generations]
+        return hypervolume_increase <= relative_tolerance * self.hypervolume_history[-1]
+
+    def __len__(self):
+        return 0 if self.design_variables is None else len(self.design_variables)
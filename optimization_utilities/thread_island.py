@@ -0,0 +1,18 @@
+"""
+# Optimization utilities - Thread island
+Copyright (c) 2010-2022, Delft University of Technology. All rights reserved. This file is part of the Tudat. Redistribution  and use in source and binary forms, with or without modification, are permitted exclusively under the terms of the Modified BSD license. You should have received a copy of the license with this file. If not, please or visit: http://tudat.tudelft.nl/LICENSE.
+
+This module contains the `ThreadIsland` class, a user-defined PyGMO island that evolves its population in a thread of the main process. PyGMO's own `pg.thread_island` can not be used for this, as it refuses problems defined in Python. There is no start-up or serialization cost, but the islands of an archipelago share the objects of the main process (e.g., the caches or worker pool of their problem), so the problem is responsible for serializing access to them.
+"""
+
+
+class ThreadIsland:
+
+    def run_evolve(self,
+                   algorithm,
+                   population):
+        # PyGMO already runs this function in a separate thread, so the population is evolved directly
+        return algorithm, algorithm.evolve(population)
+
+    def get_name(self):
+        return "Thread island (Python)"
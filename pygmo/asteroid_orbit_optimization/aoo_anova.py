@@ -0,0 +1,128 @@
+"""
+# Asteroid orbit optimization with PyGMO - Analysis of variance and response surfaces
+Copyright (c) 2010-2022, Delft University of Technology. All rights reserved. This file is part of the Tudat. Redistribution  and use in source and binary forms, with or without modification, are permitted exclusively under the terms of the Modified BSD license. You should have received a copy of the license with this file. If not, please or visit: http://tudat.tudelft.nl/LICENSE.
+
+This module is used by the Design Space Exploration part of the Asteroid Orbit Optimization example. It analyses the results of a full factorial design, with any number of factors and any number of levels per factor.
+
+The objective values of the design are first arranged in a tensor with one axis per factor, by `get_factorial_tensor()`, independently of the order of the runs. The `anova_analysis()` function then computes the contributions of the individual factors, and of their interactions, to the variance of the objective from the marginal means of this tensor. The `ResponseSurface` class fits a polynomial of the design variables to the objective values through linear least squares.
+"""
+
+
+# Load standard modules
+import itertools
+import numpy as np
+
+
+def get_factorial_tensor(design_parameters,
+                         objective_values):
+    design_parameters = np.asarray(design_parameters, dtype=float)
+
+    # Find the levels of each factor, and the level index of each factor in each run
+    factor_levels, level_indices = zip(*[np.unique(factor_values, return_inverse=True)
+                                         for factor_values in design_parameters.T])
+
+    # A full factorial design contains each combination of levels exactly once
+    tensor_shape = tuple(len(levels) for levels in factor_levels)
+    if len(design_parameters) != np.prod(tensor_shape) or \
+            len(np.unique(np.column_stack(level_indices), axis=0)) != len(design_parameters):
+        raise ValueError("The design is not a full factorial design with one run per combination of levels")
+
+    # Place the objective value of each run at the level indices of its factors
+    objective_tensor = np.empty(tensor_shape)
+    objective_tensor[level_indices] = objective_values
+    return factor_levels, objective_tensor
+
+
+def get_effect_sum_of_squares(objective_tensor,
+                              factors):
+    # Marginal means over all other factors, for each subset of the given factors
+    number_of_factors = objective_tensor.ndim
+    effect = np.zeros([objective_tensor.shape[factor] if factor in factors else 1 for factor in range(number_of_factors)])
+    for subset_size in range(len(factors) + 1):
+        for subset in itertools.combinations(factors, subset_size):
+            other_factors = tuple(factor for factor in range(number_of_factors) if factor not in subset)
+            effect = effect + (-1) ** (len(factors) - subset_size) * np.mean(objective_tensor,
+                                                                            axis=other_factors,
+                                                                            keepdims=True)
+
+    # The effect is repeated for all levels of the other factors
+    return np.sum(effect ** 2) * objective_tensor.size / effect.size
+
+
+def anova_analysis(design_parameters,
+                   objective_values,
+                   level_of_interactions=3):
+    _, objective_tensor = get_factorial_tensor(design_parameters, objective_values)
+    number_of_factors = objective_tensor.ndim
+    total_sum_of_squares = np.sum((objective_tensor - np.mean(objective_tensor)) ** 2)
+
+    # Contribution (in percent) of each factor, and of each combination of two and three factors, to the total variance
+    contributions = []
+    for interaction_size in range(1, 4):
+        if interaction_size > level_of_interactions:
+            contributions.append(np.array([]))
+            continue
+        contributions.append(np.array([100.0 * get_effect_sum_of_squares(objective_tensor, factors)
+                                       / total_sum_of_squares
+                                       for factors in itertools.combinations(range(number_of_factors),
+                                                                             interaction_size)]))
+
+    # The higher order interactions, not analysed, are treated as error
+    error_contribution = 100.0 - sum(np.sum(contribution) for contribution in contributions)
+
+    # Return the individual, two-factor, and three-factor contributions (ordered as itertools.combinations), and error
+    return contributions[0], contributions[1], contributions[2], error_contribution
+
+
+class ResponseSurface:
+
+    def __init__(self,
+                 degree=2):
+        self.degree = degree
+        self.exponents = None
+        self.coefficients = None
+        self.design_variable_center = None
+        self.design_variable_scale = None
+
+    def get_design_matrix(self,
+                          design_parameters):
+        # Scale the design variables to [-1, 1], which keeps the least squares problem well conditioned
+        scaled_parameters = (np.asarray(design_parameters, dtype=float) - self.design_variable_center) \
+                            / self.design_variable_scale
+        return np.prod(scaled_parameters[:, np.newaxis, :] ** self.exponents[np.newaxis, :, :], axis=2)
+
+    def fit(self,
+            design_parameters,
+            objective_values):
+        design_parameters = np.asarray(design_parameters, dtype=float)
+        number_of_design_variables = design_parameters.shape[1]
+
+        # Scale each design variable by the range of its values
+        minimum_values = np.min(design_parameters, axis=0)
+        maximum_values = np.max(design_parameters, axis=0)
+        self.design_variable_center = 0.5 * (maximum_values + minimum_values)
+        self.design_variable_scale = np.where(maximum_values > minimum_values, 0.5 * (maximum_values - minimum_values),
+                                              1.0)
+
+        # Exponents of all monomials of the design variables up to the degree of the polynomial
+        self.exponents = np.array([np.bincount(monomial, minlength=number_of_design_variables)
+                                   for monomial_degree in range(self.degree + 1)
+                                   for monomial in itertools.combinations_with_replacement(
+                                       range(number_of_design_variables), monomial_degree)])
+
+        # Fit the coefficients of the monomials through linear least squares
+        self.coefficients, _, _, _ = np.linalg.lstsq(self.get_design_matrix(design_parameters),
+                                                     objective_values,
+                                                     rcond=None)
+        return self
+
+    def __call__(self,
+                 design_parameters):
+        return self.get_design_matrix(design_parameters) @ self.coefficients
+
+    def get_coefficient_of_determination(self,
+                                         design_parameters,
+                                         objective_values):
+        residual_sum_of_squares = np.sum((objective_values - self(design_parameters)) ** 2)
+        total_sum_of_squares = np.sum((objective_values - np.mean(objective_values)) ** 2)
+        return 1.0 - residual_sum_of_squares / total_sum_of_squares
@@ -0,0 +1,65 @@
+"""
+# Asteroid orbit optimization with PyGMO - Archipelago
+Copyright (c) 2010-2022, Delft University of Technology. All rights reserved. This file is part of the Tudat. Redistribution  and use in source and binary forms, with or without modification, are permitted exclusively under the terms of the Modified BSD license. You should have received a copy of the license with this file. If not, please or visit: http://tudat.tudelft.nl/LICENSE.
+
+This module is used by the Optimization part of the Asteroid Orbit Optimization example. It contains the helpers to evolve several populations of orbits at the same time, on the islands of a PyGMO archipelago, exchanging their best individuals through migration.
+
+Two types of islands are supported. The `ThreadIsland` class of the `optimization_utilities` package evolves each population in a thread of the main process. The islands then share the worker pool of the `AsteroidOrbitProblem`, which is kept busy by the batches of offspring of all islands. They also share its fitness cache, surrogate model and fidelity controller, of which the use is serialized by the `shared_object_lock` of the `aoo_environment` module, while the orbits themselves are propagated by the workers at the same time. The `pg.mp_island` evolves each population in a separate process, to which the problem is sent in serialized form. In that process, the problem recreates its simulation environment, and evaluates its orbits serially.
+
+The individuals of all islands, returned by `get_archipelago_individuals()`, can be merged into a single set of non-dominated orbits by the `ParetoArchive` class of the `optimization_utilities` package.
+"""
+
+
+# Load standard modules
+import numpy as np
+
+# Load pygmo library
+import pygmo as pg
+
+# Load the island type shared by the examples, located at the root of this repository
+from optimization_utilities import ThreadIsland
+
+
+def create_archipelago(orbit_problem,
+                       number_of_islands,
+                       population_size,
+                       seed,
+                       island_type='thread',
+                       topology=None,
+                       number_of_migrants=1):
+    # Select the island type
+    if island_type == 'thread':
+        create_island = ThreadIsland
+    elif island_type == 'mp':
+        create_island = pg.mp_island
+    else:
+        raise ValueError("Unknown island type '%s', use 'thread' or 'mp'" % island_type)
+
+    # Connect each island to the next one by default
+    archipelago = pg.archipelago(t=pg.ring() if topology is None else topology)
+
+    # Create the islands, each with its own seed derived from the given seed, such that the initial populations and
+    # the random numbers of the algorithms can be reproduced
+    for island_index in range(number_of_islands):
+        island_seed = seed + island_index
+        nsga2 = pg.nsga2(gen=1, seed=island_seed)
+        nsga2.set_bfe(pg.bfe(pg.member_bfe()))
+        population = pg.population(pg.problem(orbit_problem),
+                                   size=population_size,
+                                   seed=island_seed,
+                                   b=pg.bfe(pg.member_bfe()))
+
+        # The best individuals of each island replace the worst individuals of its neighbours, if they are better
+        archipelago.push_back(udi=create_island(),
+                              algo=pg.algorithm(nsga2),
+                              pop=population,
+                              r_pol=pg.fair_replace(number_of_migrants),
+                              s_pol=pg.select_best(number_of_migrants))
+    return archipelago
+
+
+def get_archipelago_individuals(archipelago):
+    # Stack the decision vectors and fitness of the populations of all islands
+    populations = [island.get_population() for island in archipelago]
+    return np.vstack([population.get_x() for population in populations]), \
+        np.vstack([population.get_f() for population in populations])
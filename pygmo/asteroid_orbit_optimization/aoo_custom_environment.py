@@ -23,7 +23,9 @@ Some standard modules are first loaded. These are `os`, `numpy` and `matplotlib.
 
 Then, the different modules of `tudatpy` that will be used are imported.
 
-Finally, in this example, we also need to import the `pygmo` library.
+In this example, we also need to import the `pygmo` library.
+
+Finally, the helpers and the problem class described below are imported from the `aoo_environment.py` module, located next to this file. This module is shared by the three parts of this example, which thus all use the exact same environment and optimisation problem.
 """
 
 
@@ -40,23 +42,22 @@ from itertools import combinations as comb
 from tudatpy.data import save2txt
 from tudatpy import constants
 from tudatpy.interface import spice
-from tudatpy.astro import element_conversion
-from tudatpy.astro import frame_conversion
-from tudatpy import numerical_simulation
-from tudatpy.numerical_simulation import environment_setup
-from tudatpy.numerical_simulation import propagation_setup
 from tudatpy.util import pareto_optimums
 
 # Load pygmo library
 import pygmo as pg
 
+# Load the shared environment and optimisation problem of this example
+from aoo_environment import create_simulation_bodies, get_termination_settings, get_propagator_settings, \
+    AsteroidOrbitProblem
+
 current_dir = os.path.abspath('')
 
 
 """
 ## Creation of Custom Environment
 
-Below a few helper functions are defined that create various custom environment models. These functions are used later in the example to create the simulation
+Below a few helper functions are described that create various custom environment models. These functions are defined in the `aoo_environment.py` module, and are used later in the example to create the simulation.
 
 """
 
@@ -74,37 +75,6 @@ In addition, some fixed parameters are defined in this function:
 - The rotation rate of Itokawa of 712.143 deg/Earth day.
 """
 
-
-def get_itokawa_rotation_settings(itokawa_body_frame_name):
-    # Definition of initial Itokawa orientation conditions through the pole orientation
-    pole_declination = np.deg2rad(-66.30)     # Declination
-    pole_right_ascension = np.deg2rad(90.53)  # Right ascension
-    meridian_at_epoch = 0.0                   # Meridian
-
-    # Define initial Itokawa orientation in inertial frame (equatorial plane)
-    initial_orientation_j2000 = frame_conversion.inertial_to_body_fixed_rotation_matrix(
-        pole_declination, pole_right_ascension, meridian_at_epoch)
-    
-    # Get initial Itokawa orientation in inertial frame but in the Ecliptic plane
-    initial_orientation_eclipj2000 = np.matmul(spice.compute_rotation_matrix_between_frames(
-        "J2000", "ECLIPJ2000", 0.0), initial_orientation_j2000)
-
-    # Manually check the results, if desired
-    check_results = False
-    if check_results:
-        np.set_printoptions(precision=100)
-        print(initial_orientation_j2000)
-    
-        print(initial_orientation_eclipj2000)
-
-    # Compute rotation rate
-    rotation_rate = np.deg2rad(712.143) / constants.JULIAN_DAY
-
-    # Set up rotational model for Itokawa with constant angular velocity
-    return environment_setup.rotation_model.simple(
-        "ECLIPJ2000", itokawa_body_frame_name, initial_orientation_eclipj2000, 0.0, rotation_rate)
-
-
 """
 ### Itokawa ephemeris settings
 The next helper function defined, `get_itokawa_ephemeris_settings()`, that can be used to set the ephemeris of Itokawa.
@@ -122,38 +92,6 @@ The ephemeris for Itokawa are set using a Keplerian orbit around the Sun. To do
 The only input that this function takes is the gravitational parameter of the Sun, which can be obtained using `spice.get_body_gravitational_parameter("Sun")`.
 """
 
-
-def get_itokawa_ephemeris_settings(sun_gravitational_parameter):
-    # Define Itokawa initial Kepler elements
-    itokawa_kepler_elements = np.array([
-        1.324118017407799 * constants.ASTRONOMICAL_UNIT,
-        0.2801166461882852,
-        np.deg2rad(1.621303507642802),
-        np.deg2rad(162.8147699851312),
-        np.deg2rad(69.0803904880264),
-        np.deg2rad(187.6327516838828)])
-    
-    # Convert mean anomaly to true anomaly
-    itokawa_kepler_elements[5] = element_conversion.mean_to_true_anomaly(
-        eccentricity=itokawa_kepler_elements[1],
-        mean_anomaly=itokawa_kepler_elements[5])
-    
-    # Get epoch of initial Kepler elements (in Julian Days)
-    kepler_elements_reference_julian_day = 2459000.5
-    
-    # Sets new reference epoch for Itokawa ephemerides (different from J2000)
-    kepler_elements_reference_epoch = (kepler_elements_reference_julian_day - constants.JULIAN_DAY_ON_J2000) \
-                                      * constants.JULIAN_DAY
-    
-    # Sets the ephemeris model
-    return environment_setup.ephemeris.keplerian(
-        itokawa_kepler_elements,
-        kepler_elements_reference_epoch,
-        sun_gravitational_parameter,
-        "Sun",
-        "ECLIPJ2000")
-
-
 """
 ### Itokawa gravity field settings
 The `get_itokawa_gravity_field_settings()` helper function can be used to get the gravity field settings of Itokawa.
@@ -161,40 +99,11 @@ The `get_itokawa_gravity_field_settings()` helper function can be used to get th
 It creates a Spherical Harmonics gravity field model expanded up to order 4 and degree 4. Normalized coefficients are hardcoded (see `normalized_cosine_coefficients` and `normalized_sine_coefficients`), as well as the gravitational parameter (2.36). The reference radius and the Itokawa body fixed frame are to be given as inputs to this function.
 """
 
-
-def get_itokawa_gravity_field_settings(itokawa_body_fixed_frame, itokawa_radius):
-    itokawa_gravitational_parameter = 2.36
-    normalized_cosine_coefficients = np.array([
-        [1.0, 0.0, 0.0, 0.0, 0.0],
-        [0.0, 0.0, 0.0, 0.0, 0.0],
-        [-0.145216, 0.0, 0.219420, 0.0, 0.0],
-        [0.036115, -0.028139, -0.046894, 0.069022, 0.0],
-        [0.087852, 0.034069, -0.123263, -0.030673, 0.150282]])
-    normalized_sine_coefficients = np.array([
-        [0.0, 0.0, 0.0, 0.0, 0.0],
-        [0.0, 0.0, 0.0, 0.0, 0.0],
-        [0.0, 0.0, 0.0, 0.0, 0.0],
-        [0.0, -0.006137, -0.046894, 0.033976, 0.0],
-        [0.0, 0.004870, 0.000098, -0.015026, 0.011627]])
-    return environment_setup.gravity_field.spherical_harmonic(
-        gravitational_parameter=itokawa_gravitational_parameter,
-        reference_radius=itokawa_radius,
-        normalized_cosine_coefficients=normalized_cosine_coefficients,
-        normalized_sine_coefficients=normalized_sine_coefficients,
-        associated_reference_frame=itokawa_body_fixed_frame)
-
-
 """
 ### Itokawa shape settings
 The next helper function defined, `get_itokawa_shape_settings()` return the shape settings object for Itokawa. It uses a simple spherical model, and take the radius of Itokawa as input.
 """
 
-
-def get_itokawa_shape_settings(itokawa_radius):
-    # Creates spherical shape settings
-    return environment_setup.shape.spherical(itokawa_radius)
-
-
 """
 ### Simulation bodies
 Next, the `create_simulation_bodies()` function is setup, that returns an [environment.SystemOfBodies](https://tudatpy.readthedocs.io/en/latest/environment.html#tudatpy.numerical_simulation.environment.SystemOfBodies) object. This object contains all the body settings and body objects required by the simulation. Only one input is required to this function: the radius of Itokawa.
@@ -202,60 +111,6 @@ Next, the `create_simulation_bodies()` function is setup, that returns an [envir
 Moreover, in the system of bodies that is returned, a `Spacecraft` body is included, with a mass of 400kg, and a radiation pressure interface. This body is the one for which an orbit is to be optimised around Itokawa.
 """
 
-
-def create_simulation_bodies(itokawa_radius):
-    ### CELESTIAL BODIES ###
-    # Define Itokawa body frame name
-    itokawa_body_frame_name = "Itokawa_Frame"
-
-    # Create default body settings for selected celestial bodies
-    bodies_to_create = ["Sun", "Earth", "Jupiter", "Saturn", "Mars"]
-
-    # Create default body settings for bodies_to_create, with "Earth"/"J2000" as
-    # global frame origin and orientation. This environment will only be valid
-    # in the indicated time range [simulation_start_epoch --- simulation_end_epoch]
-    body_settings = environment_setup.get_default_body_settings(
-        bodies_to_create,
-        "SSB",
-        "ECLIPJ2000")
-
-    # Add Itokawa body
-    body_settings.add_empty_settings("Itokawa")
-
-    # Adds Itokawa settings
-    # Gravity field
-    body_settings.get("Itokawa").gravity_field_settings = get_itokawa_gravity_field_settings(itokawa_body_frame_name,
-                                                                        itokawa_radius)
-    # Rotational model
-    body_settings.get("Itokawa").rotation_model_settings = get_itokawa_rotation_settings(itokawa_body_frame_name)
-    # Ephemeris
-    body_settings.get("Itokawa").ephemeris_settings = get_itokawa_ephemeris_settings(
-        spice.get_body_gravitational_parameter( 'Sun') )
-    # Shape (spherical)
-    body_settings.get("Itokawa").shape_settings = get_itokawa_shape_settings(itokawa_radius)
-
-    ### VEHICLE BODY ###
-    # Create vehicle object
-    body_settings.add_empty_settings("Spacecraft")
-    body_settings.get("Spacecraft").constant_mass = 400
-
-    # Create radiation pressure settings
-    reference_area_radiation = (4*0.3*0.1+2*0.1*0.1)/4  # Average projection area of a 3U CubeSat
-    radiation_pressure_coefficient = 1.2
-    occulting_bodies_dict = dict()
-    occulting_bodies_dict["Sun"] = ["Itokawa"]
-    vehicle_target_settings = environment_setup.radiation_pressure.cannonball_radiation_target(
-        reference_area_radiation, radiation_pressure_coefficient, occulting_bodies_dict )
-
-    # Add the radiation pressure interface to the body settings
-    body_settings.get("Spacecraft").radiation_pressure_target_settings = vehicle_target_settings
-
-    # Create system of selected bodies
-    bodies = environment_setup.create_system_of_bodies(body_settings)
-
-    return bodies
-
-
 """
 ### Acceleration models
 The `get_acceleration_models()` helper function returns the acceleration models to be used during the astrodynamic simulation. The following accelerations are included:
@@ -267,30 +122,6 @@ The `get_acceleration_models()` helper function returns the acceleration models
 This function takes as input the list of bodies that will be propagated, the list of central bodies related to the propagated bodies, and the system of bodies used.
 """
 
-
-def get_acceleration_models(bodies_to_propagate, central_bodies, bodies):
-    # Define accelerations acting on Spacecraft
-    accelerations_settings_spacecraft = dict(
-        Sun =     [ propagation_setup.acceleration.radiation_pressure(),
-                    propagation_setup.acceleration.point_mass_gravity() ],
-        Itokawa = [ propagation_setup.acceleration.spherical_harmonic_gravity(3, 3) ],
-        Jupiter = [ propagation_setup.acceleration.point_mass_gravity() ],
-        Saturn =  [ propagation_setup.acceleration.point_mass_gravity() ],
-        Mars =    [ propagation_setup.acceleration.point_mass_gravity() ],
-        Earth =   [ propagation_setup.acceleration.point_mass_gravity() ]
-    )
-
-    # Create global accelerations settings dictionary
-    acceleration_settings = {"Spacecraft": accelerations_settings_spacecraft}
-
-    # Create acceleration models
-    return propagation_setup.create_acceleration_models(
-        bodies,
-        acceleration_settings,
-        bodies_to_propagate,
-        central_bodies)
-
-
 """
 ### Termination settings
 The termination settings for the simulation are defined by the `get_termination_settings()` helper.
@@ -300,60 +131,16 @@ spacecraft breaks out of the predefined altitude range.
 This is defined by the four inputs that this helper function takes, related to the mission timing and the mission altitude range.
 """
 
-
-def get_termination_settings(mission_initial_time, 
-                             mission_duration,
-                             minimum_distance_from_com,
-                             maximum_distance_from_com):
-    # Mission duration
-    time_termination_settings = propagation_setup.propagator.time_termination(
-        mission_initial_time + mission_duration,
-        terminate_exactly_on_final_condition=False
-    )
-    # Upper altitude
-    upper_altitude_termination_settings = propagation_setup.propagator.dependent_variable_termination(
-        dependent_variable_settings=propagation_setup.dependent_variable.relative_distance('Spacecraft', 'Itokawa'),
-        limit_value=maximum_distance_from_com,
-        use_as_lower_limit=False,
-        terminate_exactly_on_final_condition=False
-    )
-    # Lower altitude
-    lower_altitude_termination_settings = propagation_setup.propagator.dependent_variable_termination(
-        dependent_variable_settings=propagation_setup.dependent_variable.altitude('Spacecraft', 'Itokawa'),
-        limit_value=minimum_distance_from_com,
-        use_as_lower_limit=True,
-        terminate_exactly_on_final_condition=False
-    )
-
-    # Define list of termination settings
-    termination_settings_list = [time_termination_settings,
-                                 upper_altitude_termination_settings,
-                                 lower_altitude_termination_settings]
-
-    return propagation_setup.propagator.hybrid_termination(termination_settings_list,
-                                                           fulfill_single_condition=True)
-
-
 """
 ### Dependent variables to save
 Finally, the `get_dependent_variables_to_save()` helper function returns a pre-defined list of dependent variables to save during the propagation, alongside the propagated state. This function can be expanded, but contains by default only the position of the spacecraft with respect to the Itokawa asteroid expressed in spherical coordinates.
 """
 
-
-def get_dependent_variables_to_save():
-    dependent_variables_to_save = [
-        propagation_setup.dependent_variable.central_body_fixed_spherical_position(
-            "Spacecraft", "Itokawa"
-        )
-    ]
-    return dependent_variables_to_save
-
-
 """
 ## Optimisation problem formulation 
 The optimisation problem can now be defined. This has to be done in a class that is compatible to what the PyGMO library can expect from this User Defined Problem (UDP). See [this page](https://esa.github.io/pygmo2/problem.html#pygmo.problem) from the PyGMO documentation as a reference. In this example, this class is called `AsteroidOrbitProblem`.
 
-The `AsteroidOrbitProblem.__init__()` method is used to setup the problem. Most importantly, many problem-related objects are saved through it: the system of bodies, the propagator settings, the parameters that will later be used for the termination settings, and the design variables boundaries. The input arguments that refer to functions are defined using a lambda function. While this seems unnecessary, it is **essential**: PyGMO internally pickles its user defined objects and some objects including the ones here cannot be pickled properly without using lambda functions.
+The `AsteroidOrbitProblem.__init__()` method is used to setup the problem. Most importantly, many problem-related objects are saved through it: the system of bodies, the propagator settings, the parameters that will later be used for the termination settings, and the design variables boundaries. PyGMO internally copies and pickles its user defined objects, but the system of bodies and the propagator settings cannot be pickled. The problem therefore only sends plain data to other processes: the mission parameters, the design variable boundaries, and the `simulation_settings`, which are the arguments of the `get_simulation_environment()` helper. In each process that evaluates the problem (e.g., an island of a `pg.mp_island` or `pg.ipyparallel_island` archipelago), the system of bodies and the propagator settings are then created on first use, and cached for the lifetime of that process. Copies of the problem made within the same process share these objects.
 
 Then, the `AsteroidOrbitProblem.get_bounds()` function is used by PyGMO to define the search space. This function returns the boundaries of each design variable, as defined in the [pygmo.problem.get_bounds](https://esa.github.io/pygmo2/problem.html#pygmo.problem.get_bounds) documentation.
 
@@ -362,99 +149,14 @@ The `AsteroidOrbitProblem.get_nobj()` function is also used by PyGMO. It returns
 The last function used by PyGMO is `AsteroidOrbitProblem.fitness()`. As mentioned in the [pygmo.problem.fitness](https://esa.github.io/pygmo2/problem.html#pygmo.problem.fitness) documentation, PyGMO will input a given set of design variable to this function, that is expected to return a score associated with them. This is thus the cost function of the problem. In this case, this `AsteroidOrbitProblem.fitness()` runs a simulation using TudatPy based on the orbital elements that PyGMO inputs as design variables. Then, the score relative to the two optimisation objectives is computed and returned. Note that, in PyGMO, this fitness function will always be **minimised**. To **maximise** objectives instead, the fitness that is returned will have to be for instance inversed. This is why, because we want to maximise the coverage, the fitness for this objective is computed as the inverse of the mean latitudes. If the mean of the latitudes is high, the coverage is high, which is closer to the optimum. Because this better value is higher than worse values, we return the fitness as the inverse of the mean latitudes.
 
 One more function is included, `AsteroidOrbitProblem.get_last_run_dynamics_simulator()`. This allows to get the dynamic simulator of the last simulation that was run in the problem.
-"""
-
-
-class AsteroidOrbitProblem:
-    
-    def __init__(self,
-                 bodies,
-                 propagator_settings,
-                 mission_initial_time,
-                 mission_duration,
-                 design_variable_lower_boundaries,
-                 design_variable_upper_boundaries):
-        
-        # Sets input arguments as lambda function attributes
-        # NOTE: this is done so that the class is "pickable", i.e., can be serialized by pygmo
-        self.bodies_function = lambda: bodies
-        self.propagator_settings_function = lambda: propagator_settings
-        
-        # Initialize empty dynamics simulator
-        self.dynamics_simulator_function = lambda: None
-        
-        # Set other input arguments as regular attributes
-        self.mission_initial_time = mission_initial_time
-        self.mission_duration = mission_duration
-        self.mission_final_time = mission_initial_time + mission_duration
-        self.design_variable_lower_boundaries = design_variable_lower_boundaries
-        self.design_variable_upper_boundaries = design_variable_upper_boundaries
-
-    def get_bounds(self):
-        return (list(self.design_variable_lower_boundaries), list(self.design_variable_upper_boundaries))
-
-    def get_nobj(self):
-        return 2
-
-    def fitness(self,
-                orbit_parameters):
-        # Retrieves system of bodies
-        current_bodies = self.bodies_function()
-        
-        # Retrieves Itokawa gravitational parameter
-        itokawa_gravitational_parameter = current_bodies.get("Itokawa").gravitational_parameter
-        
-        # Reset the initial state from the design variable vector
-        new_initial_state = element_conversion.keplerian_to_cartesian_elementwise(
-            gravitational_parameter=itokawa_gravitational_parameter,
-            semi_major_axis=orbit_parameters[0],
-            eccentricity=orbit_parameters[1],
-            inclination=np.deg2rad(orbit_parameters[2]),
-            argument_of_periapsis=np.deg2rad(235.7),
-            longitude_of_ascending_node=np.deg2rad(orbit_parameters[3]),
-            true_anomaly=np.deg2rad(139.87))
-        
-        # Retrieves propagator settings object
-        propagator_settings = self.propagator_settings_function()
-        
-        # Reset the initial state
-        propagator_settings.initial_states = new_initial_state
-
-        # Propagate orbit
-        dynamics_simulator = numerical_simulation.create_dynamics_simulator(current_bodies,
-                                                                        propagator_settings)
-        # Update dynamics simulator function
-        self.dynamics_simulator_function = lambda: dynamics_simulator
-
-        # Retrieve dependent variable history
-        dependent_variables = dynamics_simulator.propagation_results.dependent_variable_history
-        dependent_variables_list = np.vstack(list(dependent_variables.values()))
-        
-        # Retrieve distance
-        distance = dependent_variables_list[:, 0]
-        # Retrieve latitude
-        latitudes = dependent_variables_list[:, 1]
-        
-        # Compute mean latitude
-        mean_latitude = np.mean(np.absolute(latitudes))
-        # Computes fitness as mean latitude
-        current_fitness = 1.0 / mean_latitude
-
-        # Exaggerate fitness value if the spacecraft has broken out of the selected distance range
-        current_penalty = 0.0
-        if (max(dynamics_simulator.propagation_results.dependent_variable_history.keys()) < self.mission_final_time):
-            current_penalty = 1.0E2
-
-        return [current_fitness + current_penalty, np.mean(distance) + current_penalty * 1.0E3]
-
-    def get_last_run_dynamics_simulator(self):
-        return self.dynamics_simulator_function()
 
+The `AsteroidOrbitProblem` class also supports the evaluation of a complete generation in parallel, the archiving of the propagated orbits, and the caching of already evaluated orbits. These features are only used, and explained, in the next parts of this example.
+"""
 
 """
 ### Setup orbital simulation
 Before running the optimisation, some aspect of the orbital simulation around Itokawa still need to be setup.
-Most importantly, the simulation bodies, acceleration models, integrator settings, and propagator settings, all have to be defined. To do so, the helpers that were defined above are used.
+Most importantly, the simulation bodies, acceleration models, integrator settings, and propagator settings, all have to be defined. To do so, the helpers that were described above are used.
 """
 
 """
@@ -472,9 +174,7 @@ Follows the definition of the design variable range, that PyGMO will use during
 - Initial inclination between 0 and 180 deg.
 - Initial longitude of the ascending node between 0 and 360 deg.
  
-The system of bodies is then setup using the `create_simulation_bodies()` helper, and a radius for Itokawa of 161.915 meters.
-
-Finally, the acceleration models are setup using the `get_acceleration_models()` helper.
+Finally, the system of bodies is setup using the `create_simulation_bodies()` helper, and a radius for Itokawa of 161.915 meters.
 """
 
 
@@ -499,25 +199,15 @@ design_variable_ub = (2000, 0.3, 180, 360)
 # Create simulation bodies
 bodies = create_simulation_bodies(itokawa_radius)
 
-# Define bodies to propagate and central bodies
-bodies_to_propagate = ["Spacecraft"]
-central_bodies = ["Itokawa"]
-
-# Create acceleration models
-acceleration_models = get_acceleration_models(bodies_to_propagate, central_bodies, bodies)
-
 
 """
-#### Dependent variables, termination settings, and orbit parameters
-To define the propagator settings in the subsequent sections, we first call the `get_dependent_variables_to_save()` and `get_termination_settings()` helpers to define the dependent variables and termination settings.
+#### Termination settings and orbit parameters
+To define the propagator settings in the subsequent sections, we first call the `get_termination_settings()` helper to define the termination settings.
 
 The `orbit_parameters` list is defined from a `final_population.dat` file from the optimization. These values are not crucial, but do help for a 'relatively' stable orbit.
 """
 
 
-# Define list of dependent variables to save
-dependent_variables_to_save = get_dependent_variables_to_save()
-
 # Create propagation settings
 termination_settings = get_termination_settings(
     mission_initial_time, mission_duration, minimum_distance_from_com, maximum_distance_from_com)
@@ -527,39 +217,19 @@ orbit_parameters = [1.20940330e+03, 2.61526215e-01, 7.53126558e+01, 2.60280587e+
 
 """
 #### Integrator and Propagator settings
-Let's now define the integrator settings. In this case, a variable step integration scheme is used, with the followings:
+The propagator settings are defined by the `get_propagator_settings()` helper, which uses the `get_acceleration_models()` and `get_dependent_variables_to_save()` helpers described above. In this case, a variable step integration scheme is used, with the followings:
 
 - RKF7(8) coefficient set.
 - Initial time step of 1 sec.
 - Minimum and maximum time steps of 1E-6 sec and 1 Earth day.
 - Relative and absolute error tolerances of 1E-8.
 
-Then, we define pure translational propagation settings with a Cowell propagator. The initial state is set to 0 for both the position and the velocity. This is because the initial state will later be changed in the `AsteroidOrbitProblem.fitness()` function during the optimisation.
-"""
-
-
-# Create numerical integrator settings
-integrator_settings = propagation_setup.integrator.runge_kutta_variable_step_size(
-    initial_time_step=1.0,
-    coefficient_set=propagation_setup.integrator.CoefficientSets.rkf_78,
-    minimum_step_size=1.0E-6,
-    maximum_step_size=constants.JULIAN_DAY,
-    relative_error_tolerance=1.0E-8,
-    absolute_error_tolerance=1.0E-8)
-
-# Get current propagator, and define translational state propagation settings
-propagator = propagation_setup.propagator.cowell
-# Define propagation settings
-initial_state = np.zeros(6)
-propagator_settings = propagation_setup.propagator.translational(central_bodies,
-                                                                         acceleration_models,
-                                                                         bodies_to_propagate,
-                                                                         initial_state,
-                                                                         mission_initial_time,
-                                                                         integrator_settings,
-                                                                         termination_settings,
-                                                                         propagator,
-                                                                         dependent_variables_to_save)
+Then, pure translational propagation settings are defined with a Cowell propagator. The initial state is set to 0 for both the position and the velocity. This is because the initial state will later be changed in the `AsteroidOrbitProblem.fitness()` function during the optimisation.
+"""
+
+
+# Create integrator and propagator settings
+propagator_settings = get_propagator_settings(bodies, mission_initial_time, termination_settings)
 
 
 """
@@ -0,0 +1,946 @@
+"""
+# Asteroid orbit optimization with PyGMO - Shared environment
+Copyright (c) 2010-2022, Delft University of Technology. All rights reserved. This file is part of the Tudat. Redistribution  and use in source and binary forms, with or without modification, are permitted exclusively under the terms of the Modified BSD license. You should have received a copy of the license with this file. If not, please or visit: http://tudat.tudelft.nl/LICENSE.
+
+This module is shared by the three parts of the Asteroid Orbit Optimization example: Custom Environment, Design Space Exploration, and Optimization. It contains the helpers that create the custom Itokawa environment and the propagation settings, the `AsteroidOrbitProblem` PyGMO problem class, the trajectory archive and fitness cache used by this problem class, and the initializer of the worker processes that evaluate the fitness in parallel.
+
+The simulation environment is created lazily by `get_simulation_environment()`, and cached for the lifetime of the process. Scripts, problem instances, and worker processes that request the same simulation settings thus share a single system of bodies, and the SPICE kernels are only loaded once per process. An `AsteroidOrbitProblem` sent to another process only carries plain data, and retrieves its simulation environment from the cache of that process on first use.
+"""
+
+
+# Load standard modules
+import os
+import copy
+import hashlib
+import sqlite3
+import functools
+import itertools
+import threading
+import numpy as np
+from collections import OrderedDict
+from contextlib import closing
+
+# Load tudatpy modules
+from tudatpy import constants
+from tudatpy.interface import spice
+from tudatpy.astro import element_conversion
+from tudatpy.astro import frame_conversion
+from tudatpy import numerical_simulation
+from tudatpy.numerical_simulation import environment_setup
+from tudatpy.numerical_simulation import propagation_setup
+import tudatpy.util as util
+
+
+def get_itokawa_rotation_settings(itokawa_body_frame_name):
+    # Definition of initial Itokawa orientation conditions through the pole orientation
+    pole_declination = np.deg2rad(-66.30)     # Declination
+    pole_right_ascension = np.deg2rad(90.53)  # Right ascension
+    meridian_at_epoch = 0.0                   # Meridian
+
+    # Define initial Itokawa orientation in inertial frame (equatorial plane)
+    initial_orientation_j2000 = frame_conversion.inertial_to_body_fixed_rotation_matrix(
+        pole_declination, pole_right_ascension, meridian_at_epoch)
+    
+    # Get initial Itokawa orientation in inertial frame but in the Ecliptic plane
+    initial_orientation_eclipj2000 = np.matmul(spice.compute_rotation_matrix_between_frames(
+        "J2000", "ECLIPJ2000", 0.0), initial_orientation_j2000)
+
+    # Manually check the results, if desired
+    check_results = False
+    if check_results:
+        np.set_printoptions(precision=100)
+        print(initial_orientation_j2000)
+    
+        print(initial_orientation_eclipj2000)
+
+    # Compute rotation rate
+    rotation_rate = np.deg2rad(712.143) / constants.JULIAN_DAY
+
+    # Set up rotational model for Itokawa with constant angular velocity
+    return environment_setup.rotation_model.simple(
+        "ECLIPJ2000", itokawa_body_frame_name, initial_orientation_eclipj2000, 0.0, rotation_rate)
+
+
+def get_itokawa_ephemeris_settings(sun_gravitational_parameter):
+    # Define Itokawa initial Kepler elements
+    itokawa_kepler_elements = np.array([
+        1.324118017407799 * constants.ASTRONOMICAL_UNIT,
+        0.2801166461882852,
+        np.deg2rad(1.621303507642802),
+        np.deg2rad(162.8147699851312),
+        np.deg2rad(69.0803904880264),
+        np.deg2rad(187.6327516838828)])
+    
+    # Convert mean anomaly to true anomaly
+    itokawa_kepler_elements[5] = element_conversion.mean_to_true_anomaly(
+        eccentricity=itokawa_kepler_elements[1],
+        mean_anomaly=itokawa_kepler_elements[5])
+    
+    # Get epoch of initial Kepler elements (in Julian Days)
+    kepler_elements_reference_julian_day = 2459000.5
+    
+    # Sets new reference epoch for Itokawa ephemerides (different from J2000)
+    kepler_elements_reference_epoch = (kepler_elements_reference_julian_day - constants.JULIAN_DAY_ON_J2000) \
+                                      * constants.JULIAN_DAY
+    
+    # Sets the ephemeris model
+    return environment_setup.ephemeris.keplerian(
+        itokawa_kepler_elements,
+        kepler_elements_reference_epoch,
+        sun_gravitational_parameter,
+        "Sun",
+        "ECLIPJ2000")
+
+
+def get_itokawa_gravity_field_settings(itokawa_body_fixed_frame, itokawa_radius):
+    itokawa_gravitational_parameter = 2.36
+    normalized_cosine_coefficients = np.array([
+        [1.0, 0.0, 0.0, 0.0, 0.0],
+        [0.0, 0.0, 0.0, 0.0, 0.0],
+        [-0.145216, 0.0, 0.219420, 0.0, 0.0],
+        [0.036115, -0.028139, -0.046894, 0.069022, 0.0],
+        [0.087852, 0.034069, -0.123263, -0.030673, 0.150282]])
+    normalized_sine_coefficients = np.array([
+        [0.0, 0.0, 0.0, 0.0, 0.0],
+        [0.0, 0.0, 0.0, 0.0, 0.0],
+        [0.0, 0.0, 0.0, 0.0, 0.0],
+        [0.0, -0.006137, -0.046894, 0.033976, 0.0],
+        [0.0, 0.004870, 0.000098, -0.015026, 0.011627]])
+    return environment_setup.gravity_field.spherical_harmonic(
+        gravitational_parameter=itokawa_gravitational_parameter,
+        reference_radius=itokawa_radius,
+        normalized_cosine_coefficients=normalized_cosine_coefficients,
+        normalized_sine_coefficients=normalized_sine_coefficients,
+        associated_reference_frame=itokawa_body_fixed_frame)
+
+
+def get_itokawa_shape_settings(itokawa_radius):
+    # Creates spherical shape settings
+    return environment_setup.shape.spherical(itokawa_radius)
+
+
+def create_simulation_bodies(itokawa_radius):
+    ### CELESTIAL BODIES ###
+    # Define Itokawa body frame name
+    itokawa_body_frame_name = "Itokawa_Frame"
+
+    # Create default body settings for selected celestial bodies
+    bodies_to_create = ["Sun", "Earth", "Jupiter", "Saturn", "Mars"]
+
+    # Create default body settings for bodies_to_create, with "Earth"/"J2000" as
+    # global frame origin and orientation. This environment will only be valid
+    # in the indicated time range [simulation_start_epoch --- simulation_end_epoch]
+    body_settings = environment_setup.get_default_body_settings(
+        bodies_to_create,
+        "SSB",
+        "ECLIPJ2000")
+
+    # Add Itokawa body
+    body_settings.add_empty_settings("Itokawa")
+
+    # Adds Itokawa settings
+    # Gravity field
+    body_settings.get("Itokawa").gravity_field_settings = get_itokawa_gravity_field_settings(itokawa_body_frame_name,
+                                                                        itokawa_radius)
+    # Rotational model
+    body_settings.get("Itokawa").rotation_model_settings = get_itokawa_rotation_settings(itokawa_body_frame_name)
+    # Ephemeris
+    body_settings.get("Itokawa").ephemeris_settings = get_itokawa_ephemeris_settings(
+        spice.get_body_gravitational_parameter( 'Sun') )
+    # Shape (spherical)
+    body_settings.get("Itokawa").shape_settings = get_itokawa_shape_settings(itokawa_radius)
+
+    ### VEHICLE BODY ###
+    # Create vehicle object
+    body_settings.add_empty_settings("Spacecraft")
+    body_settings.get("Spacecraft").constant_mass = 400.0
+
+    # Create radiation pressure settings
+    reference_area_radiation = (4*0.3*0.1+2*0.1*0.1)/4  # Average projection area of a 3U CubeSat
+    radiation_pressure_coefficient = 1.2
+    occulting_bodies_dict = dict()
+    occulting_bodies_dict["Sun"] = ["Itokawa"]
+    vehicle_target_settings = environment_setup.radiation_pressure.cannonball_radiation_target(
+        reference_area_radiation, radiation_pressure_coefficient, occulting_bodies_dict )
+
+    # Add the radiation pressure interface to the body settings
+    body_settings.get("Spacecraft").radiation_pressure_target_settings = vehicle_target_settings
+
+    # Create system of selected bodies
+    bodies = environment_setup.create_system_of_bodies(body_settings)
+
+    return bodies
+
+
+def get_acceleration_models(bodies_to_propagate, central_bodies, bodies):
+    # Define accelerations acting on Spacecraft
+    accelerations_settings_spacecraft = dict(
+        Sun =     [ propagation_setup.acceleration.radiation_pressure(),
+                    propagation_setup.acceleration.point_mass_gravity() ],
+        Itokawa = [ propagation_setup.acceleration.spherical_harmonic_gravity(3, 3) ],
+        Jupiter = [ propagation_setup.acceleration.point_mass_gravity() ],
+        Saturn =  [ propagation_setup.acceleration.point_mass_gravity() ],
+        Mars =    [ propagation_setup.acceleration.point_mass_gravity() ],
+        Earth =   [ propagation_setup.acceleration.point_mass_gravity() ]
+    )
+
+    # Create global accelerations settings dictionary
+    acceleration_settings = {"Spacecraft": accelerations_settings_spacecraft}
+
+    # Create acceleration models
+    return propagation_setup.create_acceleration_models(
+        bodies,
+        acceleration_settings,
+        bodies_to_propagate,
+        central_bodies)
+
+
+def get_termination_settings(mission_initial_time, 
+                             mission_duration,
+                             minimum_distance_from_com,
+                             maximum_distance_from_com,
+                             latitude_monitor=None):
+    # Mission duration
+    time_termination_settings = propagation_setup.propagator.time_termination(
+        mission_initial_time + mission_duration,
+        terminate_exactly_on_final_condition=False
+    )
+    # Upper altitude
+    upper_altitude_termination_settings = propagation_setup.propagator.dependent_variable_termination(
+        dependent_variable_settings=propagation_setup.dependent_variable.relative_distance('Spacecraft', 'Itokawa'),
+        limit_value=maximum_distance_from_com,
+        use_as_lower_limit=False,
+        terminate_exactly_on_final_condition=False
+    )
+    # Lower altitude
+    lower_altitude_termination_settings = propagation_setup.propagator.dependent_variable_termination(
+        dependent_variable_settings=propagation_setup.dependent_variable.altitude('Spacecraft', 'Itokawa'),
+        limit_value=minimum_distance_from_com,
+        use_as_lower_limit=True,
+        terminate_exactly_on_final_condition=False
+    )
+
+    # Define list of termination settings
+    termination_settings_list = [time_termination_settings,
+                                 upper_altitude_termination_settings,
+                                 lower_altitude_termination_settings]
+
+    # Mean latitude out of reach, if requested
+    if latitude_monitor is not None:
+        termination_settings_list.append(
+            propagation_setup.propagator.custom_termination(latitude_monitor.is_mean_latitude_out_of_reach))
+
+    return propagation_setup.propagator.hybrid_termination(termination_settings_list,
+                                                           fulfill_single_condition=True)
+
+
+class MeanLatitudeMonitor:
+
+    def __init__(self,
+                 bodies,
+                 mission_initial_time,
+                 mission_duration,
+                 minimum_mean_latitude):
+        # The monitor belongs to the termination settings of one process, and is never sent to another process
+        self.bodies = bodies
+        self.mission_initial_time = mission_initial_time
+        self.mission_final_time = mission_initial_time + mission_duration
+        self.minimum_mean_latitude = minimum_mean_latitude
+        self.reset()
+
+    def reset(self):
+        # Initialize the time integral of the absolute latitude
+        self.previous_time = None
+        self.previous_absolute_latitude = None
+        self.absolute_latitude_integral = 0.0
+
+    def get_absolute_latitude(self):
+        current_bodies = self.bodies
+
+        # Express the position of the spacecraft w.r.t. Itokawa in the Itokawa-fixed frame
+        relative_position = current_bodies.get("Spacecraft").position - current_bodies.get("Itokawa").position
+        body_fixed_position = np.dot(current_bodies.get("Itokawa").inertial_to_body_fixed_frame, relative_position)
+        return np.abs(np.arcsin(body_fixed_position[2] / np.linalg.norm(body_fixed_position)))
+
+    def is_mean_latitude_out_of_reach(self,
+                                      current_time):
+        # Restart the integral when a new propagation starts
+        if self.previous_time is None or current_time <= self.previous_time:
+            self.reset()
+
+        # Integrate the absolute latitude over time with the trapezoidal rule
+        absolute_latitude = self.get_absolute_latitude()
+        if self.previous_time is not None:
+            self.absolute_latitude_integral += 0.5 * (absolute_latitude + self.previous_absolute_latitude) \
+                                               * (current_time - self.previous_time)
+        self.previous_time = current_time
+        self.previous_absolute_latitude = absolute_latitude
+
+        # Highest mean latitude that can still be reached, if the spacecraft stays above a pole for the rest of the
+        # mission. If it is below the threshold, the orbit can never be good enough and the propagation is stopped
+        remaining_time = self.mission_final_time - current_time
+        best_mean_latitude = (self.absolute_latitude_integral + remaining_time * np.pi / 2.0) \
+                             / (self.mission_final_time - self.mission_initial_time)
+        return best_mean_latitude < self.minimum_mean_latitude
+
+
+def get_time_weighted_mean(epochs,
+                           values,
+                           final_epoch):
+    # Mean of the values over time with the trapezoidal rule (as integrated by the MeanLatitudeMonitor), up to the final
+    # epoch of the mission, interpolating the values at that epoch if the propagation stepped past it
+    if len(epochs) < 2:
+        return np.mean(values)
+    if epochs[-1] > final_epoch:
+        number_of_epochs = np.searchsorted(epochs, final_epoch, side='right')
+        values = np.append(values[:number_of_epochs], np.interp(final_epoch, epochs, values))
+        epochs = np.append(epochs[:number_of_epochs], final_epoch)
+    return np.sum(0.5 * (values[1:] + values[:-1]) * np.diff(epochs)) / (epochs[-1] - epochs[0])
+
+
+def get_dependent_variables_to_save():
+    dependent_variables_to_save = [
+        propagation_setup.dependent_variable.central_body_fixed_spherical_position(
+            "Spacecraft", "Itokawa"
+        )
+    ]
+    return dependent_variables_to_save
+
+
+# Integrator coefficient sets and tolerances, from the lowest to the highest (nominal) fidelity
+integrator_fidelity_ladder = [(propagation_setup.integrator.CoefficientSets.rkf_45, 1.0E-6),
+                              (propagation_setup.integrator.CoefficientSets.rkf_78, 1.0E-7),
+                              (propagation_setup.integrator.CoefficientSets.rkf_78, 1.0E-8)]
+
+
+def get_integrator_settings(fidelity_level=-1):
+    # Retrieve the coefficient set and tolerance of the selected fidelity level
+    coefficient_set, tolerance = integrator_fidelity_ladder[fidelity_level]
+
+    # Create numerical integrator settings
+    return propagation_setup.integrator.runge_kutta_variable_step_size(
+        initial_time_step=1.0,
+        coefficient_set=coefficient_set,
+        minimum_step_size=1.0E-6,
+        maximum_step_size=constants.JULIAN_DAY,
+        relative_error_tolerance=tolerance,
+        absolute_error_tolerance=tolerance)
+
+
+def get_propagator_settings(bodies,
+                            mission_initial_time,
+                            termination_settings,
+                            fidelity_level=-1):
+    # Define bodies to propagate and central bodies
+    bodies_to_propagate = ["Spacecraft"]
+    central_bodies = ["Itokawa"]
+
+    # Create acceleration models
+    acceleration_models = get_acceleration_models(bodies_to_propagate, central_bodies, bodies)
+
+    # Define list of dependent variables to save
+    dependent_variables_to_save = get_dependent_variables_to_save()
+
+    # Create numerical integrator settings
+    integrator_settings = get_integrator_settings(fidelity_level)
+
+    # Get current propagator, and define translational state propagation settings
+    propagator = propagation_setup.propagator.cowell
+    # Define propagation settings (the initial state is reset by the fitness function)
+    initial_state = np.zeros(6)
+    return propagation_setup.propagator.translational(central_bodies,
+                                                      acceleration_models,
+                                                      bodies_to_propagate,
+                                                      initial_state,
+                                                      mission_initial_time,
+                                                      integrator_settings,
+                                                      termination_settings,
+                                                      propagator,
+                                                      dependent_variables_to_save)
+
+
+@functools.lru_cache(maxsize=None)
+def load_spice_kernels():
+    # Load spice kernels, only once per process
+    spice.load_standard_kernels()
+
+
+@functools.lru_cache(maxsize=None)
+def get_simulation_bodies(itokawa_radius):
+    # Load spice kernels, if this was not done yet in the current process
+    load_spice_kernels()
+
+    # Create simulation bodies, only once per process
+    return create_simulation_bodies(itokawa_radius)
+
+
+@functools.lru_cache(maxsize=None)
+def get_simulation_environment(itokawa_radius,
+                               mission_initial_time,
+                               mission_duration,
+                               minimum_distance_from_com,
+                               maximum_distance_from_com,
+                               minimum_mean_latitude=None,
+                               fidelity_level=-1):
+    # Create (or retrieve) simulation bodies, shared by all fidelity levels
+    bodies = get_simulation_bodies(itokawa_radius)
+
+    # Create the monitor that stops orbits which can no longer reach the minimum mean latitude, if requested
+    if minimum_mean_latitude is not None:
+        latitude_monitor = MeanLatitudeMonitor(bodies, mission_initial_time, mission_duration, minimum_mean_latitude)
+    else:
+        latitude_monitor = None
+
+    # Create termination, integrator and propagator settings
+    termination_settings = get_termination_settings(
+        mission_initial_time, mission_duration, minimum_distance_from_com, maximum_distance_from_com, latitude_monitor)
+    propagator_settings = get_propagator_settings(bodies, mission_initial_time, termination_settings, fidelity_level)
+
+    # The system of bodies and propagator settings are cached, and reused for identical simulation settings
+    return bodies, propagator_settings
+
+
+class TrajectoryArchive:
+
+    def __init__(self,
+                 archive_directory,
+                 decimation=10,
+                 maximum_size=512 * 1024 ** 2):
+        self.archive_directory = archive_directory
+        self.decimation = decimation
+        self.maximum_size = maximum_size
+
+        # Create the archive directory if it does not exist yet
+        os.makedirs(archive_directory, exist_ok=True)
+
+    def get_file_names(self,
+                       orbit_parameters):
+        # Compute the key of the orbit from the exact values of its design variables
+        key = hashlib.sha1(np.asarray(orbit_parameters, dtype=np.float64).tobytes()).hexdigest()
+        return (os.path.join(self.archive_directory, key + '_states.npy'),
+                os.path.join(self.archive_directory, key + '_dependent_variables.npy'))
+
+    def contains(self,
+                 orbit_parameters):
+        return all(os.path.isfile(file_name) for file_name in self.get_file_names(orbit_parameters))
+
+    def save(self,
+             orbit_parameters,
+             state_history,
+             dependent_variable_history):
+        for file_name, history in zip(self.get_file_names(orbit_parameters),
+                                      [state_history, dependent_variable_history]):
+            # Convert the history to an array, with the epochs in the first column, and decimate it
+            history_array = util.result2array(history)[::self.decimation]
+
+            # Write to a temporary file first, so that other processes never read a partially written file
+            temporary_file_name = file_name[:-len('.npy')] + '_%i.tmp.npy' % os.getpid()
+            np.save(temporary_file_name, history_array)
+            os.replace(temporary_file_name, file_name)
+        self.evict(self.get_file_names(orbit_parameters))
+
+    def load(self,
+             orbit_parameters):
+        # Mark the histories as recently used, such that they are removed last, and return them as memory-mapped arrays
+        file_names = self.get_file_names(orbit_parameters)
+        for file_name in file_names:
+            os.utime(file_name)
+        return [np.load(file_name, mmap_mode='r') for file_name in file_names]
+
+    def evict(self,
+              file_names_to_keep=()):
+        # Remove the least recently used histories until the archive fits within its maximum size, keeping the given
+        # files. Other processes may remove the same files at the same time, and files in use may not be removable
+        file_sizes = dict()
+        for file_name in os.listdir(self.archive_directory):
+            if file_name.endswith('.npy') and not file_name.endswith('.tmp.npy'):
+                file_name = os.path.join(self.archive_directory, file_name)
+                try:
+                    file_sizes[file_name] = (os.path.getmtime(file_name), os.path.getsize(file_name))
+                except FileNotFoundError:
+                    pass
+        archive_size = sum(file_size for _, file_size in file_sizes.values())
+        for file_name in sorted(file_sizes, key=lambda file_name: file_sizes[file_name][0]):
+            if archive_size <= self.maximum_size:
+                break
+            if file_name not in file_names_to_keep:
+                archive_size -= file_sizes[file_name][1]
+                try:
+                    os.remove(file_name)
+                except OSError:
+                    pass
+
+
+# Number of orbit statistics returned by AsteroidOrbitProblem.propagate_orbit(), and the version of their layout in the
+# fitness cache, to be increased whenever the statistics change, such that rows cached by earlier versions are not used
+number_of_orbit_statistics = 6
+orbit_statistics_format_version = 4
+
+
+class FitnessCache:
+
+    def __init__(self,
+                 key_resolution,
+                 memory_size=10000,
+                 database_file=None):
+        self.key_resolution = np.asarray(key_resolution, dtype=np.float64)
+        self.memory_size = memory_size
+        self.database_file = database_file
+
+        # Initialize memory cache, ordered from least to most recently used
+        self.memory_cache = OrderedDict()
+
+        # Initialize hit and miss counters
+        self.memory_hits = 0
+        self.database_hits = 0
+        self.misses = 0
+
+        # Create the database table if it does not exist yet
+        if self.database_file is not None:
+            with closing(sqlite3.connect(self.database_file, timeout=60.0)) as connection, connection:
+                connection.execute("CREATE TABLE IF NOT EXISTS fitness_cache (key TEXT PRIMARY KEY, value BLOB)")
+
+    def get_key(self,
+                design_variables):
+        # Quantize the design variables with the selected resolution
+        quantized_design_variables = np.round(np.asarray(design_variables, dtype=np.float64) / self.key_resolution)
+        return " ".join("%i" % value for value in quantized_design_variables)
+
+    def get(self,
+            design_variables,
+            key_prefixes=('',),
+            number_of_values=None):
+        keys = [key_prefix + self.get_key(design_variables) for key_prefix in key_prefixes]
+
+        # Look for the keys in memory first, entries with an unexpected number of values being treated as misses
+        for key in keys:
+            values = self.memory_cache.get(key)
+            if values is not None and (number_of_values is None or len(values) == number_of_values):
+                self.memory_cache.move_to_end(key)
+                self.memory_hits += 1
+                return values
+
+        # Then look for the keys in the database, and keep the entry in memory if it is found
+        if self.database_file is not None:
+            with closing(sqlite3.connect(self.database_file, timeout=60.0)) as connection:
+                for key in keys:
+                    row = connection.execute("SELECT value FROM fitness_cache WHERE key = ?", (key,)).fetchone()
+                    if row is None:
+                        continue
+                    values = np.frombuffer(row[0], dtype=np.float64)
+                    if number_of_values is None or len(values) == number_of_values:
+                        self.database_hits += 1
+                        self.add_to_memory(key, values)
+                        return values
+
+        self.misses += 1
+        return None
+
+    def put(self,
+            design_variables,
+            values,
+            key_prefix=''):
+        key = key_prefix + self.get_key(design_variables)
+        values = np.asarray(values, dtype=np.float64)
+        self.add_to_memory(key, values)
+
+        # Store the entry in the database as well
+        if self.database_file is not None:
+            with closing(sqlite3.connect(self.database_file, timeout=60.0)) as connection, connection:
+                connection.execute("INSERT OR REPLACE INTO fitness_cache (key, value) VALUES (?, ?)",
+                                   (key, values.tobytes()))
+
+    def add_to_memory(self,
+                      key,
+                      values):
+        # Add the entry as most recently used, and evict the least recently used entry if the memory cache is full
+        self.memory_cache[key] = values
+        self.memory_cache.move_to_end(key)
+        if len(self.memory_cache) > self.memory_size:
+            self.memory_cache.popitem(last=False)
+
+    def print_statistics(self):
+        number_of_lookups = self.memory_hits + self.database_hits + self.misses
+        print("Fitness cache: %i lookups, %i memory hits, %i database hits, %i misses"
+              % (number_of_lookups, self.memory_hits, self.database_hits, self.misses))
+
+
+# Lock of the objects shared by the copies of an AsteroidOrbitProblem in the current process (the fitness cache, the
+# surrogate model, the fidelity controller, and the simulation environment used for serial propagations), which are
+# used at the same time by the islands of a thread-island archipelago. It is never sent to other processes
+shared_object_lock = threading.RLock()
+
+# Attributes of the AsteroidOrbitProblem that hold objects of the current process
+process_object_names = ('bodies',
+                        'propagator_settings',
+                        'worker_pool',
+                        'surrogate_model',
+                        'fidelity_propagator_settings',
+                        'fidelity_controller',
+                        'dynamics_simulator')
+
+
+class AsteroidOrbitProblem:
+    
+    def __init__(self,
+                 bodies,
+                 propagator_settings,
+                 mission_initial_time,
+                 mission_duration,
+                 design_variable_lower_boundaries,
+                 design_variable_upper_boundaries,
+                 worker_pool=None,
+                 number_of_workers=1,
+                 trajectory_archive=None,
+                 fitness_cache=None,
+                 surrogate_model=None,
+                 minimum_mean_latitude=None,
+                 fidelity_propagator_settings=None,
+                 fidelity_controller=None,
+                 simulation_settings=None):
+        
+        # Objects of the current process, which can not be serialized. They are shared by the copies of the problem made
+        # within this process, and recreated on first use in other processes (see __getstate__)
+        self.bodies = bodies
+        self.propagator_settings = propagator_settings
+        self.worker_pool = worker_pool
+        self.surrogate_model = surrogate_model
+        self.fidelity_propagator_settings = fidelity_propagator_settings
+        self.fidelity_controller = fidelity_controller
+
+        # Initialize empty dynamics simulator
+        self.dynamics_simulator = None
+
+        # Set other input arguments as regular attributes
+        self.mission_initial_time = mission_initial_time
+        self.mission_duration = mission_duration
+        self.mission_final_time = mission_initial_time + mission_duration
+        self.design_variable_lower_boundaries = design_variable_lower_boundaries
+        self.design_variable_upper_boundaries = design_variable_upper_boundaries
+        self.number_of_workers = number_of_workers
+        self.trajectory_archive = trajectory_archive
+        self.fitness_cache = fitness_cache
+        self.minimum_mean_latitude = minimum_mean_latitude
+
+        # Arguments of get_simulation_environment(), from which the problem is recreated in other processes
+        self.simulation_settings = simulation_settings
+
+    def __getstate__(self):
+        # The simulation environment can not be serialized, so only the plain data, including the simulation settings,
+        # is sent to other processes (e.g., the islands of a pg.mp_island or pg.ipyparallel_island archipelago). There,
+        # the orbits are evaluated serially, without surrogate model or lower fidelity levels
+        if self.simulation_settings is None:
+            raise TypeError("An AsteroidOrbitProblem can only be serialized if it has simulation settings")
+        state = self.__dict__.copy()
+        state.update({name: None for name in process_object_names})
+        state['number_of_workers'] = 1
+        return state
+
+    def __deepcopy__(self,
+                     memo):
+        # Copies made by PyGMO within the same process keep sharing the simulation environment, worker pool and fitness
+        # cache
+        shared_names = process_object_names + ('fitness_cache',)
+        problem_copy = self.__class__.__new__(self.__class__)
+        problem_copy.__dict__.update(copy.deepcopy({name: value for name, value in self.__dict__.items()
+                                                    if name not in shared_names}, memo))
+        problem_copy.__dict__.update({name: self.__dict__[name] for name in shared_names})
+        return problem_copy
+
+    def get_simulation_environment(self):
+        # Create (or retrieve) the simulation environment of this process from the simulation settings, if the problem
+        # was created without one, or was sent to this process. This is only done on first use, such that unpickling the
+        # problem is fast, and processes that never evaluate it do not create an environment
+        if self.bodies is None:
+            self.bodies, self.propagator_settings = get_simulation_environment(*self.simulation_settings)
+        return self.bodies, self.propagator_settings
+
+    def get_bounds(self):
+        return (list(self.design_variable_lower_boundaries), list(self.design_variable_upper_boundaries))
+
+    def get_nobj(self):
+        return 2
+
+    def is_high_fidelity(self,
+                         fidelity_level):
+        # The highest level of the integrator fidelity ladder is the nominal integrator
+        return fidelity_level is None or fidelity_level == len(integrator_fidelity_ladder) - 1
+
+    def get_current_fidelity_level(self):
+        fidelity_controller = self.fidelity_controller
+        return None if fidelity_controller is None else fidelity_controller.fidelity_level
+
+    def propagate_orbit(self,
+                        orbit_parameters,
+                        fidelity_level=None):
+        # Retrieves system of bodies and propagator settings
+        current_bodies, nominal_propagator_settings = self.get_simulation_environment()
+        
+        # Retrieves Itokawa gravitational parameter
+        itokawa_gravitational_parameter = current_bodies.get("Itokawa").gravitational_parameter
+        
+        # Reset the initial state from the design variable vector
+        new_initial_state = element_conversion.keplerian_to_cartesian_elementwise(
+            gravitational_parameter=itokawa_gravitational_parameter,
+            semi_major_axis=orbit_parameters[0],
+            eccentricity=orbit_parameters[1],
+            inclination=np.deg2rad(orbit_parameters[2]),
+            argument_of_periapsis=np.deg2rad(235.7),
+            longitude_of_ascending_node=np.deg2rad(orbit_parameters[3]),
+            true_anomaly=np.deg2rad(139.87))
+        
+        # Retrieves propagator settings object of the selected fidelity level
+        if self.is_high_fidelity(fidelity_level):
+            propagator_settings = nominal_propagator_settings
+        else:
+            propagator_settings = self.fidelity_propagator_settings[fidelity_level]
+        
+        # Reset the initial state
+        propagator_settings.initial_states = new_initial_state
+
+        # Propagate orbit
+        dynamics_simulator = numerical_simulation.create_dynamics_simulator(current_bodies,
+                                                                        propagator_settings)
+        
+        # Update dynamics simulator
+        self.dynamics_simulator = dynamics_simulator
+
+        # Retrieve dependent variable history
+        dependent_variables = dynamics_simulator.propagation_results.dependent_variable_history
+
+        # Save the state and dependent variable histories of high fidelity orbits for the post-processing, if requested
+        if self.trajectory_archive is not None and self.is_high_fidelity(fidelity_level):
+            self.trajectory_archive.save(orbit_parameters,
+                                         dynamics_simulator.propagation_results.state_history,
+                                         dependent_variables)
+
+        dependent_variables_list = np.vstack(list(dependent_variables.values()))
+        
+        # Retrieve distance
+        distance = dependent_variables_list[:, 0]
+        # Retrieve latitude
+        latitudes = dependent_variables_list[:, 1]
+
+        # Retrieve the number of function evaluations of the integrator
+        function_evaluations = dynamics_simulator.propagation_results.cumulative_number_of_function_evaluations_history
+
+        # With a minimum mean latitude, the mean latitude is weighted by the (variable) step size, such that it is the
+        # same quantity as bounded by the MeanLatitudeMonitor. Otherwise, it is the mean of the saved latitudes
+        if self.minimum_mean_latitude is None:
+            mean_latitude = np.mean(np.absolute(latitudes))
+        else:
+            epochs = np.array(list(dependent_variables.keys()))
+            mean_latitude = get_time_weighted_mean(epochs, np.absolute(latitudes), self.mission_final_time)
+
+        # Return the mean latitude, the mean, minimum and maximum distance, the final epoch of the orbit, and the
+        # number of function evaluations of the propagation
+        return np.array([mean_latitude,
+                         np.mean(distance),
+                         np.min(distance),
+                         np.max(distance),
+                         max(dependent_variables.keys()),
+                         function_evaluations[max(function_evaluations.keys())]])
+
+    def get_cache_key_prefix(self,
+                             fidelity_level=None):
+        # Orbits propagated with a lower fidelity integrator are cached separately from the nominal ones, and both are
+        # cached separately from the statistics of earlier versions
+        cache_key_prefix = 'v%i ' % orbit_statistics_format_version
+        if not self.is_high_fidelity(fidelity_level):
+            cache_key_prefix += 'fidelity %i ' % fidelity_level
+
+        # With a minimum mean latitude, all orbits are cached separately, such that they are only reused with the same
+        # threshold. Completely propagated orbits of runs without (or with another) threshold would otherwise be
+        # reused, while the MeanLatitudeMonitor would have stopped and penalized some of them
+        if self.minimum_mean_latitude is not None:
+            cache_key_prefix += 'latitude %.6g ' % self.minimum_mean_latitude
+        return cache_key_prefix
+
+    def get_orbit_statistics(self,
+                             orbit_parameters,
+                             fidelity_level=None):
+        # Retrieves fitness cache
+        fitness_cache = self.fitness_cache
+
+        # Propagate the orbit only if its statistics are not cached yet. The simulation environment and the fitness cache
+        # are shared with the other copies of the problem in this process
+        with shared_object_lock:
+            orbit_statistics = None if fitness_cache is None \
+                else fitness_cache.get(orbit_parameters,
+                                       (self.get_cache_key_prefix(fidelity_level),),
+                                       number_of_orbit_statistics)
+            if orbit_statistics is None:
+                orbit_statistics = self.propagate_orbit(orbit_parameters, fidelity_level)
+                if fitness_cache is not None:
+                    fitness_cache.put(orbit_parameters,
+                                      orbit_statistics,
+                                      self.get_cache_key_prefix(fidelity_level))
+        return orbit_statistics
+
+    def get_fitness_from_statistics(self,
+                                    orbit_statistics):
+        mean_latitude, mean_distance, _, _, final_epoch = orbit_statistics[:5]
+
+        # Computes fitness as mean latitude
+        current_fitness = 1.0 / mean_latitude
+
+        # Exaggerate fitness value if the spacecraft has broken out of the selected distance range
+        current_penalty = 0.0
+        if final_epoch < self.mission_final_time:
+            current_penalty = 1.0E2
+
+        return [current_fitness + current_penalty, mean_distance + current_penalty * 1.0E3]
+
+    def fitness(self,
+                orbit_parameters):
+        return self.get_fitness_from_statistics(self.get_orbit_statistics(orbit_parameters))
+
+    def propagate_batch(self,
+                        orbit_parameters_list,
+                        fidelity_level=None):
+        # Retrieves worker pool and fitness cache
+        worker_pool = self.worker_pool
+        fitness_cache = self.fitness_cache
+
+        # Take the statistics of the orbits that are already cached
+        orbit_parameters_list = np.asarray(orbit_parameters_list)
+        with shared_object_lock:
+            orbit_statistics_list = [None if fitness_cache is None
+                                     else fitness_cache.get(orbit_parameters,
+                                                            (self.get_cache_key_prefix(fidelity_level),),
+                                                            number_of_orbit_statistics)
+                                     for orbit_parameters in orbit_parameters_list]
+        indices_to_propagate = [index for index, orbit_statistics in enumerate(orbit_statistics_list)
+                                if orbit_statistics is None]
+        if len(indices_to_propagate) == 0:
+            return orbit_statistics_list, indices_to_propagate
+
+        # Propagate the other orbits serially if no worker pool is available, with the simulation environment shared by
+        # the copies of the problem in this process. Otherwise, distribute them in chunks over the workers, while other
+        # copies of the problem can use the pool as well. A few chunks are sent to each worker, such that workers that
+        # propagated short (penalized) orbits pick up the remaining work
+        if worker_pool is None:
+            with shared_object_lock:
+                propagated_orbit_statistics = [self.propagate_orbit(orbit_parameters, fidelity_level)
+                                               for orbit_parameters in orbit_parameters_list[indices_to_propagate]]
+        else:
+            chunk_size = max(1, len(indices_to_propagate) // (4 * self.number_of_workers))
+            propagated_orbit_statistics = worker_pool.starmap(evaluate_orbit_statistics_in_worker,
+                                                              zip(orbit_parameters_list[indices_to_propagate],
+                                                                  itertools.repeat(fidelity_level)),
+                                                              chunksize=chunk_size)
+        with shared_object_lock:
+            for index, orbit_statistics in zip(indices_to_propagate, propagated_orbit_statistics):
+                orbit_statistics_list[index] = orbit_statistics
+                if fitness_cache is not None:
+                    fitness_cache.put(orbit_parameters_list[index],
+                                      orbit_statistics,
+                                      self.get_cache_key_prefix(fidelity_level))
+
+        # Return the statistics of all orbits, and the indices of the orbits that were propagated for this batch
+        return orbit_statistics_list, indices_to_propagate
+
+    def get_batch_orbit_statistics(self,
+                                   orbit_parameters_list,
+                                   fidelity_level=None):
+        return self.propagate_batch(orbit_parameters_list, fidelity_level)[0]
+
+    def batch_fitness(self,
+                      orbit_parameters_batch):
+        # Split the flattened batch of decision vectors into one row per individual
+        number_of_design_variables = len(self.design_variable_lower_boundaries)
+        orbit_parameters_list = np.reshape(orbit_parameters_batch, (-1, number_of_design_variables))
+
+        # Retrieves surrogate model and current fidelity level
+        surrogate_model = self.surrogate_model
+        fidelity_level = self.get_current_fidelity_level()
+
+        # With a trained surrogate model, predict the fitness of all individuals, and only propagate the orbits of the
+        # promising ones. Otherwise, evaluate the orbit statistics of all individuals, in parallel if a worker pool is
+        # available. The surrogate model is shared with the other copies of the problem in this process
+        with shared_object_lock:
+            use_surrogate_model = surrogate_model is not None and surrogate_model.is_trained()
+            if use_surrogate_model:
+                fitness_list = surrogate_model.predict(orbit_parameters_list)
+                selected = surrogate_model.select_promising(orbit_parameters_list, fitness_list)
+            else:
+                fitness_list = np.zeros((len(orbit_parameters_list), self.get_nobj()))
+                selected = np.ones(len(orbit_parameters_list), dtype=bool)
+        orbit_statistics_list, propagated_indices = self.propagate_batch(orbit_parameters_list[selected],
+                                                                         fidelity_level)
+        fitness_list[selected] = [self.get_fitness_from_statistics(orbit_statistics)
+                                  for orbit_statistics in orbit_statistics_list]
+
+        with shared_object_lock:
+            # Train the surrogate model with the propagated (or cached) orbits
+            if surrogate_model is not None:
+                surrogate_model.add_training_data(orbit_parameters_list[selected], fitness_list[selected])
+                surrogate_model.surrogate_evaluations += np.count_nonzero(~selected)
+                surrogate_model.end_batch()
+
+            # Count the function evaluations spent on this batch at the current fidelity level, only for the orbits that
+            # were propagated (and not taken from the fitness cache)
+            if fidelity_level is not None:
+                self.fidelity_controller.add_function_evaluations(
+                    sum(orbit_statistics_list[index][5] for index in propagated_indices))
+
+        # Return the fitness values flattened in the same order as the decision vectors
+        return np.ravel(fitness_list)
+
+    def get_last_run_dynamics_simulator(self):
+        return self.dynamics_simulator
+
+
+# Orbit problem of the current worker process, created once by initialize_fitness_worker()
+worker_orbit_problem = None
+
+
+def initialize_fitness_worker(itokawa_radius,
+                              mission_initial_time,
+                              mission_duration,
+                              minimum_distance_from_com,
+                              maximum_distance_from_com,
+                              design_variable_lower_boundaries,
+                              design_variable_upper_boundaries,
+                              trajectory_archive=None,
+                              minimum_mean_latitude=None,
+                              use_fidelity_ladder=False):
+    global worker_orbit_problem
+
+    # Create (or retrieve) the system of bodies and the propagator settings of this worker
+    worker_bodies, worker_propagator_settings = get_simulation_environment(itokawa_radius,
+                                                                           mission_initial_time,
+                                                                           mission_duration,
+                                                                           minimum_distance_from_com,
+                                                                           maximum_distance_from_com,
+                                                                           minimum_mean_latitude)
+
+    # Create (or retrieve) the propagator settings of the lower integrator fidelity levels, if requested
+    if use_fidelity_ladder:
+        worker_fidelity_propagator_settings = [
+            get_simulation_environment(itokawa_radius,
+                                       mission_initial_time,
+                                       mission_duration,
+                                       minimum_distance_from_com,
+                                       maximum_distance_from_com,
+                                       minimum_mean_latitude,
+                                       fidelity_level)[1]
+            for fidelity_level in range(len(integrator_fidelity_ladder) - 1)]
+    else:
+        worker_fidelity_propagator_settings = None
+
+    # Create the orbit problem used by this worker to evaluate its decision vectors
+    worker_orbit_problem = AsteroidOrbitProblem(worker_bodies,
+                                                worker_propagator_settings,
+                                                mission_initial_time,
+                                                mission_duration,
+                                                design_variable_lower_boundaries,
+                                                design_variable_upper_boundaries,
+                                                trajectory_archive=trajectory_archive,
+                                                minimum_mean_latitude=minimum_mean_latitude,
+                                                fidelity_propagator_settings=worker_fidelity_propagator_settings)
+
+
+def evaluate_orbit_statistics_in_worker(orbit_parameters,
+                                        fidelity_level=None):
+    return worker_orbit_problem.propagate_orbit(orbit_parameters, fidelity_level)
@@ -0,0 +1,212 @@
+"""
+# Asteroid orbit optimization with PyGMO - Design space exploration engine
+Copyright (c) 2010-2022, Delft University of Technology. All rights reserved. This file is part of the Tudat. Redistribution  and use in source and binary forms, with or without modification, are permitted exclusively under the terms of the Modified BSD license. You should have received a copy of the license with this file. If not, please or visit: http://tudat.tudelft.nl/LICENSE.
+
+This module is used by the Design Space Exploration part of the Asteroid Orbit Optimization example. It contains helpers that convert the design arrays of the exploration methods (random one-at-a-time variations, orthogonal arrays, and Yates arrays) into one row of orbit parameters per run, and the `DesignSpaceExploration` class that evaluates these rows.
+
+Space-filling designs, varying all design variables jointly, are created by `get_space_filling_design()` from Sobol or Latin hypercube samples. Such designs can be evaluated until the statistics of the objectives converge, through `DesignSpaceExploration.run_until_converged()`.
+
+The rows of a design are evaluated in blocks through `AsteroidOrbitProblem.get_batch_orbit_statistics()`, so that they are spread over the worker pool of the problem, if any. After each block, the statistics of the completed rows are written to disk. When an exploration is interrupted, running it again with the same design only propagates the rows that were not completed yet.
+"""
+
+
+# Load standard modules
+import os
+import numpy as np
+from scipy.stats import qmc
+
+# Number of orbit statistics returned by AsteroidOrbitProblem.get_batch_orbit_statistics() for each run
+number_of_orbit_statistics = 6
+
+
+def get_monte_carlo_design(nominal_orbit_parameters,
+                           design_variable_lower_boundaries,
+                           design_variable_upper_boundaries,
+                           number_of_runs,
+                           random_seed):
+    # Create the random number generator (same sequence as np.random.seed(random_seed))
+    random_number_generator = np.random.RandomState(random_seed)
+
+    # Vary the design variables one at a time, the varied variable keeping its last random value afterwards
+    orbit_parameters = np.array(nominal_orbit_parameters, dtype=float)
+    design_parameters = np.zeros((len(orbit_parameters) * number_of_runs, len(orbit_parameters)))
+    for i in range(len(orbit_parameters)):
+        parameter_all_runs = random_number_generator.uniform(
+            design_variable_lower_boundaries[i], design_variable_upper_boundaries[i], number_of_runs)
+        for j in range(number_of_runs):
+            orbit_parameters[i] = parameter_all_runs[j]
+            design_parameters[i * number_of_runs + j, :] = orbit_parameters
+    return design_parameters
+
+
+def get_two_level_design(orthogonal_array,
+                         design_variable_lower_boundaries,
+                         design_variable_upper_boundaries):
+    # Map -1 to the lower boundary and any other entry to the upper boundary, for the columns of the design variables
+    number_of_design_variables = len(design_variable_lower_boundaries)
+    return np.where(orthogonal_array[:, :number_of_design_variables] == -1,
+                    np.asarray(design_variable_lower_boundaries, dtype=float),
+                    np.asarray(design_variable_upper_boundaries, dtype=float))
+
+
+def get_multi_level_design(yates_array,
+                           design_variable_lower_boundaries,
+                           design_variable_upper_boundaries,
+                           number_of_levels):
+    # Discretize each design variable into equally spaced levels between its boundaries
+    design_variable_levels = np.linspace(design_variable_lower_boundaries,
+                                         design_variable_upper_boundaries,
+                                         number_of_levels,
+                                         endpoint=True)
+
+    # Convert the entries of the Yates array (-1 and 1 for two levels, centered on 0 otherwise) to level indices
+    if number_of_levels == 2:
+        level_indices = (yates_array + 1) // 2
+    else:
+        level_indices = yates_array + (number_of_levels - 1) // 2
+    return np.take_along_axis(design_variable_levels, level_indices, axis=0)
+
+
+def get_space_filling_design(sampler_name,
+                             design_variable_lower_boundaries,
+                             design_variable_upper_boundaries,
+                             number_of_runs,
+                             random_seed):
+    number_of_design_variables = len(design_variable_lower_boundaries)
+
+    # Draw samples in the unit hypercube, varying all design variables jointly
+    if sampler_name == 'sobol':
+        # Sobol sequences are only balanced for powers of two, so the next power of two is drawn and truncated
+        sampler = qmc.Sobol(number_of_design_variables, scramble=True, seed=random_seed)
+        unit_samples = sampler.random_base2(int(np.ceil(np.log2(number_of_runs))))[:number_of_runs]
+    elif sampler_name == 'latin_hypercube':
+        sampler = qmc.LatinHypercube(number_of_design_variables, seed=random_seed)
+        unit_samples = sampler.random(number_of_runs)
+    else:
+        raise ValueError("Unknown sampler '%s', use 'sobol' or 'latin_hypercube'" % sampler_name)
+
+    # Scale the samples to the boundaries of the design variables
+    return qmc.scale(unit_samples, design_variable_lower_boundaries, design_variable_upper_boundaries)
+
+
+def get_objective_statistics(orbit_statistics):
+    # Mean and standard deviation of the mean latitude and mean distance over all runs
+    return np.concatenate((np.mean(orbit_statistics[:, :2], axis=0), np.std(orbit_statistics[:, :2], axis=0)))
+
+
+class DesignSpaceExploration:
+
+    def __init__(self,
+                 orbit_problem,
+                 checkpoint_directory,
+                 checkpoint_interval=100):
+        self.orbit_problem = orbit_problem
+        self.checkpoint_directory = checkpoint_directory
+        self.checkpoint_interval = checkpoint_interval
+
+        # Create the checkpoint directory if it does not exist yet
+        os.makedirs(checkpoint_directory, exist_ok=True)
+
+    def get_checkpoint_file_names(self,
+                                  exploration_name):
+        return (os.path.join(self.checkpoint_directory, exploration_name + '_design.npy'),
+                os.path.join(self.checkpoint_directory, exploration_name + '_statistics.npy'))
+
+    def load_checkpoint(self,
+                        exploration_name,
+                        design_parameters):
+        design_file, statistics_file = self.get_checkpoint_file_names(exploration_name)
+
+        # Resume from the checkpoint only if it was made for the exact same design, and with the same statistics
+        if os.path.isfile(design_file) and os.path.isfile(statistics_file):
+            orbit_statistics = np.load(statistics_file)
+            if np.array_equal(np.load(design_file), design_parameters) \
+                    and orbit_statistics.shape[1] == number_of_orbit_statistics:
+                return orbit_statistics
+
+        # Otherwise, start with no completed rows (marked by NaN statistics)
+        return np.full((len(design_parameters), number_of_orbit_statistics), np.nan)
+
+    def save_checkpoint(self,
+                        exploration_name,
+                        design_parameters,
+                        orbit_statistics):
+        # Write each array to a temporary file first, such that an interruption never leaves a corrupted checkpoint
+        for file_name, array in zip(self.get_checkpoint_file_names(exploration_name),
+                                    (design_parameters, orbit_statistics)):
+            temporary_file_name = file_name[:-len('.npy')] + '.tmp.npy'
+            np.save(temporary_file_name, array)
+            os.replace(temporary_file_name, file_name)
+
+    def evaluate_rows(self,
+                      exploration_name,
+                      design_parameters,
+                      orbit_statistics,
+                      rows):
+        # Only evaluate the rows that were not completed in a previous (interrupted) run
+        remaining_rows = np.asarray(rows)[np.isnan(orbit_statistics[rows, 0])]
+
+        # Evaluate the remaining rows in blocks, saving a checkpoint after each block
+        for block_start in range(0, len(remaining_rows), self.checkpoint_interval):
+            block_rows = remaining_rows[block_start:block_start + self.checkpoint_interval]
+            orbit_statistics[block_rows] = self.orbit_problem.get_batch_orbit_statistics(design_parameters[block_rows])
+            self.save_checkpoint(exploration_name, design_parameters, orbit_statistics)
+            print("%s: %i of %i runs completed"
+                  % (exploration_name, np.count_nonzero(~np.isnan(orbit_statistics[:, 0])), len(design_parameters)))
+
+    def run(self,
+            exploration_name,
+            design_parameters):
+        design_parameters = np.asarray(design_parameters, dtype=float)
+
+        # Load the statistics of the rows completed in a previous (interrupted) run
+        orbit_statistics = self.load_checkpoint(exploration_name, design_parameters)
+        number_of_completed_runs = np.count_nonzero(~np.isnan(orbit_statistics[:, 0]))
+        if number_of_completed_runs > 0:
+            print("%s: resuming with %i of %i runs completed"
+                  % (exploration_name, number_of_completed_runs, len(design_parameters)))
+
+        # Evaluate all rows of the design
+        self.evaluate_rows(exploration_name, design_parameters, orbit_statistics, np.arange(len(design_parameters)))
+
+        # Return one row of orbit statistics per row of the design
+        return orbit_statistics
+
+    def run_until_converged(self,
+                            exploration_name,
+                            design_parameters,
+                            relative_tolerance=1.0E-2,
+                            convergence_interval=None,
+                            minimum_number_of_runs=0,
+                            absolute_tolerance=1.0E-12):
+        design_parameters = np.asarray(design_parameters, dtype=float)
+        if convergence_interval is None:
+            convergence_interval = self.checkpoint_interval
+
+        # Load the statistics of the rows completed in a previous (interrupted) run
+        orbit_statistics = self.load_checkpoint(exploration_name, design_parameters)
+
+        # Evaluate the design in order, one interval at a time, until the objective statistics stop changing
+        previous_objective_statistics = None
+        for interval_start in range(0, len(design_parameters), convergence_interval):
+            number_of_runs = min(interval_start + convergence_interval, len(design_parameters))
+            self.evaluate_rows(exploration_name,
+                               design_parameters,
+                               orbit_statistics,
+                               np.arange(interval_start, number_of_runs))
+
+            # Compare the mean and standard deviation of both objectives with those of the previous interval. Statistics
+            # close to zero (e.g., the standard deviation of an objective that is not changed by the design) are compared
+            # with the absolute tolerance instead
+            objective_statistics = get_objective_statistics(orbit_statistics[:number_of_runs])
+            if previous_objective_statistics is not None and number_of_runs >= minimum_number_of_runs:
+                relative_change = np.abs(objective_statistics - previous_objective_statistics) \
+                                  / np.maximum(np.abs(previous_objective_statistics), absolute_tolerance)
+                if np.all(relative_change <= relative_tolerance):
+                    print("%s: objective statistics converged after %i of %i runs"
+                          % (exploration_name, number_of_runs, len(design_parameters)))
+                    return orbit_statistics[:number_of_runs]
+            previous_objective_statistics = objective_statistics
+
+        print("%s: objective statistics not converged after all %i runs" % (exploration_name, len(design_parameters)))
+        return orbit_statistics
@@ -0,0 +1,79 @@
+"""
+# Asteroid orbit optimization with PyGMO - Multi-fidelity optimization
+Copyright (c) 2010-2022, Delft University of Technology. All rights reserved. This file is part of the Tudat. Redistribution  and use in source and binary forms, with or without modification, are permitted exclusively under the terms of the Modified BSD license. You should have received a copy of the license with this file. If not, please or visit: http://tudat.tudelft.nl/LICENSE.
+
+This module is used by the Optimization part of the Asteroid Orbit Optimization example. It contains the `FidelityController` class, which selects the level of the integrator fidelity ladder (`integrator_fidelity_ladder` in the `aoo_environment.py` module) used by the `AsteroidOrbitProblem` to evaluate each generation.
+
+The optimization starts at the lowest fidelity level, and moves up one level either after a fixed number of generations (schedule), or once the non-dominated individuals of the population have not changed for a number of generations (rank stability). The controller also records the number of function evaluations of the integrator spent in each generation.
+"""
+
+
+# Load standard modules
+import numpy as np
+
+# Load pygmo library
+import pygmo as pg
+
+
+class FidelityController:
+
+    def __init__(self,
+                 number_of_fidelity_levels,
+                 generations_per_level=None,
+                 rank_stability_generations=None):
+        self.number_of_fidelity_levels = number_of_fidelity_levels
+        self.generations_per_level = generations_per_level
+        self.rank_stability_generations = rank_stability_generations
+
+        # Start at the lowest fidelity level
+        self.fidelity_level = 0
+        self.generations_at_level = 0
+        self.stable_generations = 0
+        self.previous_non_dominated_individuals = None
+
+        # Initialize the function evaluations of the current generation, and their history
+        self.function_evaluations = 0
+        self.function_evaluations_history = []
+        self.fidelity_level_history = []
+
+    def is_highest_level(self):
+        return self.fidelity_level == self.number_of_fidelity_levels - 1
+
+    def add_function_evaluations(self,
+                                 number_of_function_evaluations):
+        self.function_evaluations += number_of_function_evaluations
+
+    def end_generation(self,
+                       population_design_variables,
+                       population_fitness):
+        # Store the function evaluations of the generation that just ended
+        self.function_evaluations_history.append(self.function_evaluations)
+        self.fidelity_level_history.append(self.fidelity_level)
+        self.function_evaluations = 0
+        self.generations_at_level += 1
+        if self.is_highest_level():
+            return False
+
+        # Schedule: move up after a fixed number of generations at the current level
+        switch_level = self.generations_per_level is not None \
+                       and self.generations_at_level >= self.generations_per_level
+
+        # Rank stability: move up once the non-dominated individuals stop changing
+        if self.rank_stability_generations is not None:
+            non_dominated_front = pg.fast_non_dominated_sorting(population_fitness)[0][0]
+            non_dominated_design_variables = np.asarray(population_design_variables)[non_dominated_front]
+            non_dominated_individuals = {tuple(design_variables) for design_variables in non_dominated_design_variables}
+            if non_dominated_individuals == self.previous_non_dominated_individuals:
+                self.stable_generations += 1
+            else:
+                self.stable_generations = 0
+            self.previous_non_dominated_individuals = non_dominated_individuals
+            switch_level = switch_level or self.stable_generations >= self.rank_stability_generations
+
+        # Move up one level, and restart counting the generations at this level
+        if switch_level:
+            self.fidelity_level += 1
+            self.generations_at_level = 0
+            self.stable_generations = 0
+            self.previous_non_dominated_individuals = None
+        return switch_level
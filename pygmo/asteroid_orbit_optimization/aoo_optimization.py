@@ -30,11 +30,15 @@ PyGMO is the Python counterpart of [PAGMO](https://esa.github.io/pagmo2/index.ht
 
 """
 ## Import statements
+The custom Itokawa environment, the propagation settings, and the `AsteroidOrbitProblem` class are shared by all parts of this example, and are imported from the `aoo_environment.py` module located next to this file. Their explanation can be found in the [Custom environment](https://tudat-space.readthedocs.io/en/latest/_src_getting_started/_src_examples/notebooks/pygmo/asteroid_orbit_optimization/aoo_custom_environment.html) part of the example.
 """
 
 
 # Load standard modules
 import os
+import sys
+import time
+import multiprocessing as mp
 import numpy as np
 # Uncomment the following to make plots interactive
 # %matplotlib widget
@@ -45,364 +49,33 @@ from itertools import combinations as comb
 # Load tudatpy modules
 from tudatpy.data import save2txt
 from tudatpy import constants
-from tudatpy.interface import spice
-from tudatpy.astro import element_conversion
-from tudatpy.astro import frame_conversion
-from tudatpy import numerical_simulation
-from tudatpy.numerical_simulation import environment_setup
-from tudatpy.numerical_simulation import propagation_setup
-import tudatpy.util as util
 
 # Load pygmo library
 import pygmo as pg
 
 current_dir = os.path.abspath('')
 
+# Load the optimization utilities shared by the examples, located at the root of this repository
+sys.path.append(os.path.join(current_dir, '..', '..'))
+from optimization_utilities import GenerationHistory, load_generation_history, get_generation, \
+    get_non_dominated_mask, ParetoArchive
 
-"""
-## Creation of Custom Environment
-"""
-
-"""
-### Itokawa rotation settings
-"""
-
-
-def get_itokawa_rotation_settings(itokawa_body_frame_name):
-    # Definition of initial Itokawa orientation conditions through the pole orientation
-    pole_declination = np.deg2rad(-66.30)     # Declination
-    pole_right_ascension = np.deg2rad(90.53)  # Right ascension
-    meridian_at_epoch = 0.0                   # Meridian
-
-    # Define initial Itokawa orientation in inertial frame (equatorial plane)
-    initial_orientation_j2000 = frame_conversion.inertial_to_body_fixed_rotation_matrix(
-        pole_declination, pole_right_ascension, meridian_at_epoch)
-    
-    # Get initial Itokawa orientation in inertial frame but in the Ecliptic plane
-    initial_orientation_eclipj2000 = np.matmul(spice.compute_rotation_matrix_between_frames(
-        "J2000", "ECLIPJ2000", 0.0), initial_orientation_j2000)
-
-    # Manually check the results, if desired
-    check_results = False
-    if check_results:
-        np.set_printoptions(precision=100)
-        print(initial_orientation_j2000)
-    
-        print(initial_orientation_eclipj2000)
-
-    # Compute rotation rate
-    rotation_rate = np.deg2rad(712.143) / constants.JULIAN_DAY
-
-    # Set up rotational model for Itokawa with constant angular velocity
-    return environment_setup.rotation_model.simple(
-        "ECLIPJ2000", itokawa_body_frame_name, initial_orientation_eclipj2000, 0.0, rotation_rate)
-
-
-"""
-### Itokawa ephemeris settings
-"""
-
-
-def get_itokawa_ephemeris_settings(sun_gravitational_parameter):
-    # Define Itokawa initial Kepler elements
-    itokawa_kepler_elements = np.array([
-        1.324118017407799 * constants.ASTRONOMICAL_UNIT,
-        0.2801166461882852,
-        np.deg2rad(1.621303507642802),
-        np.deg2rad(162.8147699851312),
-        np.deg2rad(69.0803904880264),
-        np.deg2rad(187.6327516838828)])
-    
-    # Convert mean anomaly to true anomaly
-    itokawa_kepler_elements[5] = element_conversion.mean_to_true_anomaly(
-        eccentricity=itokawa_kepler_elements[1],
-        mean_anomaly=itokawa_kepler_elements[5])
-    
-    # Get epoch of initial Kepler elements (in Julian Days)
-    kepler_elements_reference_julian_day = 2459000.5
-    
-    # Sets new reference epoch for Itokawa ephemerides (different from J2000)
-    kepler_elements_reference_epoch = (kepler_elements_reference_julian_day - constants.JULIAN_DAY_ON_J2000) \
-                                      * constants.JULIAN_DAY
-    
-    # Sets the ephemeris model
-    return environment_setup.ephemeris.keplerian(
-        itokawa_kepler_elements,
-        kepler_elements_reference_epoch,
-        sun_gravitational_parameter,
-        "Sun",
-        "ECLIPJ2000")
-
-
-"""
-### Itokawa gravity field settings
-"""
-
-
-def get_itokawa_gravity_field_settings(itokawa_body_fixed_frame, itokawa_radius):
-    itokawa_gravitational_parameter = 2.36
-    normalized_cosine_coefficients = np.array([
-        [1.0, 0.0, 0.0, 0.0, 0.0],
-        [0.0, 0.0, 0.0, 0.0, 0.0],
-        [-0.145216, 0.0, 0.219420, 0.0, 0.0],
-        [0.036115, -0.028139, -0.046894, 0.069022, 0.0],
-        [0.087852, 0.034069, -0.123263, -0.030673, 0.150282]])
-    normalized_sine_coefficients = np.array([
-        [0.0, 0.0, 0.0, 0.0, 0.0],
-        [0.0, 0.0, 0.0, 0.0, 0.0],
-        [0.0, 0.0, 0.0, 0.0, 0.0],
-        [0.0, -0.006137, -0.046894, 0.033976, 0.0],
-        [0.0, 0.004870, 0.000098, -0.015026, 0.011627]])
-    return environment_setup.gravity_field.spherical_harmonic(
-        gravitational_parameter=itokawa_gravitational_parameter,
-        reference_radius=itokawa_radius,
-        normalized_cosine_coefficients=normalized_cosine_coefficients,
-        normalized_sine_coefficients=normalized_sine_coefficients,
-        associated_reference_frame=itokawa_body_fixed_frame)
-
-
-"""
-### Itokawa shape settings
-"""
-
-
-def get_itokawa_shape_settings(itokawa_radius):
-    # Creates spherical shape settings
-    return environment_setup.shape.spherical(itokawa_radius)
-
-
-"""
-### Simulation bodies
-"""
-
-
-def create_simulation_bodies(itokawa_radius):
-    ### CELESTIAL BODIES ###
-    # Define Itokawa body frame name
-    itokawa_body_frame_name = "Itokawa_Frame"
-
-    # Create default body settings for selected celestial bodies
-    bodies_to_create = ["Sun", "Earth", "Jupiter", "Saturn", "Mars"]
-
-    # Create default body settings for bodies_to_create, with "Earth"/"J2000" as
-    # global frame origin and orientation. This environment will only be valid
-    # in the indicated time range [simulation_start_epoch --- simulation_end_epoch]
-    body_settings = environment_setup.get_default_body_settings(
-        bodies_to_create,
-        "SSB",
-        "ECLIPJ2000")
-
-    # Add Itokawa body
-    body_settings.add_empty_settings("Itokawa")
-
-    # Adds Itokawa settings
-    # Gravity field
-    body_settings.get("Itokawa").gravity_field_settings = get_itokawa_gravity_field_settings(itokawa_body_frame_name,
-                                                                        itokawa_radius)
-    # Rotational model
-    body_settings.get("Itokawa").rotation_model_settings = get_itokawa_rotation_settings(itokawa_body_frame_name)
-    # Ephemeris
-    body_settings.get("Itokawa").ephemeris_settings = get_itokawa_ephemeris_settings(
-        spice.get_body_gravitational_parameter( 'Sun') )
-    # Shape (spherical)
-    body_settings.get("Itokawa").shape_settings = get_itokawa_shape_settings(itokawa_radius)
-    # Create system of selected bodies
-    bodies = environment_setup.create_system_of_bodies(body_settings)
-
-    ### VEHICLE BODY ###
-    # Create vehicle object
-    body_settings.add_empty_settings("Spacecraft")
-    body_settings.get("Spacecraft").constant_mass = 400.0
-
-    # Create radiation pressure settings
-    reference_area_radiation = (4*0.3*0.1+2*0.1*0.1)/4  # Average projection area of a 3U CubeSat
-    radiation_pressure_coefficient = 1.2
-    occulting_bodies_dict = dict()
-    occulting_bodies_dict["Sun"] = ["Itokawa"]
-    vehicle_target_settings = environment_setup.radiation_pressure.cannonball_radiation_target(
-        reference_area_radiation, radiation_pressure_coefficient, occulting_bodies_dict )
-
-    # Add the radiation pressure interface to the body settings
-    body_settings.get("Spacecraft").radiation_pressure_target_settings = vehicle_target_settings
-
-    # Create system of selected bodies
-    bodies = environment_setup.create_system_of_bodies(body_settings)
-
-    return bodies
-
-
-"""
-### Acceleration models
-"""
-
-
-def get_acceleration_models(bodies_to_propagate, central_bodies, bodies):
-    # Define accelerations acting on Spacecraft
-    accelerations_settings_spacecraft = dict(
-        Sun =     [ propagation_setup.acceleration.radiation_pressure(),
-                    propagation_setup.acceleration.point_mass_gravity() ],
-        Itokawa = [ propagation_setup.acceleration.spherical_harmonic_gravity(3, 3) ],
-        Jupiter = [ propagation_setup.acceleration.point_mass_gravity() ],
-        Saturn =  [ propagation_setup.acceleration.point_mass_gravity() ],
-        Mars =    [ propagation_setup.acceleration.point_mass_gravity() ],
-        Earth =   [ propagation_setup.acceleration.point_mass_gravity() ]
-    )
-
-    # Create global accelerations settings dictionary
-    acceleration_settings = {"Spacecraft": accelerations_settings_spacecraft}
-
-    # Create acceleration models
-    return propagation_setup.create_acceleration_models(
-        bodies,
-        acceleration_settings,
-        bodies_to_propagate,
-        central_bodies)
-
-
-"""
-### Termination settings
-"""
-
-
-def get_termination_settings(mission_initial_time, 
-                             mission_duration,
-                             minimum_distance_from_com,
-                             maximum_distance_from_com):
-    # Mission duration
-    time_termination_settings = propagation_setup.propagator.time_termination(
-        mission_initial_time + mission_duration,
-        terminate_exactly_on_final_condition=False
-    )
-    # Upper altitude
-    upper_altitude_termination_settings = propagation_setup.propagator.dependent_variable_termination(
-        dependent_variable_settings=propagation_setup.dependent_variable.relative_distance('Spacecraft', 'Itokawa'),
-        limit_value=maximum_distance_from_com,
-        use_as_lower_limit=False,
-        terminate_exactly_on_final_condition=False
-    )
-    # Lower altitude
-    lower_altitude_termination_settings = propagation_setup.propagator.dependent_variable_termination(
-        dependent_variable_settings=propagation_setup.dependent_variable.altitude('Spacecraft', 'Itokawa'),
-        limit_value=minimum_distance_from_com,
-        use_as_lower_limit=True,
-        terminate_exactly_on_final_condition=False
-    )
-
-    # Define list of termination settings
-    termination_settings_list = [time_termination_settings,
-                                 upper_altitude_termination_settings,
-                                 lower_altitude_termination_settings]
+# Load the shared environment and optimisation problem of this example
+from aoo_environment import get_simulation_environment, integrator_fidelity_ladder, \
+    TrajectoryArchive, FitnessCache, AsteroidOrbitProblem, initialize_fitness_worker
+from aoo_surrogate import SurrogateModel
+from aoo_fidelity import FidelityController
+from aoo_archipelago import create_archipelago, get_archipelago_individuals
 
-    return propagation_setup.propagator.hybrid_termination(termination_settings_list,
-                                                           fulfill_single_condition=True)
 
-
-"""
-### Dependent variables to save
 """
+## Parallel fitness evaluation
+Propagating an orbit around Itokawa takes much longer than anything else done by the optimiser. The individuals of a generation are independent from each other, so PyGMO can evaluate them in a single batch through the `AsteroidOrbitProblem.batch_fitness()` function, which distributes them over a pool of worker processes.
 
-
-def get_dependent_variables_to_save():
-    dependent_variables_to_save = [
-        propagation_setup.dependent_variable.central_body_fixed_spherical_position(
-            "Spacecraft", "Itokawa"
-        )
-    ]
-    return dependent_variables_to_save
-
-
-"""
-## Optimisation problem formulation 
+Each worker creates its own system of bodies and propagator settings once, when the pool is started, through the `initialize_fitness_worker()` function of the `aoo_environment` module. Afterwards, only the decision vectors and the fitness values are sent between the processes, instead of the complete simulation environment for every individual.
 """
 
 
-class AsteroidOrbitProblem:
-    
-    def __init__(self,
-                 bodies,
-                 propagator_settings,
-                 mission_initial_time,
-                 mission_duration,
-                 design_variable_lower_boundaries,
-                 design_variable_upper_boundaries):
-        
-        # Sets input arguments as lambda function attributes
-        # NOTE: this is done so that the class is "pickable", i.e., can be serialized by pygmo
-        self.bodies_function = lambda: bodies
-        self.propagator_settings_function = lambda: propagator_settings
-        
-        # Initialize empty dynamics simulator
-        self.dynamics_simulator_function = lambda: None
-        
-        # Set other input arguments as regular attributes
-        self.mission_initial_time = mission_initial_time
-        self.mission_duration = mission_duration
-        self.mission_final_time = mission_initial_time + mission_duration
-        self.design_variable_lower_boundaries = design_variable_lower_boundaries
-        self.design_variable_upper_boundaries = design_variable_upper_boundaries
-
-    def get_bounds(self):
-        return (list(self.design_variable_lower_boundaries), list(self.design_variable_upper_boundaries))
-
-    def get_nobj(self):
-        return 2
-
-    def fitness(self,
-                orbit_parameters):
-        # Retrieves system of bodies
-        current_bodies = self.bodies_function()
-        
-        # Retrieves Itokawa gravitational parameter
-        itokawa_gravitational_parameter = current_bodies.get("Itokawa").gravitational_parameter
-        
-        # Reset the initial state from the design variable vector
-        new_initial_state = element_conversion.keplerian_to_cartesian_elementwise(
-            gravitational_parameter=itokawa_gravitational_parameter,
-            semi_major_axis=orbit_parameters[0],
-            eccentricity=orbit_parameters[1],
-            inclination=np.deg2rad(orbit_parameters[2]),
-            argument_of_periapsis=np.deg2rad(235.7),
-            longitude_of_ascending_node=np.deg2rad(orbit_parameters[3]),
-            true_anomaly=np.deg2rad(139.87))
-        
-        # Retrieves propagator settings object
-        propagator_settings = self.propagator_settings_function()
-        
-        # Reset the initial state
-        propagator_settings.initial_states = new_initial_state
-
-        # Propagate orbit
-        dynamics_simulator = numerical_simulation.create_dynamics_simulator(current_bodies,
-                                                                        propagator_settings)
-        
-        # Update dynamics simulator function
-        self.dynamics_simulator_function = lambda: dynamics_simulator
-
-        # Retrieve dependent variable history
-        dependent_variables = dynamics_simulator.propagation_results.dependent_variable_history
-        dependent_variables_list = np.vstack(list(dependent_variables.values()))
-        
-        # Retrieve distance
-        distance = dependent_variables_list[:, 0]
-        # Retrieve latitude
-        latitudes = dependent_variables_list[:, 1]
-        
-        # Compute mean latitude
-        mean_latitude = np.mean(np.absolute(latitudes))
-        # Computes fitness as mean latitude
-        current_fitness = 1.0 / mean_latitude
-
-        # Exaggerate fitness value if the spacecraft has broken out of the selected distance range
-        current_penalty = 0.0
-        if (max(dynamics_simulator.propagation_results.dependent_variable_history.keys()) < self.mission_final_time):
-            current_penalty = 1.0E2
-
-        return [current_fitness + current_penalty, np.mean(distance) + current_penalty * 1.0E3]
-
-    def get_last_run_dynamics_simulator(self):
-        return self.dynamics_simulator_function()
-
-
 """
 ### Setup orbital simulation
 
@@ -413,9 +86,6 @@ class AsteroidOrbitProblem:
 """
 
 
-# Load spice kernels
-spice.load_standard_kernels()
-
 # Set simulation start and end epochs
 mission_initial_time = 0.0
 mission_duration = 5.0 * constants.JULIAN_DAY
@@ -431,59 +101,27 @@ maximum_distance_from_com = 5.0E3 + itokawa_radius
 design_variable_lb = (300, 0.0, 0.0, 0.0)
 design_variable_ub = (2000, 0.3, 180, 360)
 
-# Create simulation bodies
-bodies = create_simulation_bodies(itokawa_radius)
-
-# Define bodies to propagate and central bodies
-bodies_to_propagate = ["Spacecraft"]
-central_bodies = ["Itokawa"]
-
-# Create acceleration models
-acceleration_models = get_acceleration_models(bodies_to_propagate, central_bodies, bodies)
-
-
-"""
-#### Dependent variables, termination settings, and orbit parameters
-"""
-
-
-# Define list of dependent variables to save
-dependent_variables_to_save = get_dependent_variables_to_save()
-
-# Create propagation settings
-termination_settings = get_termination_settings(
-    mission_initial_time, mission_duration, minimum_distance_from_com, maximum_distance_from_com)
+# Stop orbits that can no longer reach this mean absolute latitude (e.g. np.deg2rad(10.0)); None propagates all orbits
+minimum_mean_latitude = None
 
 orbit_parameters = [1.20940330e+03, 2.61526215e-01, 7.53126558e+01, 2.60280587e+02]
 
 
 """
-#### Integrator and Propagator settings
-"""
+#### Simulation environment
+The system of bodies and the propagator settings are created once, when they are first requested, after which they are reused by every call with the same simulation settings.
 
+Orbits that leave the allowed distance range are penalized, and their propagation is stopped as soon as this happens by the termination settings. Optionally, orbits are also stopped, and penalized, as soon as they can no longer reach `minimum_mean_latitude`. To this end, a `MeanLatitudeMonitor` is added to the termination settings as a custom termination condition. During the propagation, it integrates the absolute latitude of the spacecraft over time, and stops the propagation once the mean latitude would stay below the threshold even if the spacecraft would fly over a pole for the rest of the mission. Such orbits could never be better than the threshold, so there is no need to propagate them over the full 5 days. In that case, the mean latitude of the fitness is the same time-weighted mean, over the (variable) steps of the integrator, such that no orbit that could reach the threshold is stopped. Without a threshold, the fitness keeps using the mean of the saved latitudes.
+"""
 
-# Create numerical integrator settings
-integrator_settings = propagation_setup.integrator.runge_kutta_variable_step_size(
-    initial_time_step=1.0,
-    coefficient_set=propagation_setup.integrator.CoefficientSets.rkf_78,
-    minimum_step_size=1.0E-6,
-    maximum_step_size=constants.JULIAN_DAY,
-    relative_error_tolerance=1.0E-8,
-    absolute_error_tolerance=1.0E-8)
 
-# Get current propagator, and define translational state propagation settings
-propagator = propagation_setup.propagator.cowell
-# Define propagation settings
-initial_state = np.zeros(6)
-propagator_settings = propagation_setup.propagator.translational(central_bodies,
-                                                                         acceleration_models,
-                                                                         bodies_to_propagate,
-                                                                         initial_state,
-                                                                         mission_initial_time,
-                                                                         integrator_settings,
-                                                                         termination_settings,
-                                                                         propagator,
-                                                                         dependent_variables_to_save)
+# Create (or retrieve) simulation bodies and propagator settings
+bodies, propagator_settings = get_simulation_environment(itokawa_radius,
+                                                         mission_initial_time,
+                                                         mission_duration,
+                                                         minimum_distance_from_com,
+                                                         maximum_distance_from_com,
+                                                         minimum_mean_latitude)
 
 
 """
@@ -498,69 +136,251 @@ With the optimization problem and the simulation setup in hand, let's now run ou
 ### Algorithm and problem definition
 First, we define a fixed seed that PyGMO will use to generate random numbers. This ensures that the results can be reproduced. 
 
-Then, the optimization problem is defined using the `AsteroidOrbitProblem` class initiated with the values that have already been defined. This User Defined Problem (UDP) is then given to PyGMO trough the `pg.problem()` method.
+Next, a pool of worker processes is started to evaluate the fitness of the individuals in parallel, as explained above. By default, one worker is started per CPU on operating systems that fork new processes (such as Linux). On Windows and macOS, where a Python script would be run again by each new process, the fitness is evaluated serially by default. The worker processes import the simulation environment from the `aoo_environment` module, so that the pool can also be used in notebooks on these operating systems, by setting `number_of_workers` explicitly. To run the example serially, set `number_of_workers` to 1.
+
+Optionally, a surrogate model of the fitness can be used, by setting `use_surrogate_model` to True. This `SurrogateModel`, defined in the `aoo_surrogate.py` module, interpolates the fitness of all propagated orbits with radial basis functions. Once it is trained on the first 50 orbits, only a quarter of the offspring of each generation is propagated: the individuals predicted not to be dominated by any propagated orbit, followed by the individuals farthest from all propagated orbits. The other offspring get their predicted fitness. The model is retrained every 5 generations.
+
+Then, the optimization problem is defined using the `AsteroidOrbitProblem` class initiated with the values that have already been defined, with the worker pool, the trajectory archive, the fitness cache, and the surrogate model. This User Defined Problem (UDP) is then given to PyGMO trough the `pg.problem()` method.
 
-Finally, the optimizer is selected to be the Multi-objective EA with Decomposition (MOAD) algorithm that is implemented in PyGMO. See [here](https://esa.github.io/pygmo2/algorithms.html#pygmo.moead) for its documentation.
+A multi-fidelity optimization can also be selected, by setting `use_multi_fidelity` to True. The early generations are then evaluated with the cheaper integrators of the `integrator_fidelity_ladder` defined in `aoo_environment.py`: a RKF4(5) integrator with tolerances of 1E-6, followed by a RKF7(8) integrator with tolerances of 1E-7, before the nominal RKF7(8) integrator with tolerances of 1E-8. The `FidelityController` moves up one level after 8 generations, or earlier once the non-dominated individuals have not changed for 3 generations. The final population is always re-evaluated with the nominal integrator.
+
+Instead of a single population, several populations can be evolved at the same time on the islands of a PyGMO archipelago, by setting `use_archipelago` to True. This is explained in the section on the initial population below.
+
+Finally, the optimizer is selected to be the Multi-objective EA with Decomposition (MOAD) algorithm that is implemented in PyGMO. See [here](https://esa.github.io/pygmo2/algorithms.html#pygmo.moead) for its documentation. The algorithm is told to evaluate the offspring of each generation in a single batch, through the member `batch_fitness()` function of the UDP.
 """
 
 
 # Fix seed for reproducibility
 fixed_seed = 112987
 
+# Create the archive in which the state and dependent variable histories of the evaluated orbits are saved
+# Every 10th epoch is stored, and the least recently used orbits are removed once the archive exceeds 512 MB
+trajectory_archive = TrajectoryArchive(os.path.join(current_dir, 'trajectory_archive'),
+                                       decimation=10,
+                                       maximum_size=512 * 1024 ** 2)
+
+# Create the cache of already evaluated orbits, shared with the design space exploration through its database file
+# Design variables are quantized to 1 mm, 1E-6 in eccentricity, and 1E-4 deg in inclination and node longitude
+fitness_cache = FitnessCache(key_resolution=(1.0E-3, 1.0E-6, 1.0E-4, 1.0E-4),
+                             memory_size=10000,
+                             database_file=os.path.join(current_dir, 'fitness_cache.sqlite'))
+
+# Create the fidelity controller and the propagator settings of the lower fidelity levels, if requested
+use_multi_fidelity = False
+if use_multi_fidelity:
+    fidelity_controller = FidelityController(len(integrator_fidelity_ladder),
+                                             generations_per_level=8,
+                                             rank_stability_generations=3)
+    fidelity_propagator_settings = [get_simulation_environment(itokawa_radius,
+                                                               mission_initial_time,
+                                                               mission_duration,
+                                                               minimum_distance_from_com,
+                                                               maximum_distance_from_com,
+                                                               minimum_mean_latitude,
+                                                               fidelity_level)[1]
+                                    for fidelity_level in range(len(integrator_fidelity_ladder) - 1)]
+else:
+    fidelity_controller = None
+    fidelity_propagator_settings = None
+
+# Start the pool of fitness workers, each creating its own simulation environment once. Only if new processes are forked,
+# because a Python script would otherwise be run again by each worker (and start its own pool)
+number_of_workers = os.cpu_count() if mp.get_start_method() == 'fork' else 1
+if number_of_workers > 1:
+    fitness_worker_pool = mp.Pool(number_of_workers,
+                                  initializer=initialize_fitness_worker,
+                                  initargs=(itokawa_radius,
+                                            mission_initial_time,
+                                            mission_duration,
+                                            minimum_distance_from_com,
+                                            maximum_distance_from_com,
+                                            design_variable_lb,
+                                            design_variable_ub,
+                                            trajectory_archive,
+                                            minimum_mean_latitude,
+                                            use_multi_fidelity))
+else:
+    fitness_worker_pool = None
+
+# Create the surrogate model, if requested, propagating only a quarter of the offspring once it is trained
+use_surrogate_model = False
+if use_surrogate_model:
+    surrogate_model = SurrogateModel(design_variable_lb,
+                                     design_variable_ub,
+                                     true_evaluation_fraction=0.25,
+                                     retraining_interval=5,
+                                     minimum_training_size=50)
+else:
+    surrogate_model = None
+
+# Evolve several populations on the islands of an archipelago, if requested, either in threads ('thread') sharing the
+# pool of fitness workers, or in separate processes ('mp') that each evaluate their orbits serially
+use_archipelago = False
+number_of_islands = 4
+island_type = 'thread'
+
 # Instantiate orbit problem
 orbitProblem = AsteroidOrbitProblem(bodies,
                                     propagator_settings,
                                     mission_initial_time,
                                     mission_duration,
                                     design_variable_lb,
-                                    design_variable_ub)
+                                    design_variable_ub,
+                                    fitness_worker_pool,
+                                    number_of_workers,
+                                    trajectory_archive,
+                                    fitness_cache,
+                                    surrogate_model,
+                                    minimum_mean_latitude,
+                                    fidelity_propagator_settings,
+                                    fidelity_controller,
+                                    simulation_settings=(itokawa_radius,
+                                                         mission_initial_time,
+                                                         mission_duration,
+                                                         minimum_distance_from_com,
+                                                         maximum_distance_from_com,
+                                                         minimum_mean_latitude))
 
 # Create pygmo problem using the UDP instantiated above
 prob = pg.problem(orbitProblem)
 
-# Select Moead algorithm from pygmo, with one generation
-algo = pg.algorithm(pg.nsga2(gen=1, seed=fixed_seed))
+# Select Moead algorithm from pygmo, with one generation, using the batch fitness evaluation of the UDP
+nsga2 = pg.nsga2(gen=1, seed=fixed_seed)
+nsga2.set_bfe(pg.bfe(pg.member_bfe()))
+algo = pg.algorithm(nsga2)
 
 
 """
 ### Initial population
-An initial population is now going to be generated by PyGMO, of a size of 48 individuals. This means that 48 orbital simulations will be run, and the fitness corresponding to the 48 individuals will be computed using the UDP.
+An initial population is now going to be generated by PyGMO, of a size of 48 individuals. This means that 48 orbital simulations will be run, and the fitness corresponding to the 48 individuals will be computed in a single batch using the UDP.
+
+When `use_archipelago` is True, an archipelago of `number_of_islands` islands is created instead, by the `create_archipelago()` function of the `aoo_archipelago.py` module. Each island evolves its own population of 48 individuals with its own NSGA-II algorithm, with seeds derived from the fixed seed (the seed plus the index of the island), such that the initial populations are reproducible. The islands are connected in a ring: after each generation, the 2 best individuals of each island are sent to the next island, where they replace its worst individuals if they are better.
+
+With the 'thread' island type, all islands run in the main process, and share the pool of fitness workers. With the 'mp' island type, each island runs in its own process, where the `AsteroidOrbitProblem` recreates its simulation environment from its `simulation_settings`. Migration depends on the order in which the islands complete their generations, so the results of an archipelago can differ slightly between runs. The surrogate model and the multi-fidelity optimization only apply to a single population.
 """
 
 
-# Initialize pygmo population with 48 individuals
+# Initialize pygmo population with 48 individuals, or an archipelago with 48 individuals per island
 population_size = 48
-pop = pg.population(prob, size=population_size, seed=fixed_seed)
+if use_archipelago:
+    if surrogate_model is not None or fidelity_controller is not None:
+        raise ValueError("The archipelago can not be combined with the surrogate model or multi-fidelity optimization")
+    archipelago = create_archipelago(orbitProblem,
+                                     number_of_islands,
+                                     population_size,
+                                     fixed_seed,
+                                     island_type,
+                                     topology=pg.ring(),
+                                     number_of_migrants=2)
+    pop = archipelago[0].get_population()
+else:
+    pop = pg.population(prob, size=population_size, seed=fixed_seed, b=pg.bfe(pg.member_bfe()))
 
 
 """
 ### Evolve population
 We now want to make this population evolve, as to (hopefully) get closer to optimum solutions.
 
-In a loop, we thus call `algo.evolve(pop)` 25 times to make the population evolve 25 times. During each generation, we also save the list of fitness and of design variables.
+In a loop, we thus call `algo.evolve(pop)` 25 times to make the population evolve 25 times. During each generation, we also save the fitness and the design variables of all individuals, with the `GenerationHistory` class of the `optimization_utilities` package located at the root of this repository. It writes them to disk in chunks, in the `generation_history` directory, such that they can also be analysed while the optimization is still running. When the surrogate model is used, some of the fitness values are predictions; those of the final population are replaced by the fitness of the propagated orbits before they are saved. Similarly, in a multi-fidelity optimization, the population is re-evaluated every time the fidelity level increases, and the final population is re-evaluated with the nominal integrator. The number of function evaluations of the integrator, taken from the `cumulative_number_of_function_evaluations_history` of the propagation results, is then reported for every generation, and compared to the nominal integrator.
+
+After each generation, the non-dominated individuals of the population are added to a `ParetoArchive`, from the `optimization_utilities` package, which keeps all non-dominated orbits found so far. It also records the hypervolume of the archive: the area of the objective space that is dominated by the archive, up to a reference point corresponding to a mean latitude of 5 deg and the maximum allowed distance. When `hypervolume_tolerance` is set, the evolution is stopped as soon as the hypervolume has increased by less than this fraction over the last `hypervolume_generations` generations. When the surrogate model or the multi-fidelity optimization is used, the archive contains the predicted or lower fidelity fitness values of the individuals.
+
+In an archipelago, all islands are evolved by one generation at a time, and the non-dominated individuals of all islands are merged into the `ParetoArchive` after each generation. The saved fitness and design variables are those of the first island, such that the analysis below is the same as for a single population.
 """
 
 
 # Set the number of evolutions
 number_of_evolutions = 25
 
-# Initialize containers
-fitness_list = []
-population_list = []
+# Record the fitness values and design variables of all individuals of each generation on disk
+generation_history = GenerationHistory(os.path.join(current_dir, 'generation_history'),
+                                       len(design_variable_lb),
+                                       orbitProblem.get_nobj())
+
+# Keep the non-dominated orbits found so far, and the hypervolume they dominate up to a mean latitude of 5 deg and the
+# maximum distance
+pareto_archive = ParetoArchive(reference_point=(1.0 / np.deg2rad(5.0), maximum_distance_from_com))
+
+# Stop once the hypervolume increased by less than this fraction over the last generations (e.g. 1.0E-3); None evolves
+# all generations
+hypervolume_tolerance = None
+hypervolume_generations = 5
 
 # Evolve the population recursively
 for gen in range(number_of_evolutions):
     print("Evolving population; at generation %i/%i" % (gen, number_of_evolutions-1))
     
-    # Evolve the population
-    pop = algo.evolve(pop)
+    # Evolve the population, or all islands of the archipelago, after which migration takes place between the islands
+    evolution_start_time = time.perf_counter()
+    if use_archipelago:
+        archipelago.evolve()
+        archipelago.wait_check()
+        pop = archipelago[0].get_population()
+    else:
+        pop = algo.evolve(pop)
+
+    # Add the population, or the populations of all islands, to the Pareto archive, and check its hypervolume
+    if use_archipelago:
+        pareto_archive.update(*get_archipelago_individuals(archipelago))
+    else:
+        pareto_archive.update(pop.get_x(), pop.get_f())
+    hypervolume_converged = hypervolume_tolerance is not None \
+                            and pareto_archive.has_converged(hypervolume_tolerance, hypervolume_generations)
     
-    # Store the fitness values and design variables for all individuals
-    fitness_list.append(pop.get_f())
-    population_list.append(pop.get_x())
+    # Replace the predicted (or lower fidelity) fitness of the final population by the fitness of the orbits propagated
+    # with the nominal integrator
+    if (gen == number_of_evolutions - 1 or hypervolume_converged) \
+            and (surrogate_model is not None or fidelity_controller is not None):
+        final_orbit_statistics = orbitProblem.get_batch_orbit_statistics(pop.get_x())
+        for individual, (design_variables, orbit_statistics) in enumerate(zip(pop.get_x(), final_orbit_statistics)):
+            pop.set_xf(individual, design_variables, orbitProblem.get_fitness_from_statistics(orbit_statistics))
+
+    # Store the fitness values and design variables for all individuals, with the average wall-clock time per individual
+    generation_history.record_population(gen, pop, (time.perf_counter() - evolution_start_time) / population_size)
+
+    # Move up the fidelity ladder if requested, and re-evaluate the population with the new integrator, such that the
+    # parents and offspring of the next generation are compared consistently
+    if fidelity_controller is not None and fidelity_controller.end_generation(pop.get_x(), pop.get_f()):
+        print("Switching to integrator fidelity level %i" % fidelity_controller.fidelity_level)
+        population_fitness = np.reshape(orbitProblem.batch_fitness(np.ravel(pop.get_x())), (population_size, -1))
+        for individual, (design_variables, fitness) in enumerate(zip(pop.get_x(), population_fitness)):
+            pop.set_xf(individual, design_variables, fitness)
+
+    # Stop the evolution once the hypervolume has converged
+    if hypervolume_converged:
+        print("Hypervolume converged after generation %i" % gen)
+        number_of_evolutions = gen + 1
+        break
 
     
 print("Evolving population is finished!")
+generation_history.close()
+fitness_cache.print_statistics()
+if surrogate_model is not None:
+    surrogate_model.print_statistics()
+print("Pareto archive: %i non-dominated orbits, hypervolume %.4g"
+      % (len(pareto_archive), pareto_archive.hypervolume_history[-1]))
+
+# Report the function evaluations spent per generation, compared to an estimate for the nominal integrator, based on
+# the average function evaluations of the final population and one batch of offspring per generation
+if fidelity_controller is not None:
+    nominal_function_evaluations = population_size * np.mean([orbit_statistics[5]
+                                                              for orbit_statistics in final_orbit_statistics])
+    function_evaluations_history = fidelity_controller.function_evaluations_history
+    for gen in range(number_of_evolutions):
+        print("Generation %i: fidelity level %i, %i function evaluations (%.0f%% of nominal)"
+              % (gen, fidelity_controller.fidelity_level_history[gen], function_evaluations_history[gen],
+                 100.0 * function_evaluations_history[gen] / nominal_function_evaluations))
+    print("Total: %i function evaluations (%.0f%% of nominal)"
+          % (sum(function_evaluations_history),
+             100.0 * sum(function_evaluations_history) / (number_of_evolutions * nominal_function_evaluations)))
+
+# Stop the fitness workers
+if fitness_worker_pool is not None:
+    fitness_worker_pool.close()
+    fitness_worker_pool.join()
+if use_archipelago and island_type == 'mp':
+    pg.mp_island.shutdown_pool()
 
 
 """
@@ -568,7 +388,7 @@ print("Evolving population is finished!")
 With the population evolved, the optimization is finished. We can now analyse the results to see how our optimization was carried, and what our optimum solutions are.
 
 #### Extract results
-First of, we want to save the state and dependent variable history of the orbital simulations that were carried in the first and last generations. To do so, we extract the design variables of all the member of a given population, and we run the orbital simulation again, calling the `orbitProblem.fitness()` function. Then, we can extract the state and dependent variable history by calling the `orbitProblem.get_last_run_dynamics_simulator()` function.
+First of, we want to retrieve the state and dependent variable history of the orbital simulations that were carried in the first and last generations. To do so, we extract the design variables of all the member of a given population from the generation history, and we read the histories that were saved in the trajectory archive when their fitness was evaluated. To bound the size of the archive, only every 10th epoch of each orbit is saved, and the least recently used orbits are removed once the archive exceeds its maximum size. An orbit is only propagated again, calling the `orbitProblem.propagate_orbit()` function, if it is missing from the archive.
 """
 
 
@@ -576,6 +396,9 @@ First of, we want to save the state and dependent variable history of the orbita
 pops_to_analyze = {0: 'initial',
                    number_of_evolutions - 1 : 'final'}
 
+# Load the generation history saved during the evolution
+generation_history_data = load_generation_history(generation_history.history_directory)
+
 # Initialize containers
 simulation_output = dict()
 
@@ -583,7 +406,7 @@ simulation_output = dict()
 for population_index, population_name in pops_to_analyze.items():
     
     # Get population individuals from the given generation
-    current_population = population_list[population_index]
+    current_population, current_fitness = get_generation(generation_history_data, population_index)
     
     # Current generation's dictionary
     generation_output = dict()
@@ -594,20 +417,20 @@ for population_index, population_name in pops_to_analyze.items():
         # Retrieve orbital parameters
         current_orbit_parameters = current_population[individual]
         
-        # Propagate orbit and compute fitness
-        orbitProblem.fitness(current_orbit_parameters)
+        # Propagate orbit again only if it is missing from the archive
+        if not trajectory_archive.contains(current_orbit_parameters):
+            orbitProblem.propagate_orbit(current_orbit_parameters)
         
         # Retrieve state and dependent variable history
-        current_states = orbitProblem.get_last_run_dynamics_simulator().propagation_results.state_history
-        current_dependent_variables = orbitProblem.get_last_run_dynamics_simulator().propagation_results.dependent_variable_history
+        current_states, current_dependent_variables = trajectory_archive.load(current_orbit_parameters)
         
         # Save results to dict
         generation_output[individual] = [current_states, current_dependent_variables]
         
     # Append to global dictionary
     simulation_output[population_index] = [generation_output,
-                                           fitness_list[population_index],
-                                           population_list[population_index]]
+                                           current_fitness,
+                                           current_population]
 
 
 """
@@ -676,7 +499,7 @@ for population_index in simulation_output.keys():
             ax.set_ylabel(r'Objective 2: proximity [$m$]')
             
         # Add the Pareto front itself in green
-        optimum_mask = util.pareto_optimums(np.array([np.deg2rad(current_fitness[:, 0]), current_fitness[:, 1]]).T)
+        optimum_mask = get_non_dominated_mask(current_fitness)
         ax.step(
             sorted(np.deg2rad(current_fitness[:, 0])[optimum_mask], reverse=True),
             sorted(current_fitness[:, 1][optimum_mask], reverse=False),
@@ -689,6 +512,48 @@ plt.tight_layout()
 plt.show()
 
 
+"""
+#### Pareto archive and hypervolume
+The hypervolume of the Pareto archive is plotted for each generation: it stops increasing once the optimization no longer finds better orbits. The non-dominated orbits of the archive, found over all generations (and, in an archipelago, on all islands), are compared to the final population (of all islands).
+"""
+
+
+# Plot the hypervolume of the Pareto archive over the generations
+fig, axs = plt.subplots(1, 2, figsize=(12, 4.5))
+axs[0].plot(np.arange(len(pareto_archive.hypervolume_history)), pareto_archive.hypervolume_history)
+axs[0].grid('major')
+axs[0].set_xlabel('Generation')
+axs[0].set_ylabel(r'Hypervolume [$m \, rad^{-1}$]')
+
+# Plot the final populations, and the Pareto archive
+if use_archipelago:
+    final_fitness_list = [island.get_population().get_f() for island in archipelago]
+    final_population_labels = ['Island %i' % island_index for island_index in range(number_of_islands)]
+else:
+    final_fitness_list = [pop.get_f()]
+    final_population_labels = ['Final population']
+for final_fitness, final_population_label in zip(final_fitness_list, final_population_labels):
+    axs[1].scatter(np.deg2rad(final_fitness[:, 0]),
+                   final_fitness[:, 1],
+                   s=50,
+                   marker='.',
+                   alpha=0.65,
+                   label=final_population_label)
+archive_order = np.argsort(pareto_archive.fitness[:, 0])
+axs[1].step(np.deg2rad(pareto_archive.fitness[archive_order, 0]),
+            pareto_archive.fitness[archive_order, 1],
+            where='post',
+            color="#418F3E",
+            linewidth=2,
+            label='Pareto archive')
+axs[1].grid('major')
+axs[1].set_xlabel(r'Objective 1: coverage [$deg^{-1}$]')
+axs[1].set_ylabel(r'Objective 2: proximity [$m$]')
+axs[1].legend()
+plt.tight_layout()
+plt.show()
+
+
 """
 #### Design variables histogram
 Plotting the histogram of the design variables for the final generation gives insights into what set of orbital parameters lead to optimum solutions. Possible optimum design variables values can then be detected by looking at the number of population members that use them. A high number of occurrences in the final generation **could** indicate a better design variable. At least, this offers some leads into what to investigate further.
@@ -738,12 +603,11 @@ for ax_index, population_index in enumerate(simulation_output.keys()):
     # Loop over individuals
     for ind_index, individual in enumerate(current_population):
         
-        # Plot orbit
-        state_history = list(current_generation[0][ind_index][0].values())
-        state_history = np.vstack(state_history)
-        current_ax.plot(state_history[:, 0],
-                        state_history[:, 1],
+        # Plot orbit (the first column of the state history holds the epochs)
+        state_history = current_generation[0][ind_index][0]
+        current_ax.plot(state_history[:, 1],
                         state_history[:, 2],
+                        state_history[:, 3],
                         linewidth=0.5)
         
     # Prettify
@@ -799,12 +663,11 @@ for var in range(4):
             label = design_variable_symbols[var] + ' > ' + str(design_variable_range[var][1]) + \
                     design_variable_units[var]
 
-        # Plot orbit
-        state_history = list(current_generation[0][ind_index][0].values())
-        state_history = np.vstack(state_history)
-        current_ax.plot(state_history[:, 0],
-                        state_history[:, 1],
+        # Plot orbit (the first column of the state history holds the epochs)
+        state_history = current_generation[0][ind_index][0]
+        current_ax.plot(state_history[:, 1],
                         state_history[:, 2],
+                        state_history[:, 3],
                         color=plt_color,
                         linewidth=0.5,
                         label=label)
@@ -0,0 +1,110 @@
+"""
+# Asteroid orbit optimization with PyGMO - Surrogate model
+Copyright (c) 2010-2022, Delft University of Technology. All rights reserved. This file is part of the Tudat. Redistribution  and use in source and binary forms, with or without modification, are permitted exclusively under the terms of the Modified BSD license. You should have received a copy of the license with this file. If not, please or visit: http://tudat.tudelft.nl/LICENSE.
+
+This module is used by the Optimization part of the Asteroid Orbit Optimization example. It contains the `SurrogateModel` class, a radial basis function interpolation of the fitness values of all orbits that were actually propagated.
+
+When a surrogate model is given to the `AsteroidOrbitProblem`, the fitness of each batch of offspring is first predicted by the surrogate model. Only the offspring selected by the infill criterion of `SurrogateModel.select_promising()` are propagated; the other offspring are given their predicted fitness. The surrogate model is retrained on all propagated orbits at a fixed interval of batches.
+"""
+
+
+# Load standard modules
+import numpy as np
+from scipy.interpolate import RBFInterpolator
+
+
+class SurrogateModel:
+
+    def __init__(self,
+                 design_variable_lower_boundaries,
+                 design_variable_upper_boundaries,
+                 true_evaluation_fraction=0.25,
+                 retraining_interval=5,
+                 minimum_training_size=50,
+                 number_of_neighbors=200):
+        self.design_variable_lower_boundaries = np.asarray(design_variable_lower_boundaries, dtype=float)
+        self.design_variable_upper_boundaries = np.asarray(design_variable_upper_boundaries, dtype=float)
+        self.true_evaluation_fraction = true_evaluation_fraction
+        self.retraining_interval = retraining_interval
+        self.minimum_training_size = minimum_training_size
+        self.number_of_neighbors = number_of_neighbors
+
+        # Initialize the training data (all propagated orbits) and the interpolator trained on it
+        self.training_parameters = []
+        self.training_fitness = []
+        self.interpolator = None
+        self.number_of_batches = 0
+
+        # Initialize the statistics of the surrogate model
+        self.true_evaluations = 0
+        self.surrogate_evaluations = 0
+
+    def normalize(self,
+                  orbit_parameters_list):
+        # Scale the design variables to [0, 1], such that all of them have the same weight in the interpolation
+        return (np.asarray(orbit_parameters_list, dtype=float) - self.design_variable_lower_boundaries) \
+               / (self.design_variable_upper_boundaries - self.design_variable_lower_boundaries)
+
+    def is_trained(self):
+        return self.interpolator is not None
+
+    def add_training_data(self,
+                          orbit_parameters_list,
+                          fitness_list):
+        self.training_parameters.extend(np.asarray(orbit_parameters_list, dtype=float))
+        self.training_fitness.extend(np.asarray(fitness_list, dtype=float))
+        self.true_evaluations += len(orbit_parameters_list)
+
+    def train(self):
+        # Remove duplicate orbits, which would make the interpolation matrix singular
+        training_parameters, unique_indices = np.unique(self.normalize(self.training_parameters),
+                                                        axis=0,
+                                                        return_index=True)
+        training_fitness = np.asarray(self.training_fitness)[unique_indices]
+
+        # Fit a thin plate spline through the fitness values, using only the nearest orbits for each prediction
+        self.interpolator = RBFInterpolator(training_parameters,
+                                            training_fitness,
+                                            kernel='thin_plate_spline',
+                                            smoothing=1.0E-3,
+                                            neighbors=min(self.number_of_neighbors, len(training_parameters)))
+
+    def end_batch(self):
+        # Train the model once enough orbits were propagated, and retrain it periodically afterwards
+        self.number_of_batches += 1
+        if len(self.training_parameters) >= self.minimum_training_size and \
+                (not self.is_trained() or self.number_of_batches % self.retraining_interval == 0):
+            self.train()
+
+    def predict(self,
+                orbit_parameters_list):
+        return self.interpolator(self.normalize(orbit_parameters_list))
+
+    def select_promising(self,
+                         orbit_parameters_list,
+                         predicted_fitness_list):
+        number_of_true_evaluations = int(np.ceil(self.true_evaluation_fraction * len(orbit_parameters_list)))
+
+        # Distance of each candidate to the closest propagated orbit, used as a measure of the prediction uncertainty
+        distance_to_training_data = np.min(np.linalg.norm(
+            self.normalize(orbit_parameters_list)[:, np.newaxis, :]
+            - self.normalize(self.training_parameters)[np.newaxis, :, :], axis=2), axis=1)
+
+        # Infill criterion: candidates predicted not to be dominated by any propagated orbit are promising
+        training_fitness = np.asarray(self.training_fitness)
+        is_dominated = np.any(np.all(training_fitness[np.newaxis, :, :] <= predicted_fitness_list[:, np.newaxis, :],
+                                     axis=2)
+                              & np.any(training_fitness[np.newaxis, :, :] < predicted_fitness_list[:, np.newaxis, :],
+                                       axis=2), axis=1)
+
+        # Rank the promising candidates first, and the most uncertain predictions first within each group
+        selection_order = np.lexsort((-distance_to_training_data, is_dominated))
+
+        # Propagate the best ranked candidates
+        selected = np.zeros(len(orbit_parameters_list), dtype=bool)
+        selected[selection_order[:number_of_true_evaluations]] = True
+        return selected
+
+    def print_statistics(self):
+        print("Surrogate model: %i true evaluations, %i surrogate evaluations"
+              % (self.true_evaluations, self.surrogate_evaluations))
@@ -20,13 +20,15 @@ PyGMO is the Python counterpart of [PAGMO](https://esa.github.io/pagmo2/index.ht
 ## Import statements
 The required import statements are made here, at the very beginning.
 
-Some standard modules are first loaded. These are `math`, `numpy` and `matplotlib`.
+Some standard modules are first loaded. These are `os`, `sys`, `math`, `numpy` and `matplotlib`.
 
-Then, the `pygmo` library that will be used is imported.
+Then, the `pygmo` library that will be used is imported, as well as the `EvolutionDriver` class of the `optimization_utilities` package, located at the root of this repository.
 """
 
 
 # Load standard modules
+import os
+import sys
 import math
 import pygmo
 import matplotlib
@@ -38,6 +40,11 @@ from numpy import random
 # Load pygmo library
 import pygmo as pg
 
+# Load the optimization utilities shared by the examples, located at the root of this repository
+current_dir = os.path.abspath('')
+sys.path.append(os.path.join(current_dir, '..'))
+from optimization_utilities import EvolutionDriver
+
 
 """
 ## Create user-defined problem
@@ -146,7 +153,9 @@ if inspect_pop:
 ## Evolve population
 We now want to make this population evolve, as to (hopefully) get closer to optimum solutions.
 
-In a loop, we thus call `algo.evolve(pop)` 100 times to make the population evolve 100 times. During each generation, we also save the list of fitness and of decision variables.
+The evolution is run by the `EvolutionDriver` class, which calls `algo.evolve(pop)` 100 times to make the population evolve 100 times. During each generation, it saves the fitness and decision variables of the best individual found so far.
+
+The driver can also stop the evolution earlier: when the best fitness improved by no more than `improvement_tolerance` over the last `number_of_stagnation_generations` generations, when the evolution took longer than `wall_clock_budget` seconds, or when more than `evaluation_budget` function evaluations were used. All of these are disabled (`None`) by default. Every 10 generations, the driver writes the population and the algorithm (including the state of its random number generator) to a checkpoint file. If the optimization is interrupted, setting `resume_optimization` to `True` continues it from the last checkpoint, with exactly the same results as an uninterrupted run.
 
 After 100 generations, and 201,000 function evaluations, we can see that we find the optimum of (3, 2) with a deviation in the order of $10^{-6}$.
 """
@@ -155,21 +164,36 @@ After 100 generations, and 201,000 function evaluations, we can see that we find
 # Set number of evolutions
 number_of_evolutions = 100
 
-# Initialize empty containers
-individuals_list = []
-fitness_list = []
+# Select the rules to stop the evolution earlier (None to disable each rule)
+improvement_tolerance = 1e-12
+number_of_stagnation_generations = None
+wall_clock_budget = None # s
+evaluation_budget = None
+
+# Whether to resume an interrupted optimization from its last checkpoint
+resume_optimization = False
 
 # Evolve population multiple times
-for i in range(number_of_evolutions):
-    pop = algo.evolve(pop)
-    individuals_list.append(pop.get_x()[pop.best_idx()])
-    fitness_list.append(pop.get_f()[pop.best_idx()])
+evolution_driver = EvolutionDriver(number_of_evolutions,
+                                   improvement_tolerance,
+                                   number_of_stagnation_generations,
+                                   wall_clock_budget,
+                                   evaluation_budget,
+                                   checkpoint_file=os.path.join(current_dir, 'himmelblau_checkpoint.pkl'),
+                                   checkpoint_interval=10)
+pop = evolution_driver.evolve(algo, pop, resume=resume_optimization)
+print('Evolution stopped after %i generations (%s)' % (evolution_driver.generation, evolution_driver.stopping_reason))
+
+# Retrieve the best individual of each generation
+number_of_evolutions = evolution_driver.generation
+individuals_list = evolution_driver.champion_design_variables[1:]
+fitness_list = evolution_driver.champion_fitness[1:]
 
 # Extract the best individual
 print('\n########### PRINTING CHAMPION INDIVIDUALS ###########\n')
 print('Fitness (= function) value: ', pop.champion_f)
 print('Decision variable vector: ', pop.champion_x)
-print('Number of function evaluations: ', pop.problem.get_fevals())
+print('Number of function evaluations: ', evolution_driver.number_of_evaluations)
 print('Difference wrt the minimum: ', pop.champion_x - np.array([3,2]))
 
 